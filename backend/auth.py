@@ -1,25 +1,83 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import time
+from cachetools import LRUCache
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
+from bson import ObjectId
+from services.principal_cache import get_principal_cache
+from services.token_revocations import get_token_revocations
+
+try:
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
 
 # Security configurations
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_DAYS = 7
+# Access tokens are short-lived; clients renew them with their refresh token
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+
+# JWT library (jose or pyjwt) and the number of verified tokens remembered
+# per worker (0 disables the cache)
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+# bcrypt runs in its own thread pool (it releases the GIL) so that it never
+# blocks the event loop. At most WORKERS + QUEUE_DEPTH calls are in flight;
+# beyond that requests are turned away with 503 instead of queueing up.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", 64))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHasher:
+    """Bounded executor for bcrypt hashing and verification."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_depth: int = PASSWORD_HASH_QUEUE_DEPTH):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(workers + queue_depth)
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        if self._slots.locked():
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+# Lazy initialization
+_password_hasher_instance = None
+
+def get_password_hasher() -> PasswordHasher:
+    """Get or create the password hasher singleton instance."""
+    global _password_hasher_instance
+    if _password_hasher_instance is None:
+        _password_hasher_instance = PasswordHasher()
+    return _password_hasher_instance
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash (in the password hashing pool)."""
+    return await get_password_hasher().run(pwd_context.verify, plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    """Hash a password (in the password hashing pool)."""
+    return await get_password_hasher().run(pwd_context.hash, password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password."""
+    """Hash a password synchronously, for scripts outside the event loop."""
     return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -28,32 +86,165 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
+        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = get_token_decoder().encode(to_encode)
     return encoded_jwt
 
+def create_user_token(user: dict, session_id: str) -> str:
+    """Create an access token for a session, carrying the claims needed to authorize without a database read."""
+    return create_access_token(data={
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "sid": session_id,
+        "role": user["role"],
+        "token_version": user.get("token_version", 0)
+    })
+
+class TokenDecoder:
+    """
+    Signs and verifies JWTs with the configured backend. Clients send the same
+    token with every request until it expires, so the payloads of verified
+    tokens are kept in an LRU cache keyed by the token's SHA-256 and served
+    until their ``exp``; invalid tokens are never cached.
+    """
+
+    def __init__(self, backend: str = JWT_BACKEND, cache_size: int = TOKEN_CACHE_SIZE):
+        if backend not in ("jose", "pyjwt"):
+            raise ValueError(f"Unknown JWT backend: {backend}")
+        if backend == "pyjwt" and pyjwt is None:
+            raise RuntimeError("JWT_BACKEND=pyjwt requires the 'PyJWT' package")
+        self.backend = backend
+        self._cache = LRUCache(maxsize=cache_size) if cache_size > 0 else None
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, claims: dict) -> str:
+        if self.backend == "pyjwt":
+            return pyjwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+        return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+    def decode(self, token: str) -> Optional[dict]:
+        """The payload of a valid, unexpired token, or None."""
+        if self._cache is None:
+            return self._verify(token)
+
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self._cache.get(key)
+        if payload is not None:
+            if payload["exp"] > time.time():
+                self.hits += 1
+                # Callers may modify the payload they get
+                return dict(payload)
+            del self._cache[key]
+
+        self.misses += 1
+        payload = self._verify(token)
+        if payload is not None and isinstance(payload.get("exp"), (int, float)):
+            self._cache[key] = payload
+            return dict(payload)
+        return payload
+
+    def _verify(self, token: str) -> Optional[dict]:
+        if self.backend == "pyjwt":
+            try:
+                return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            except pyjwt.PyJWTError:
+                return None
+        try:
+            return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._cache) if self._cache is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Lazy initialization
+_token_decoder_instance = None
+
+def get_token_decoder() -> TokenDecoder:
+    """Get or create the token decoder singleton instance."""
+    global _token_decoder_instance
+    if _token_decoder_instance is None:
+        _token_decoder_instance = TokenDecoder()
+    return _token_decoder_instance
+
 def decode_token(token: str) -> dict:
     """Decode a JWT token."""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+    payload = get_token_decoder().decode(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return payload
 
-async def get_current_user_email(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    """Get current user email from token."""
-    token = credentials.credentials
+def validate_token(token: str) -> dict:
+    """Decode a token and reject it if its user's tokens were revoked since it was issued."""
     payload = decode_token(token)
-    email: str = payload.get("sub")
-    if email is None:
+    user_id = payload.get("uid")
+    if payload.get("sub") is None or (
+        user_id and get_token_revocations().is_revoked(user_id, payload.get("token_version", 0), payload.get("sid"))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def _load_user(request: Request, payload: dict) -> dict:
+    user = await get_principal_cache().get_user(request.app.state.db, payload)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not user.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
         )
-    return email
+    return user
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """Get the current user document (without password) from the principal cache."""
+    return await _load_user(request, validate_token(credentials.credentials))
+
+async def get_current_principal(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    """
+    Get the current user's _id, email and role straight from the token, for
+    handlers that only authorize. Tokens issued before sessions existed live
+    longer than revocations are kept, so they fall back to the principal cache.
+    """
+    payload = validate_token(credentials.credentials)
+    user_id = payload.get("uid")
+    if not payload.get("sid") or not payload.get("role") or not user_id or not ObjectId.is_valid(user_id):
+        return await _load_user(request, payload)
+    return {
+        "_id": ObjectId(user_id),
+        "email": payload["sub"],
+        "role": payload["role"],
+        "token_version": payload.get("token_version", 0),
+        "sid": payload["sid"]
+    }
+
+async def get_current_user_email(user: dict = Depends(get_current_principal)) -> str:
+    """Get current user email from token."""
+    return user["email"]
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Rebuild the hourly and daily activity rollups and the daily login sketches
+from the source collections. Run once after deploying them, or with
+--days N to rebuild only the last N days (e.g. after an outage of the
+rollup writes).
+"""
+
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from datetime import datetime, timedelta
+
+async def backfill_rollups(days: int = None):
+    """Recompute rollup buckets, all of them or the last `days` days."""
+    
+    # Load environment
+    load_dotenv()
+    mongo_url = os.environ['MONGO_URL']
+    db_name = os.environ['DB_NAME']
+    
+    # Connect to MongoDB
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    from services.rollups import backfill
+    from services.login_sketches import backfill_sketches
+    
+    since = datetime.utcnow() - timedelta(days=days) if days else None
+    print(f"🔄 Backfilling rollups {'for the last %d days' % days if days else 'from all history'}...")
+    
+    await db.rollups.create_index([("scope", 1), ("granularity", 1), ("bucket", 1)], unique=True)
+    await backfill(db, since)
+    
+    buckets = await db.rollups.count_documents({})
+    print(f"✅ {buckets} rollup buckets stored")
+    
+    print("🔄 Rebuilding login sketches...")
+    await db.login_sketches.create_index([("date", 1), ("kind", 1)], unique=True)
+    await backfill_sketches(db, since)
+    sketches = await db.login_sketches.count_documents({})
+    print(f"✅ {sketches} daily login sketches stored")
+    
+    client.close()
+    print("🎉 All done!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=None, help="only rebuild the last N days")
+    args = parser.parse_args()
+    asyncio.run(backfill_rollups(args.days))
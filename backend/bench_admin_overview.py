@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the admin dashboard overview.
+Compares the old one-query-after-another overview with build_admin_overview,
+which runs one query per collection concurrently, and the shops part of the
+overview with its earlier unindexed $facet over every shop.
+"""
+
+import asyncio
+import statistics
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from datetime import datetime, timedelta
+
+async def sequential_overview(db):
+    """The overview as it used to be built: every count and list awaited in turn."""
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    
+    await db.users.count_documents({})
+    await db.users.count_documents({"is_active": True})
+    await db.shops.count_documents({})
+    await db.shops.count_documents({"is_verified": True})
+    await db.shop_verifications.count_documents({"status": "pending"})
+    await db.reviews.count_documents({})
+    await db.orders.count_documents({})
+    await db.security_alerts.count_documents({"resolved": False})
+    await db.security_alerts.count_documents({"resolved": False, "severity": "critical"})
+    for role in ["shopper", "shop_owner", "admin"]:
+        await db.users.count_documents({"role": role})
+    for status_val in ["active", "suspended", "pending_review", "banned"]:
+        await db.shops.count_documents({"status": status_val})
+    await db.users.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    await db.shops.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    await db.reviews.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    await db.orders.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    await db.shops.find({"review_count": {"$gt": 0}}).sort("rating", -1).limit(10).to_list(10)
+    await db.users.find({}, {"password": 0}).sort("created_at", -1).limit(10).to_list(10)
+    await db.shops.find({"is_verified": False}).limit(10).to_list(10)
+
+async def facet_shops_overview(db):
+    """The shops overview as it used to be built: one $facet over all shops."""
+    since = datetime.utcnow() - timedelta(days=30)
+    await db.shops.aggregate([
+        {"$match": {"status": {"$ne": "deleted"}}},
+        {
+            "$facet": {
+                "new_30d": [{"$match": {"created_at": {"$gte": since}}}, {"$count": "n"}],
+                "top": [{"$match": {"review_count": {"$gt": 0}}}, {"$sort": {"rating": -1}}, {"$limit": 10}],
+                "pending": [{"$match": {"is_verified": False}}, {"$limit": 10}]
+            }
+        }
+    ]).to_list(1)
+
+async def timed(label, build, db, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await build(db)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(
+        f"{label:<12} median {statistics.median(samples):7.1f} ms   "
+        f"p95 {samples[int(len(samples) * 0.95) - 1]:7.1f} ms"
+    )
+
+async def main():
+    load_dotenv()
+    mongo_url = os.environ['MONGO_URL']
+    db_name = os.environ['DB_NAME']
+    runs = int(os.getenv("BENCH_RUNS", 50))
+    
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+    
+    from services.counter_materializer import get_counter_materializer
+    from routes.admin_dashboard_routes import build_admin_overview, _shops_overview
+    
+    # Make sure the counters documents exist
+    materializer = get_counter_materializer()
+    materializer._db = db
+    await materializer.recompute_all()
+    
+    print(f"📊 Admin overview, {runs} runs each")
+    await timed("sequential", sequential_overview, db, runs)
+    await timed("concurrent", build_admin_overview, db, runs)
+    
+    print(f"🏪 Shops overview ({await db.shops.estimated_document_count()} shops), {runs} runs each")
+    await timed("facet", facet_shops_overview, db, runs)
+    await timed("indexed", lambda db: _shops_overview(db, datetime.utcnow() - timedelta(days=30)), db, runs)
+    
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
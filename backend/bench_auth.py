@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the authentication dependency chain.
+Resolves get_current_principal (token only) and get_current_user (token plus
+a warm principal cache) for the same bearer token over and over, as a client
+does between token refreshes, with each JWT backend with and without the
+verified token cache. Runs without a database.
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from bson import ObjectId
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from services.principal_cache import get_principal_cache
+
+def make_user():
+    return {
+        "_id": ObjectId(),
+        "email": "bench@example.com",
+        "full_name": "Bench User",
+        "role": "shopper",
+        "is_active": True,
+        "token_version": 0
+    }
+
+async def run(dependency, request, credentials, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await dependency(request, credentials)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the authentication dependencies")
+    parser.add_argument("--iterations", type=int, default=20000, help="Requests per configuration")
+    args = parser.parse_args()
+
+    user = make_user()
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(db=None)))
+    backends = ["jose"] + (["pyjwt"] if auth.pyjwt is not None else [])
+
+    print(f"{'backend':<8} {'cache':<6} {'principal µs':>13} {'user µs':>9}")
+    for backend in backends:
+        for cache_size in (0, auth.TOKEN_CACHE_SIZE):
+            auth._token_decoder_instance = auth.TokenDecoder(backend=backend, cache_size=cache_size)
+            token = auth.create_user_token(user, str(ObjectId()))
+            credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+            # Warm the principal cache so that get_current_user needs no database
+            claims = auth.decode_token(token)
+            get_principal_cache()._entries[(claims["uid"], 0)] = user
+
+            principal = await run(auth.get_current_principal, request, credentials, args.iterations)
+            current_user = await run(auth.get_current_user, request, credentials, args.iterations)
+            print(f"{backend:<8} {'on' if cache_size else 'off':<6} {principal:>13.1f} {current_user:>9.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark for password hashing under a login storm.
+Measures the latency of a cheap, unrelated handler while many logins verify
+passwords concurrently: once with bcrypt called inline in the coroutine (the
+old behaviour) and once through the bounded password hashing pool.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from auth import pwd_context, verify_password
+
+async def inline_verify(password, hashed):
+    """bcrypt straight in the coroutine, as the handlers used to do it."""
+    return pwd_context.verify(password, hashed)
+
+async def login_storm(verify, hashed, logins, concurrency):
+    queue = asyncio.Queue()
+    for _ in range(logins):
+        queue.put_nowait("wrong-password")
+    rejected = 0
+
+    async def worker():
+        nonlocal rejected
+        while not queue.empty():
+            password = queue.get_nowait()
+            try:
+                await verify(password, hashed)
+            except HTTPException:
+                rejected += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return rejected
+
+async def probe(samples, stop, interval):
+    """An unrelated endpoint: trivial work, timed from being scheduled to done."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+def report(label, samples, elapsed, rejected):
+    samples.sort()
+    print(
+        f"{label:<10} probe p50 {statistics.median(samples):8.2f} ms   "
+        f"p99 {samples[int(len(samples) * 0.99) - 1]:8.2f} ms   "
+        f"max {samples[-1]:8.2f} ms   storm {elapsed:5.1f} s   rejected {rejected}"
+    )
+
+async def run(label, verify, hashed, logins, concurrency):
+    samples, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(samples, stop, 0.005))
+    start = time.perf_counter()
+    rejected = await login_storm(verify, hashed, logins, concurrency) if verify else 0
+    if not verify:
+        await asyncio.sleep(1)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    report(label, samples, elapsed, rejected)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark password hashing under a login storm")
+    parser.add_argument("--logins", type=int, default=200, help="Number of login attempts in the storm")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent login attempts")
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct-password")
+    print(f"🔐 {args.logins} logins, {args.concurrency} concurrent")
+    await run("idle", None, hashed, 0, 0)
+    await run("inline", inline_verify, hashed, args.logins, args.concurrency)
+    await run("pool", verify_password, hashed, args.logins, args.concurrency)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -9,6 +9,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from datetime import datetime
+from bson import ObjectId
 
 async def migrate_reviews():
     """Update all existing reviews with new required fields."""
@@ -106,6 +107,14 @@ async def migrate_reviews():
     
     print(f"✅ Migration complete! Updated {updated_count} reviews")
     
+    # Flag answered reviews for the shop owner's unanswered queue
+    print("🔄 Setting has_response flags...")
+    answered_ids = await db.review_responses.distinct("review_id")
+    answered_ids = [ObjectId(rid) for rid in answered_ids if ObjectId.is_valid(rid)]
+    await db.reviews.update_many({"_id": {"$in": answered_ids}}, {"$set": {"has_response": True}})
+    await db.reviews.update_many({"_id": {"$nin": answered_ids}}, {"$set": {"has_response": False}})
+    print(f"✅ {len(answered_ids)} reviews have a response")
+    
     # Update shop ratings to use new calculation
     print("🔄 Recalculating shop ratings...")
     
@@ -162,10 +162,32 @@ class AdminReviewAction(BaseModel):
     action: str = Field(..., pattern="^(approve|reject)$")
     admin_notes: Optional[str] = None
 
+# Filters matching GET /admin/reviews, for acting on a whole result set
+class AdminReviewFilter(BaseModel):
+    review_type: Optional[str] = None
+    status_filter: Optional[str] = None
+    is_flagged: Optional[bool] = None
+    shop_id: Optional[str] = None
+    search: Optional[str] = None
+
+BULK_REVIEW_ACTION_LIMIT = 1000
+
+class AdminBulkReviewAction(BaseModel):
+    action: str = Field(..., pattern="^(approve|reject|delete)$")
+    review_ids: Optional[List[str]] = Field(None, min_items=1, max_items=BULK_REVIEW_ACTION_LIMIT)
+    filters: Optional[AdminReviewFilter] = None  # used when review_ids is not given
+    limit: int = Field(BULK_REVIEW_ACTION_LIMIT, ge=1, le=BULK_REVIEW_ACTION_LIMIT)  # max reviews taken from filters
+    admin_notes: Optional[str] = None
+
 # Token Models
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
+    expires_in: Optional[int] = None  # seconds until the access token expires
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: Optional[str] = None
@@ -32,7 +32,8 @@ class UserSession(BaseModel):
 
 # Security Alert Model
 class SecurityAlert(BaseModel):
-    user_id: str
+    user_id: Optional[str] = None  # None for alerts about an IP or subnet
+    email: Optional[str] = None
     alert_type: str  # suspicious_login, multiple_failed_attempts, unusual_activity
     severity: str  # low, medium, high, critical
     description: str
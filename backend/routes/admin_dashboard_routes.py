@@ -1,8 +1,16 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from auth import get_current_user_email
+from auth import get_current_principal, get_token_decoder
+from services.response_cache import get_cache, get_cache_stats
+from services.principal_cache import get_principal_cache
+from services.counter_materializer import read_counters
+from services.rollups import PLATFORM_SCOPE, get_series, resolve_range
 from datetime import datetime, timedelta
 from bson import ObjectId
+from typing import Optional
+from utils.dataloader import Loaders, get_loaders
+import asyncio
+import os
 
 router = APIRouter(prefix="/admin/dashboard", tags=["Admin - Dashboard"])
 
@@ -10,131 +18,186 @@ def get_db():
     from server import db
     return db
 
-async def check_admin(email: str, db: AsyncIOMotorDatabase):
+def check_admin(user: dict):
     """Check if user is admin."""
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     return user
 
-@router.get("/overview")
-async def get_admin_dashboard_overview(
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
-    """Get admin dashboard overview (admin only)."""
-    await check_admin(email, db)
-    
-    # Get counts
-    total_users = await db.users.count_documents({})
-    active_users = await db.users.count_documents({"is_active": True})
-    total_shops = await db.shops.count_documents({})
-    verified_shops = await db.shops.count_documents({"is_verified": True})
-    pending_verifications = await db.shop_verifications.count_documents({"status": "pending"})
-    total_reviews = await db.reviews.count_documents({})
-    total_orders = await db.orders.count_documents({})
-    
-    # Get user role distribution
-    user_roles = {}
-    for role in ["shopper", "shop_owner", "admin"]:
-        count = await db.users.count_documents({"role": role})
-        user_roles[role] = count
-    
-    # Get shop status distribution
-    shop_statuses = {}
-    for status_val in ["active", "suspended", "pending_review", "banned"]:
-        count = await db.shops.count_documents({"status": status_val})
-        shop_statuses[status_val] = count
+ADMIN_OVERVIEW_CACHE_TTL = float(os.getenv("ADMIN_OVERVIEW_CACHE_TTL", 15))
+
+def _format_ids(docs: list) -> list:
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+        del doc["_id"]
+    return docs
+
+async def _users_overview(db: AsyncIOMotorDatabase, since: datetime) -> dict:
+    """New users in the window and the 10 most recent users, in one pass over the window."""
+    result = await db.users.aggregate([
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$sort": {"created_at": -1}},
+        {
+            "$facet": {
+                "new_30d": [{"$count": "n"}],
+                "recent": [{"$limit": 10}, {"$project": {"password": 0}}]
+            }
+        }
+    ]).to_list(1)
+    row = result[0]
+    recent = row["recent"]
+    
+    # Quiet month: top up the list with older users
+    if len(recent) < 10:
+        recent += await db.users.find(
+            {"created_at": {"$lt": since}},
+            {"password": 0}
+        ).sort("created_at", -1).limit(10 - len(recent)).to_list(10)
     
-    # Get recent activity (last 30 days)
+    return {
+        "new_30d": row["new_30d"][0]["n"] if row["new_30d"] else 0,
+        "recent": _format_ids(recent)
+    }
+
+async def _shops_overview(db: AsyncIOMotorDatabase, since: datetime) -> dict:
+    """
+    New shops, top rated shops and unverified shops. $facet cannot use
+    indexes, so the shops it sees are narrowed first with an $or over the
+    created_at and is_verified indexes; the top shops walk the rating index.
+    """
+    window, top = await asyncio.gather(
+        db.shops.aggregate([
+            {"$match": {
+                "$or": [{"created_at": {"$gte": since}}, {"is_verified": False}],
+                "status": {"$ne": "deleted"}
+            }},
+            {
+                "$facet": {
+                    "new_30d": [
+                        {"$match": {"created_at": {"$gte": since}}},
+                        {"$count": "n"}
+                    ],
+                    "pending": [
+                        {"$match": {"is_verified": False}},
+                        {"$limit": 10}
+                    ]
+                }
+            }
+        ]).to_list(1),
+        db.shops.find(
+            {"status": {"$ne": "deleted"}, "review_count": {"$gt": 0}}
+        ).sort("rating", -1).limit(10).to_list(10)
+    )
+    row = window[0]
+    return {
+        "new_30d": row["new_30d"][0]["n"] if row["new_30d"] else 0,
+        "top": _format_ids(top),
+        "pending": _format_ids(row["pending"])
+    }
+
+async def build_admin_overview(db: AsyncIOMotorDatabase) -> dict:
+    """
+    Build the admin overview. Totals come from the materialized counters and
+    each collection is queried once; all queries run concurrently, so the
+    latency is that of the slowest query rather than the sum of all of them.
+    """
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    new_users_30d = await db.users.count_documents({"created_at": {"$gte": thirty_days_ago}})
-    new_shops_30d = await db.shops.count_documents({"created_at": {"$gte": thirty_days_ago}})
-    new_reviews_30d = await db.reviews.count_documents({"created_at": {"$gte": thirty_days_ago}})
-    new_orders_30d = await db.orders.count_documents({"created_at": {"$gte": thirty_days_ago}})
-    
-    # Get security alerts
-    active_security_alerts = await db.security_alerts.count_documents({"resolved": False})
-    critical_alerts = await db.security_alerts.count_documents({
-        "resolved": False,
-        "severity": "critical"
-    })
     
-    # Get top shops by rating
-    top_shops = await db.shops.find(
-        {"review_count": {"$gt": 0}}
-    ).sort("rating", -1).limit(10).to_list(10)
-    
-    for shop in top_shops:
-        shop["id"] = str(shop["_id"])
-        del shop["_id"]
-    
-    # Get recent users
-    recent_users = await db.users.find(
-        {},
-        {"password": 0}
-    ).sort("created_at", -1).limit(10).to_list(10)
-    
-    for user in recent_users:
-        user["id"] = str(user["_id"])
-        del user["_id"]
-    
-    # Get pending shop verifications
-    pending_shops = await db.shops.find(
-        {"is_verified": False}
-    ).limit(10).to_list(10)
-    
-    for shop in pending_shops:
-        shop["id"] = str(shop["_id"])
-        del shop["_id"]
+    counters, users, shops, new_reviews_30d, new_orders_30d = await asyncio.gather(
+        read_counters(db, "users", "shops", "reviews", "orders", "shop_verifications", "security_alerts"),
+        _users_overview(db, thirty_days_ago),
+        _shops_overview(db, thirty_days_ago),
+        db.reviews.count_documents({"created_at": {"$gte": thirty_days_ago}}),
+        db.orders.count_documents({"created_at": {"$gte": thirty_days_ago}})
+    )
     
     return {
         "statistics": {
-            "total_users": total_users,
-            "active_users": active_users,
-            "total_shops": total_shops,
-            "verified_shops": verified_shops,
-            "pending_verifications": pending_verifications,
-            "total_reviews": total_reviews,
-            "total_orders": total_orders,
-            "active_security_alerts": active_security_alerts,
-            "critical_alerts": critical_alerts
+            "total_users": counters["users"].get("total", 0),
+            "active_users": counters["users"].get("active", 0),
+            "total_shops": counters["shops"].get("total", 0),
+            "verified_shops": counters["shops"].get("verified", 0),
+            "pending_verifications": counters["shop_verifications"].get("by_status", {}).get("pending", 0),
+            "total_reviews": counters["reviews"].get("total", 0),
+            "total_orders": counters["orders"].get("total", 0),
+            "active_security_alerts": counters["security_alerts"].get("unresolved", 0),
+            "critical_alerts": counters["security_alerts"].get("unresolved_by_severity", {}).get("critical", 0)
+        },
+        "user_roles": {
+            role: counters["users"].get("by_role", {}).get(role, 0)
+            for role in ["shopper", "shop_owner", "admin"]
+        },
+        "shop_statuses": {
+            status_val: counters["shops"].get("by_status", {}).get(status_val, 0)
+            for status_val in ["active", "suspended", "pending_review", "banned"]
         },
-        "user_roles": user_roles,
-        "shop_statuses": shop_statuses,
         "recent_activity": {
-            "new_users_30d": new_users_30d,
-            "new_shops_30d": new_shops_30d,
+            "new_users_30d": users["new_30d"],
+            "new_shops_30d": shops["new_30d"],
             "new_reviews_30d": new_reviews_30d,
             "new_orders_30d": new_orders_30d
         },
-        "top_shops": top_shops,
-        "recent_users": recent_users,
-        "pending_shops": pending_shops
+        "top_shops": shops["top"],
+        "recent_users": users["recent"],
+        "pending_shops": shops["pending"]
     }
 
+@router.get("/overview")
+async def get_admin_dashboard_overview(
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get admin dashboard overview (admin only)."""
+    check_admin(current_user)
+    
+    cache = get_cache("admin_overview", ADMIN_OVERVIEW_CACHE_TTL)
+    return await cache.get_or_set("overview", lambda: build_admin_overview(db))
+
+@router.get("/trends")
+async def get_platform_trends(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "day",  # day, hour
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get platform activity per day or hour from the rollups (admin only)."""
+    check_admin(current_user)
+    
+    try:
+        start, end = resolve_range(start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return await get_series(db, [PLATFORM_SCOPE], granularity, start, end)
+
 @router.get("/security-alerts")
 async def get_security_alerts(
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get all security alerts (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     alerts = await db.security_alerts.find(
         {"resolved": False}
     ).sort("created_at", -1).limit(50).to_list(50)
     
-    for alert in alerts:
+    # Get user info (one batched query)
+    users = await loaders.users.load_many(alert.get("user_id") for alert in alerts)
+    
+    for alert, user in zip(alerts, users):
         alert["id"] = str(alert["_id"])
         del alert["_id"]
         
-        # Get user info
         if alert.get("user_id"):
-            user = await db.users.find_one({"_id": ObjectId(alert["user_id"])}, {"full_name": 1, "email": 1})
             if user:
                 alert["user_name"] = user["full_name"]
                 alert["user_email"] = user["email"]
@@ -144,16 +207,31 @@ async def get_security_alerts(
 @router.post("/security-alerts/{alert_id}/resolve")
 async def resolve_security_alert(
     alert_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Resolve security alert (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
-    from bson import ObjectId
     await db.security_alerts.update_one(
         {"_id": ObjectId(alert_id)},
         {"$set": {"resolved": True, "resolved_at": datetime.utcnow()}}
     )
     
     return {"message": "Alert resolved successfully"}
+
+@router.get("/cache-stats")
+async def get_response_cache_stats(
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get response and authentication cache hit-ratio metrics for this worker (admin only)."""
+    check_admin(current_user)
+    
+    return {
+        "caches": get_cache_stats(),
+        "auth": {
+            "tokens": get_token_decoder().stats(),
+            "principals": get_principal_cache().stats()
+        }
+    }
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import AdminReviewAction
-from auth import get_current_user_email
+from models import AdminReviewAction, AdminBulkReviewAction
+from auth import get_current_principal
 from datetime import datetime
 from bson import ObjectId
 from typing import Optional
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from utils.dataloader import Loaders, get_loaders
+from services.moderation_queue import (
+    MODERATION_LEASE_SECONDS, MODERATION_MAX_CLAIM, claim_reviews, claimable_filter, release_review
+)
+import asyncio
 
 router = APIRouter(prefix="/admin/reviews", tags=["Admin - Reviews"])
 
@@ -12,32 +19,23 @@ def get_db():
     from server import db
     return db
 
-async def check_admin(email: str, db: AsyncIOMotorDatabase):
+def check_admin(user: dict):
     """Check if user is admin."""
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     return user
 
-@router.get("")
-async def get_all_reviews_admin(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100),
-    review_type: Optional[str] = None,  # verified, imported, unverified
-    status_filter: Optional[str] = None,  # pending, approved, rejected, published
+def build_review_query(
+    review_type: Optional[str] = None,
+    status_filter: Optional[str] = None,
     is_flagged: Optional[bool] = None,
     shop_id: Optional[str] = None,
-    search: Optional[str] = None,  # Search in comment, shop_name, user_name
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
-    """Get all reviews with admin filters."""
-    await check_admin(email, db)
-    
-    # Build query
+    search: Optional[str] = None
+) -> dict:
+    """Build the reviews query for the admin review filters."""
     query = {}
     if review_type:
         query["review_type"] = review_type
@@ -51,6 +49,38 @@ async def get_all_reviews_admin(
     # Text search in comment
     if search:
         query["comment"] = {"$regex": search, "$options": "i"}
+    return query
+
+async def enrich_reviews(reviews: list, loaders: Loaders) -> list:
+    """Add user_name, user_email and shop_name to each review."""
+    users, shops = await asyncio.gather(
+        loaders.users.load_many(review.get("user_id") for review in reviews),
+        loaders.shops.load_many(review.get("shop_id") for review in reviews)
+    )
+    for review, user, shop in zip(reviews, users, shops):
+        review["user_name"] = user.get("full_name", "Unknown") if user else "Unknown"
+        review["user_email"] = user.get("email", "") if user else ""
+        review["shop_name"] = shop.get("name", "Unknown") if shop else "Unknown"
+    return reviews
+
+@router.get("")
+async def get_all_reviews_admin(
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    review_type: Optional[str] = None,  # verified, imported, unverified
+    status_filter: Optional[str] = None,  # pending, approved, rejected, published
+    is_flagged: Optional[bool] = None,
+    shop_id: Optional[str] = None,
+    search: Optional[str] = None,  # Search in comment, shop_name, user_name
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
+):
+    """Get all reviews with admin filters."""
+    check_admin(current_user)
+    
+    # Build query
+    query = build_review_query(review_type, status_filter, is_flagged, shop_id, search)
     
     # Get total count
     total = await db.reviews.count_documents(query)
@@ -64,45 +94,8 @@ async def get_all_reviews_admin(
     fetch_limit = limit * 3 if search else limit
     reviews = await db.reviews.find(query).sort("created_at", -1).skip(skip).limit(fetch_limit).to_list(None)
     
-    # Manually enrich with user and shop info
-    enriched_reviews = []
-    for review in reviews:
-        # Get user info
-        try:
-            user_id = review.get("user_id")
-            if user_id:
-                if ObjectId.is_valid(user_id):
-                    user = await db.users.find_one({"_id": ObjectId(user_id)})
-                else:
-                    user = await db.users.find_one({"_id": user_id})
-                
-                if user:
-                    review["user_name"] = user.get("full_name", "Unknown")
-                    review["user_email"] = user.get("email", "")
-        except Exception as e:
-            print(f"Error fetching user: {e}")
-            review["user_name"] = "Unknown"
-            review["user_email"] = ""
-        
-        # Get shop info
-        try:
-            shop_id = review.get("shop_id")
-            if shop_id:
-                # Try as string first (UUID)
-                shop = await db.shops.find_one({"_id": shop_id})
-                
-                # If not found, try as ObjectId
-                if not shop and ObjectId.is_valid(shop_id):
-                    shop = await db.shops.find_one({"_id": ObjectId(shop_id)})
-                
-                if shop:
-                    review["shop_name"] = shop.get("name", "Unknown")
-        except Exception as e:
-            print(f"Error fetching shop: {e}")
-            review["shop_name"] = "Unknown"
-        
-        # Add to enriched list
-        enriched_reviews.append(review)
+    # Enrich with user and shop info (one batched query per collection)
+    enriched_reviews = await enrich_reviews(reviews, loaders)
     
     # Filter by search term after enrichment (for shop_name and user_name)
     if search:
@@ -134,11 +127,12 @@ async def get_all_reviews_admin(
 async def get_pending_reviews(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get all pending reviews (low-star reviews awaiting approval)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     query = {"status": "pending"}
     
@@ -152,46 +146,12 @@ async def get_pending_reviews(
     # Get reviews
     reviews = await db.reviews.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(None)
     
+    # Enrich with user and shop info (one batched query per collection)
+    await enrich_reviews(reviews, loaders)
+    
     # Format reviews
     for review in reviews:
         review["_id"] = str(review["_id"])
-        
-        # Get user info
-        try:
-            user_id = review.get("user_id")
-            if ObjectId.is_valid(user_id):
-                user = await db.users.find_one({"_id": ObjectId(user_id)})
-            else:
-                user = await db.users.find_one({"_id": user_id})
-            
-            if user:
-                review["user_name"] = user.get("full_name", "Unknown")
-                review["user_email"] = user.get("email", "")
-            else:
-                review["user_name"] = "Unknown"
-                review["user_email"] = ""
-        except Exception as e:
-            print(f"Error fetching user: {e}")
-            review["user_name"] = "Unknown"
-            review["user_email"] = ""
-        
-        # Get shop info
-        try:
-            shop_id = review.get("shop_id")
-            # Try as string first (UUID)
-            shop = await db.shops.find_one({"_id": shop_id})
-            
-            # If not found, try as ObjectId
-            if not shop and ObjectId.is_valid(shop_id):
-                shop = await db.shops.find_one({"_id": ObjectId(shop_id)})
-            
-            if shop:
-                review["shop_name"] = shop.get("name", "Unknown")
-            else:
-                review["shop_name"] = "Unknown"
-        except Exception as e:
-            print(f"Error fetching shop: {e}")
-            review["shop_name"] = "Unknown"
     
     return {
         "data": reviews,
@@ -200,15 +160,213 @@ async def get_pending_reviews(
         "pages": pages
     }
 
+@router.post("/queue/claim")
+async def claim_moderation_reviews(
+    count: int = Query(10, ge=1, le=MODERATION_MAX_CLAIM),
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
+):
+    """
+    Claim the next pending reviews for moderation. Claimed reviews are leased
+    to the caller and hidden from other moderators until the lease expires.
+    """
+    admin = check_admin(current_user)
+    
+    reviews = await claim_reviews(db, str(admin["_id"]), count)
+    await enrich_reviews(reviews, loaders)
+    
+    for review in reviews:
+        review["_id"] = str(review["_id"])
+    
+    return {
+        "data": reviews,
+        "lease_seconds": MODERATION_LEASE_SECONDS
+    }
+
+@router.post("/queue/{review_id}/release")
+async def release_moderation_review(
+    review_id: str,
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Return a claimed review to the queue without acting on it."""
+    admin = check_admin(current_user)
+    
+    if not ObjectId.is_valid(review_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid review ID"
+        )
+    
+    if not await release_review(db, ObjectId(review_id), str(admin["_id"])):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No lease held on this review"
+        )
+    
+    return {"message": "Review returned to the queue"}
+
+@router.get("/queue/stats")
+async def get_moderation_queue_stats(
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get the number of pending, leased and claimable reviews."""
+    check_admin(current_user)
+    
+    now = datetime.utcnow()
+    pending, leased = await asyncio.gather(
+        db.reviews.count_documents({"status": "pending"}),
+        db.reviews.count_documents({"status": "pending", "lease_expires_at": {"$gte": now}})
+    )
+    
+    return {
+        "pending": pending,
+        "leased": leased,
+        "available": pending - leased
+    }
+
+@router.post("/bulk-action")
+async def admin_bulk_review_action(
+    action_data: AdminBulkReviewAction,
+    current_user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Approve, reject or delete many reviews at once, either by id or by the
+    same filters as the review list. All changes go out in one bulk write and
+    each affected shop's rating is recomputed once.
+    """
+    admin = check_admin(current_user)
+    admin_id = str(admin["_id"])
+    # Millisecond precision, as stored, so the writes can be recognized below
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    
+    results = []
+    if action_data.review_ids:
+        object_ids = []
+        for review_id in dict.fromkeys(action_data.review_ids):
+            if ObjectId.is_valid(review_id):
+                object_ids.append(ObjectId(review_id))
+            else:
+                results.append({"id": review_id, "status": "invalid_id"})
+        reviews = await db.reviews.find(
+            {"_id": {"$in": object_ids}},
+            {"shop_id": 1, "lease_owner": 1, "lease_expires_at": 1}
+        ).to_list(len(object_ids))
+        found = {review["_id"] for review in reviews}
+        results.extend({"id": str(oid), "status": "not_found"} for oid in object_ids if oid not in found)
+        
+        # Leave reviews alone that another moderator has claimed
+        leased = [
+            r for r in reviews
+            if r.get("lease_expires_at") and r["lease_expires_at"] >= now and r.get("lease_owner") != admin_id
+        ]
+        results.extend({"id": str(r["_id"]), "status": "leased"} for r in leased)
+        reviews = [r for r in reviews if r not in leased]
+        has_more = False
+    elif action_data.filters:
+        query = build_review_query(**action_data.filters.dict())
+        query.update(claimable_filter(admin_id, now))
+        reviews = await db.reviews.find(
+            query,
+            {"shop_id": 1}
+        ).sort("created_at", -1).limit(action_data.limit + 1).to_list(action_data.limit + 1)
+        has_more = len(reviews) > action_data.limit
+        reviews = reviews[:action_data.limit]
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either review_ids or filters is required"
+        )
+    
+    # The lease is checked again in every write: another moderator may have
+    # claimed a review since it was read
+    claimable = claimable_filter(admin_id, now)
+    if action_data.action == "delete":
+        operations = [DeleteOne({"_id": review["_id"], **claimable}) for review in reviews]
+    else:
+        update_data = {
+            "status": "approved" if action_data.action == "approve" else "rejected",
+            "reviewed_by_admin": admin_id,
+            "review_date": now,
+            "updated_at": now
+        }
+        if action_data.admin_notes:
+            update_data["admin_notes"] = action_data.admin_notes
+        update_data.update({"lease_owner": None, "lease_expires_at": None})
+        operations = [UpdateOne({"_id": review["_id"], **claimable}, {"$set": update_data}) for review in reviews]
+    
+    failed = {}
+    applied = 0
+    if operations:
+        try:
+            result = await db.reviews.bulk_write(operations, ordered=False)
+            applied = result.deleted_count + result.matched_count
+        except BulkWriteError as e:
+            applied = e.details.get("nRemoved", 0) + e.details.get("nMatched", 0)
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "Write failed")
+    
+    skipped, gone = set(), set()
+    if applied + len(failed) < len(operations):
+        # Some filters no longer matched: find out which reviews were left alone
+        ids = [review["_id"] for review in reviews]
+        current = {
+            doc["_id"]: doc
+            async for doc in db.reviews.find({"_id": {"$in": ids}}, {"reviewed_by_admin": 1, "review_date": 1})
+        }
+        if action_data.action == "delete":
+            skipped = set(current)
+        else:
+            gone = set(ids) - set(current)
+            skipped = {
+                oid for oid, doc in current.items()
+                if doc.get("reviewed_by_admin") != admin_id or doc.get("review_date") != now
+            }
+    
+    succeeded = []
+    for index, review in enumerate(reviews):
+        if index in failed:
+            results.append({"id": str(review["_id"]), "status": "error", "error": failed[index]})
+        elif review["_id"] in skipped:
+            results.append({"id": str(review["_id"]), "status": "leased"})
+        elif review["_id"] in gone:
+            results.append({"id": str(review["_id"]), "status": "not_found"})
+        else:
+            succeeded.append(review)
+            results.append({"id": str(review["_id"]), "status": "ok"})
+    
+    if action_data.action == "delete" and succeeded:
+        deleted_ids = [str(review["_id"]) for review in succeeded]
+        await db.review_responses.delete_many({"review_id": {"$in": deleted_ids}})
+    
+    # Recompute each affected shop's rating once
+    from routes.review_routes import update_shop_rating
+    shop_ids = {review["shop_id"] for review in succeeded if review.get("shop_id")}
+    await asyncio.gather(*(update_shop_rating(shop_id, db) for shop_id in shop_ids))
+    
+    return {
+        "action": action_data.action,
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "affected_shops": len(shop_ids),
+        "has_more": has_more,
+        "results": results
+    }
+
 @router.post("/{review_id}/action")
 async def admin_review_action(
     review_id: str,
     action_data: AdminReviewAction,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Approve or reject a pending review."""
-    admin = await check_admin(email, db)
+    admin = check_admin(current_user)
     
     # Validate review exists
     if not ObjectId.is_valid(review_id):
@@ -231,16 +389,24 @@ async def admin_review_action(
         "status": new_status,
         "reviewed_by_admin": str(admin["_id"]),
         "review_date": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
+        "updated_at": datetime.utcnow(),
+        "lease_owner": None,
+        "lease_expires_at": None
     }
     
     if action_data.admin_notes:
         update_data["admin_notes"] = action_data.admin_notes
     
-    await db.reviews.update_one(
-        {"_id": ObjectId(review_id)},
+    # Only succeeds if no other moderator holds a lease on the review
+    result = await db.reviews.update_one(
+        {"_id": ObjectId(review_id), **claimable_filter(str(admin["_id"]), datetime.utcnow())},
         {"$set": update_data}
     )
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Review is being moderated by another admin"
+        )
     
     # Update shop rating if approved
     if action_data.action == "approve":
@@ -256,11 +422,11 @@ async def admin_review_action(
 @router.delete("/{review_id}")
 async def delete_review_admin(
     review_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete a review (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(review_id):
         raise HTTPException(
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models_admin import ShopUpdateAdmin
-from auth import get_current_user_email
+from auth import get_current_principal
+from services.response_cache import invalidate_shop_listings
+from services.deletion_jobs import schedule_shop_deletion
 from datetime import datetime
 from bson import ObjectId
 from typing import Optional
@@ -13,10 +15,9 @@ def get_db():
     from server import db
     return db
 
-async def check_admin(email: str, db: AsyncIOMotorDatabase):
+def check_admin(user: dict):
     """Check if user is admin."""
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -30,11 +31,11 @@ async def get_all_shops(
     search: Optional[str] = None,
     status_filter: Optional[str] = None,  # active, suspended, pending_review, banned
     verified: Optional[bool] = None,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get all shops with filtering (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     # Build query
     query = {}
@@ -108,11 +109,11 @@ async def get_all_shops(
 @router.get("/{shop_id}")
 async def get_shop_detail(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get detailed shop information (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -160,11 +161,11 @@ async def get_shop_detail(
 async def update_shop(
     shop_id: str,
     shop_data: ShopUpdateAdmin,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update shop (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -187,6 +188,7 @@ async def update_shop(
         {"_id": ObjectId(shop_id)},
         {"$set": update_data}
     )
+    await invalidate_shop_listings(shop.get("category"))
     
     return {"message": "Shop updated successfully"}
 
@@ -194,11 +196,11 @@ async def update_shop(
 async def verify_shop(
     shop_id: str,
     notes: Optional[str] = None,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Verify shop (admin only)."""
-    admin = await check_admin(email, db)
+    admin = check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -207,10 +209,13 @@ async def verify_shop(
         )
     
     # Update shop
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": ObjectId(shop_id)},
-        {"$set": {"is_verified": True, "verified_at": datetime.utcnow()}}
+        {"$set": {"is_verified": True, "verified_at": datetime.utcnow()}},
+        projection={"category": 1}
     )
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
     
     # Update verification record
     await db.shop_verifications.update_one(
@@ -232,11 +237,11 @@ async def verify_shop(
 async def suspend_shop(
     shop_id: str,
     reason: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Suspend shop (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -244,7 +249,7 @@ async def suspend_shop(
             detail="Invalid shop ID"
         )
     
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": ObjectId(shop_id)},
         {
             "$set": {
@@ -252,19 +257,22 @@ async def suspend_shop(
                 "suspended_reason": reason,
                 "suspended_at": datetime.utcnow()
             }
-        }
+        },
+        projection={"category": 1}
     )
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
     
     return {"message": "Shop suspended successfully"}
 
 @router.post("/{shop_id}/activate")
 async def activate_shop(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Activate shop (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -272,24 +280,27 @@ async def activate_shop(
             detail="Invalid shop ID"
         )
     
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": ObjectId(shop_id)},
         {
             "$set": {"status": "active"},
             "$unset": {"suspended_reason": "", "suspended_at": ""}
-        }
+        },
+        projection={"category": 1}
     )
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
     
     return {"message": "Shop activated successfully"}
 
-@router.delete("/{shop_id}")
+@router.delete("/{shop_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_shop(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Permanently delete shop (admin only)."""
-    await check_admin(email, db)
+    admin = check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -297,23 +308,27 @@ async def delete_shop(
             detail="Invalid shop ID"
         )
     
-    # Delete shop and all related data
-    await db.shops.delete_one({"_id": ObjectId(shop_id)})
-    await db.reviews.delete_many({"shop_id": shop_id})
-    await db.orders.delete_many({"shop_id": shop_id})
-    await db.shop_verifications.delete_many({"shop_id": shop_id})
+    shop = await db.shops.find_one({"_id": ObjectId(shop_id)}, {"category": 1})
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    # Hide the shop now, related data is removed in the background
+    job = await schedule_shop_deletion(db, shop, str(admin["_id"]))
     
-    return {"message": "Shop deleted successfully"}
+    return {"message": "Shop deleted successfully", "job_id": str(job["_id"])}
 
 @router.post("/{shop_id}/ban")
 async def ban_shop(
     shop_id: str,
     reason: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Ban shop permanently (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -321,7 +336,7 @@ async def ban_shop(
             detail="Invalid shop ID"
         )
     
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": ObjectId(shop_id)},
         {
             "$set": {
@@ -329,7 +344,10 @@ async def ban_shop(
                 "banned_reason": reason,
                 "banned_at": datetime.utcnow()
             }
-        }
+        },
+        projection={"category": 1}
     )
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
     
     return {"message": "Shop banned successfully"}
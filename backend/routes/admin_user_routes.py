@@ -1,10 +1,14 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models_admin import UserUpdateAdmin, LoginHistory, SecurityAlert
-from auth import get_current_user_email, get_password_hash
+from auth import get_current_principal, hash_password
+from services.deletion_jobs import schedule_user_deletion
+from services.principal_cache import get_principal_cache, revoke_user_tokens
+from services.user_sessions import SESSION_PROJECTION, end_session, end_user_sessions
 from datetime import datetime, timedelta
 from bson import ObjectId
 from typing import Optional
+import asyncio
 import math
 
 router = APIRouter(prefix="/admin/users", tags=["Admin - Users"])
@@ -13,16 +17,31 @@ def get_db():
     from server import db
     return db
 
-async def check_admin(email: str, db: AsyncIOMotorDatabase):
+def check_admin(user: dict):
     """Check if user is admin."""
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     return user
 
+async def count_by(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    field: str,
+    ids: list,
+    match: Optional[dict] = None
+) -> dict:
+    """Count documents per value of `field` for all `ids` in one aggregation."""
+    if not ids:
+        return {}
+    rows = await db[collection].aggregate([
+        {"$match": {field: {"$in": ids}, **(match or {})}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}}}
+    ]).to_list(len(ids))
+    return {row["_id"]: row["count"] for row in rows}
+
 @router.get("")
 async def get_all_users(
     page: int = Query(1, ge=1),
@@ -30,11 +49,11 @@ async def get_all_users(
     search: Optional[str] = None,
     role: Optional[str] = None,
     status: Optional[str] = None,  # active, inactive
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get all users with filtering (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     # Build query
     query = {}
@@ -59,17 +78,25 @@ async def get_all_users(
     cursor = db.users.find(query, {"password": 0}).skip(skip).limit(limit).sort("created_at", -1)
     users = await cursor.to_list(limit)
     
+    # Get user statistics for the whole page (three grouped queries)
+    user_ids = [str(user["_id"]) for user in users]
+    owner_ids = [str(user["_id"]) for user in users if user["role"] == "shop_owner"]
+    review_counts, order_counts, shop_counts = await asyncio.gather(
+        count_by(db, "reviews", "user_id", user_ids),
+        count_by(db, "orders", "user_id", user_ids),
+        count_by(db, "shops", "owner_id", owner_ids, {"status": {"$ne": "deleted"}})
+    )
+    
     # Format users
     for user in users:
         user["id"] = str(user["_id"])
         del user["_id"]
         
-        # Get user statistics
-        user["total_reviews"] = await db.reviews.count_documents({"user_id": user["id"]})
-        user["total_orders"] = await db.orders.count_documents({"user_id": user["id"]})
+        user["total_reviews"] = review_counts.get(user["id"], 0)
+        user["total_orders"] = order_counts.get(user["id"], 0)
         
         if user["role"] == "shop_owner":
-            user["total_shops"] = await db.shops.count_documents({"owner_id": user["id"]})
+            user["total_shops"] = shop_counts.get(user["id"], 0)
     
     return {
         "data": users,
@@ -81,11 +108,11 @@ async def get_all_users(
 @router.get("/{user_id}")
 async def get_user_detail(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get detailed user information (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -127,7 +154,7 @@ async def get_user_detail(
     
     # Get active sessions
     sessions = await db.user_sessions.find(
-        {"user_id": user_id, "is_active": True}
+        {"user_id": user_id, "is_active": True}, SESSION_PROJECTION
     ).to_list(100)
     
     for session in sessions:
@@ -153,11 +180,11 @@ async def get_user_detail(
 async def update_user(
     user_id: str,
     user_data: UserUpdateAdmin,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update user (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -180,6 +207,11 @@ async def update_user(
         {"_id": ObjectId(user_id)},
         {"$set": update_data}
     )
+    # Role and email are in the user's tokens, so those changes revoke them too
+    if update_data.get("is_active") is False or "role" in update_data or "email" in update_data:
+        await revoke_user_tokens(db, user_id)
+    else:
+        get_principal_cache().invalidate(user_id)
     
     return {"message": "User updated successfully"}
 
@@ -187,11 +219,11 @@ async def update_user(
 async def suspend_user(
     user_id: str,
     reason: Optional[str] = None,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Suspend/deactivate user (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -204,22 +236,19 @@ async def suspend_user(
         {"$set": {"is_active": False, "suspended_reason": reason, "suspended_at": datetime.utcnow()}}
     )
     
-    # Deactivate all sessions
-    await db.user_sessions.update_many(
-        {"user_id": user_id},
-        {"$set": {"is_active": False}}
-    )
+    # End all sessions and revoke their tokens
+    await end_user_sessions(db, user_id)
     
     return {"message": "User suspended successfully"}
 
 @router.post("/{user_id}/activate")
 async def activate_user(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Activate user (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -231,17 +260,18 @@ async def activate_user(
         {"_id": ObjectId(user_id)},
         {"$set": {"is_active": True}, "$unset": {"suspended_reason": "", "suspended_at": ""}}
     )
+    get_principal_cache().invalidate(user_id)
     
     return {"message": "User activated successfully"}
 
-@router.delete("/{user_id}")
+@router.delete("/{user_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Permanently delete user (admin only)."""
-    await check_admin(email, db)
+    admin = check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -249,27 +279,27 @@ async def delete_user(
             detail="Invalid user ID"
         )
     
-    # Delete user and all related data
-    await db.users.delete_one({"_id": ObjectId(user_id)})
-    await db.reviews.delete_many({"user_id": user_id})
-    await db.orders.delete_many({"user_id": user_id})
-    await db.user_sessions.delete_many({"user_id": user_id})
-    await db.login_history.delete_many({"user_id": user_id})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     
-    # If shop owner, delete or reassign shops
-    await db.shops.delete_many({"owner_id": user_id})
+    # Deactivate now; reviews, orders, sessions and owned shops are removed in the background
+    job = await schedule_user_deletion(db, user_id, str(admin["_id"]))
     
-    return {"message": "User deleted successfully"}
+    return {"message": "User deleted successfully", "job_id": str(job["_id"])}
 
 @router.post("/{user_id}/reset-password")
 async def reset_user_password(
     user_id: str,
     new_password: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Reset user password (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if not ObjectId.is_valid(user_id):
         raise HTTPException(
@@ -278,18 +308,15 @@ async def reset_user_password(
         )
     
     # Hash new password
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await hash_password(new_password)
     
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"password": hashed_password, "password_reset_at": datetime.utcnow()}}
     )
     
-    # Deactivate all sessions for security
-    await db.user_sessions.update_many(
-        {"user_id": user_id},
-        {"$set": {"is_active": False}}
-    )
+    # End all sessions for security
+    await end_user_sessions(db, user_id)
     
     return {"message": "Password reset successfully"}
 
@@ -297,11 +324,11 @@ async def reset_user_password(
 async def change_user_role(
     user_id: str,
     new_role: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Change user role (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     if new_role not in ["shopper", "shop_owner", "admin"]:
         raise HTTPException(
@@ -319,6 +346,7 @@ async def change_user_role(
         {"_id": ObjectId(user_id)},
         {"$set": {"role": new_role, "role_changed_at": datetime.utcnow()}}
     )
+    await revoke_user_tokens(db, user_id)
     
     return {"message": f"User role changed to {new_role}"}
 
@@ -326,45 +354,43 @@ async def change_user_role(
 async def terminate_session(
     user_id: str,
     session_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Terminate specific user session (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
-    await db.user_sessions.update_one(
-        {"_id": ObjectId(session_id), "user_id": user_id},
-        {"$set": {"is_active": False}}
-    )
+    if not await end_session(db, session_id, user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Active session not found"
+        )
     
     return {"message": "Session terminated successfully"}
 
 @router.post("/{user_id}/sessions/terminate-all")
 async def terminate_all_sessions(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Terminate all user sessions (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
-    result = await db.user_sessions.update_many(
-        {"user_id": user_id},
-        {"$set": {"is_active": False}}
-    )
+    terminated = await end_user_sessions(db, user_id)
     
-    return {"message": f"{result.modified_count} sessions terminated"}
+    return {"message": f"{terminated} sessions terminated"}
 
 @router.get("/{user_id}/login-history")
 async def get_login_history(
     user_id: str,
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get user login history (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     # Get total count
     total = await db.login_history.count_documents({"user_id": user_id})
@@ -392,11 +418,11 @@ async def get_login_history(
 @router.post("/{user_id}/2fa/enable")
 async def enable_2fa(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Enable 2FA for user (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
@@ -408,11 +434,11 @@ async def enable_2fa(
 @router.post("/{user_id}/2fa/disable")
 async def disable_2fa(
     user_id: str,
-    email: str = Depends(get_current_user_email),
+    current_user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Disable 2FA for user (admin only)."""
-    await check_admin(email, db)
+    check_admin(current_user)
     
     await db.users.update_one(
         {"_id": ObjectId(user_id)},
@@ -1,9 +1,20 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import UserCreate, UserLogin, User, UserResponse, Token, LoginResponse
-from auth import get_password_hash, verify_password, create_access_token, get_current_user_email
+from models import UserCreate, UserLogin, User, UserResponse, Token, LoginResponse, RefreshTokenRequest
+from auth import hash_password, verify_password, create_user_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
+from services.rollups import record as record_rollup
+from services.login_sketches import get_login_sketches
+from services.login_detector import get_login_detector
+from services.login_history import (
+    get_login_history_writer, FAILURE_UNKNOWN_USER, FAILURE_INVALID_PASSWORD, FAILURE_INACTIVE, FAILURE_RATE_LIMITED
+)
+from services.login_rate_limiter import get_login_rate_limiter
+from services.user_sessions import create_session, rotate_session, end_session, end_session_by_token
+from utils.request_info import get_client_ip, get_user_agent
 from datetime import datetime
+from typing import Optional
 from bson import ObjectId
+import math
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -12,7 +23,7 @@ def get_db():
     return db
 
 @router.post("/register", response_model=LoginResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Register a new user."""
     # Check if user already exists
     existing_user = await db.users.find_one({"email": user_data.email})
@@ -23,7 +34,7 @@ async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get
         )
     
     # Hash password
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     
     # Admins are automatically verified, others need email verification
     is_admin = user_data.role == "admin"
@@ -44,9 +55,10 @@ async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get
     # Insert user
     result = await db.users.insert_one(user_dict)
     user_dict["_id"] = str(result.inserted_id)
+    await record_rollup(db, signups=1)
     
-    # Create access token
-    access_token = create_access_token(data={"sub": user_data.email})
+    # Start a session
+    token = await start_session(request, db, user_dict)
     
     # Return user and token
     user_response = UserResponse(
@@ -60,22 +72,72 @@ async def register(user_data: UserCreate, db: AsyncIOMotorDatabase = Depends(get
     
     return LoginResponse(
         user=user_response,
-        token=Token(access_token=access_token)
+        token=token
+    )
+
+async def track_login(
+    request: Request,
+    email: str,
+    success: bool,
+    user_id: Optional[str] = None,
+    failure_reason: Optional[str] = None
+):
+    """
+    Queue the login attempt for login_history (and the rollups), count it in
+    the sketches and run it through the attack detector.
+    """
+    ip_address = get_client_ip(request)
+    user_agent = get_user_agent(request)
+    writer = get_login_history_writer()
+    get_login_sketches().add(ip_address, email, user_agent, success)
+    await writer.record_attempt(
+        email, success, ip_address, user_agent, user_id=user_id, failure_reason=failure_reason
+    )
+    for alert in get_login_detector().observe(email, ip_address, success, user_id):
+        await writer.record_alert(alert)
+
+async def start_session(request: Request, db: AsyncIOMotorDatabase, user: dict) -> Token:
+    """Create a session for a user who just logged in or registered, and its first tokens."""
+    session_id, refresh_token = await create_session(
+        db, str(user["_id"]), get_client_ip(request), get_user_agent(request)
+    )
+    return Token(
+        access_token=create_user_token(user, session_id),
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60
     )
 
 @router.post("/login", response_model=LoginResponse)
-async def login(credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def login(credentials: UserLogin, request: Request, db: AsyncIOMotorDatabase = Depends(get_db)):
     """Login user."""
+    limiter = get_login_rate_limiter()
+    
+    # Rate limit per IP and account before any lookup or bcrypt work
+    retry_after = await limiter.check(get_client_ip(request), credentials.email)
+    if retry_after:
+        await track_login(request, credentials.email, False, failure_reason=FAILURE_RATE_LIMITED)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    
     # Find user
     user = await db.users.find_one({"email": credentials.email})
     if not user:
+        await limiter.record_failure(credentials.email)
+        await track_login(request, credentials.email, False, failure_reason=FAILURE_UNKNOWN_USER)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
         )
     
+    user_id = str(user["_id"])
+    
     # Verify password
-    if not verify_password(credentials.password, user["password"]):
+    if not await verify_password(credentials.password, user["password"]):
+        await limiter.record_failure(credentials.email)
+        await track_login(request, credentials.email, False, user_id, FAILURE_INVALID_PASSWORD)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -83,13 +145,16 @@ async def login(credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_d
     
     # Check if user is active
     if not user.get("is_active", True):
+        await track_login(request, credentials.email, False, user_id, FAILURE_INACTIVE)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is inactive"
         )
     
-    # Create access token (allow login even if not verified)
-    access_token = create_access_token(data={"sub": user["email"]})
+    # Start a session (allow login even if not verified)
+    token = await start_session(request, db, user)
+    await limiter.record_success(credentials.email)
+    await track_login(request, credentials.email, True, user_id)
     
     # Return user and token with verification status
     user_response = UserResponse(
@@ -103,22 +168,12 @@ async def login(credentials: UserLogin, db: AsyncIOMotorDatabase = Depends(get_d
     
     return LoginResponse(
         user=user_response,
-        token=Token(access_token=access_token)
+        token=token
     )
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
+async def read_current_user(user: dict = Depends(get_current_user)):
     """Get current authenticated user."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     return UserResponse(
         id=str(user["_id"]),
         full_name=user["full_name"],
@@ -127,3 +182,39 @@ async def get_current_user(
         email_verified=user.get("email_verified", False),
         created_at=user["created_at"]
     )
+
+@router.post("/refresh", response_model=Token)
+async def refresh_token(body: RefreshTokenRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+    """Exchange a refresh token for a new access token and refresh token."""
+    rotated = await rotate_session(db, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    session, new_refresh_token = rotated
+    
+    # Role and suspension changes take effect here; a deleted or suspended
+    # user's session ends instead of living on with the rotated token
+    user_id = session.get("user_id")
+    user = None
+    if user_id and ObjectId.is_valid(user_id):
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+    if not user or not user.get("is_active", True):
+        await end_session(db, str(session["_id"]))
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    
+    return Token(
+        access_token=create_user_token(user, str(session["_id"])),
+        refresh_token=new_refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+
+@router.post("/logout")
+async def logout(body: RefreshTokenRequest, db: AsyncIOMotorDatabase = Depends(get_db)):
+    """End the session of a refresh token; its access tokens stop working too."""
+    await end_session_by_token(db, body.refresh_token)
+    return {"message": "Logged out successfully"}
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends, Request
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, Field
 from typing import Optional, Dict
-from auth import get_current_user_email
+from auth import get_current_user, get_current_principal, get_current_user_email
 from datetime import datetime
 import os
 try:
@@ -45,7 +45,7 @@ async def get_plans():
 @router.post("/checkout")
 async def create_checkout_session(
     request: CreateCheckoutRequest,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create Stripe checkout session for subscription."""
@@ -61,14 +61,6 @@ async def create_checkout_session(
             detail="Invalid plan ID"
         )
     
-    # Get user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     plan = SUBSCRIPTION_PLANS[request.plan_id]
     
     # Initialize Stripe
@@ -101,7 +93,7 @@ async def create_checkout_session(
             cancel_url=cancel_url,
             metadata={
                 "user_id": str(user["_id"]),
-                "user_email": email,
+                "user_email": user["email"],
                 "plan_id": request.plan_id,
                 "plan_name": plan["name"]
             }
@@ -113,7 +105,7 @@ async def create_checkout_session(
         transaction = {
             "session_id": session.session_id,
             "user_id": str(user["_id"]),
-            "user_email": email,
+            "user_email": user["email"],
             "plan_id": request.plan_id,
             "plan_name": plan["name"],
             "amount": plan["price"],
@@ -285,17 +277,10 @@ async def stripe_webhook(
 
 @router.get("/subscription")
 async def get_subscription(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get user's current subscription."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     plan_id = user.get("subscription_plan", "basic")
     plan = SUBSCRIPTION_PLANS.get(plan_id, SUBSCRIPTION_PLANS["basic"])
     
@@ -310,19 +295,12 @@ async def get_subscription(
 
 @router.get("/transactions")
 async def get_transactions(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get user's payment transactions."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     transactions = await db.payment_transactions.find(
-        {"user_email": email}
+        {"user_email": user["email"]}
     ).sort("created_at", -1).limit(10).to_list(10)
     
     for transaction in transactions:
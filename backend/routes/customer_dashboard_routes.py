@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Optional
 from datetime import datetime, timedelta
-from auth import get_current_user_email
+from auth import get_current_user, get_current_principal
 from bson import ObjectId
+from utils.pagination import cursor_filter, encode_cursor
+from utils.dataloader import Loaders, get_loaders
+import asyncio
+import re
 
 router = APIRouter(prefix="/customer", tags=["Customer Dashboard"])
 
@@ -11,58 +15,74 @@ def get_db():
     from server import db
     return db
 
+# sort_by -> (field, direction)
+REVIEW_SORTS = {
+    "newest": ("created_at", -1),
+    "oldest": ("created_at", 1),
+    "highest": ("rating", -1),
+    "lowest": ("rating", 1),
+}
+
+MY_REVIEW_FIELDS = {
+    "shop_id": 1,
+    "rating": 1,
+    "comment": 1,
+    "response": 1,
+    "has_response": 1,
+    "proof_order_number": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "status": 1
+}
+
+def _shop_object_ids(shop_ids: list) -> list:
+    """Shop ids are stored as strings on reviews; match both representations."""
+    ids = []
+    for shop_id in shop_ids:
+        ids.append(shop_id)
+        if isinstance(shop_id, str) and ObjectId.is_valid(shop_id):
+            ids.append(ObjectId(shop_id))
+    return ids
+
 @router.get("/dashboard")
 async def get_customer_dashboard(
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get customer dashboard overview with statistics and recent activities."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
-    # Get reviews statistics
-    reviews = await db.reviews.find({"user_id": user_id}).to_list(None)
-    total_reviews = len(reviews)
-    
-    # Calculate average rating given
-    avg_rating = sum(r.get("rating", 0) for r in reviews) / total_reviews if total_reviews > 0 else 0
+    # Review statistics, recent reviews, favorites and unread notifications at once
+    review_stats, recent_reviews, favorites, unread_notifications = await asyncio.gather(
+        db.reviews.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": None, "total": {"$sum": 1}, "avg_rating": {"$avg": "$rating"}}}
+        ]).to_list(1),
+        db.reviews.find(
+            {"user_id": user_id},
+            {"shop_id": 1, "rating": 1, "comment": 1, "created_at": 1, "has_response": 1, "response": 1}
+        ).sort("created_at", -1).limit(5).to_list(5),
+        db.favorites.count_documents({"user_id": user_id}),
+        db.notifications.count_documents({"user_id": user_id, "read": False})
+    )
     
-    # Get recent reviews (last 5)
-    recent_reviews = sorted(reviews, key=lambda x: x.get("created_at", datetime.min), reverse=True)[:5]
+    total_reviews = review_stats[0]["total"] if review_stats else 0
+    avg_rating = (review_stats[0]["avg_rating"] or 0) if review_stats else 0
     
     # Format recent reviews
+    shops = await loaders.shops.load_many(r.get("shop_id") for r in recent_reviews)
     formatted_reviews = []
-    for review in recent_reviews:
-        shop_id = review.get("shop_id")
-        # Try to convert to ObjectId if it's a string
-        try:
-            if isinstance(shop_id, str):
-                shop_id = ObjectId(shop_id)
-        except:
-            pass
-        
-        shop = await db.shops.find_one({"_id": shop_id})
+    for review, shop in zip(recent_reviews, shops):
         formatted_reviews.append({
             "id": str(review["_id"]),
             "shop_name": shop.get("name", "Unknown Shop") if shop else "Unknown Shop",
             "rating": review.get("rating"),
             "comment": review.get("comment", ""),
             "created_at": review.get("created_at"),
-            "has_response": bool(review.get("response"))
+            "has_response": bool(review.get("has_response") or review.get("response"))
         })
     
-    # Get favorite shops count
-    favorites = await db.favorites.count_documents({"user_id": user_id})
-    
-    # Get notifications count (unread)
-    unread_notifications = await db.notifications.count_documents({
-        "user_id": user_id,
-        "read": False
-    })
-    
     return {
         "user": {
             "id": user_id,
@@ -80,42 +100,78 @@ async def get_customer_dashboard(
 
 @router.get("/reviews")
 async def get_my_reviews(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders),
     sort_by: Optional[str] = "newest",
     shop_name: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100)
 ):
-    """Get all reviews by the customer with filtering and sorting."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+    """Get the customer's reviews with filtering, sorting and cursor pagination."""
     user_id = str(user["_id"])
+    sort_field, direction = REVIEW_SORTS.get(sort_by, REVIEW_SORTS["newest"])
+    conditions = [{"user_id": user_id}]
     
-    # Get all reviews
-    reviews = await db.reviews.find({"user_id": user_id}).to_list(None)
-    
-    # Enrich with shop data
-    enriched_reviews = []
-    for review in reviews:
-        shop_id = review.get("shop_id")
-        # Try to convert to ObjectId if it's a string
-        try:
-            if isinstance(shop_id, str):
-                shop_id = ObjectId(shop_id)
-        except:
-            pass
+    # Name filters only need the shops this user has reviewed
+    if shop_name or search:
+        reviewed_shop_ids = await db.reviews.distinct("shop_id", {"user_id": user_id})
         
-        shop = await db.shops.find_one({"_id": shop_id})
+        if shop_name:
+            matching = await db.shops.find(
+                {
+                    "_id": {"$in": _shop_object_ids(reviewed_shop_ids)},
+                    "name": {"$regex": re.escape(shop_name), "$options": "i"}
+                },
+                {"_id": 1}
+            ).to_list(None)
+            conditions.append({"shop_id": {"$in": [str(shop["_id"]) for shop in matching]}})
         
-        # Filter by shop name if provided
-        if shop_name and shop:
-            if shop_name.lower() not in shop.get("name", "").lower():
-                continue
-        
-        # Create enriched review
-        enriched_review = {
+        if search:
+            pattern = re.escape(search)
+            matching = await db.shops.find(
+                {
+                    "_id": {"$in": _shop_object_ids(reviewed_shop_ids)},
+                    "name": {"$regex": pattern, "$options": "i"}
+                },
+                {"_id": 1}
+            ).to_list(None)
+            conditions.append({
+                "$or": [
+                    {"comment": {"$regex": pattern, "$options": "i"}},
+                    {"shop_id": {"$in": [str(shop["_id"]) for shop in matching]}}
+                ]
+            })
+    
+    query = {"$and": conditions}
+    
+    try:
+        after = cursor_filter(cursor, sort_field, direction)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    page_query = {"$and": conditions + [after]} if after else query
+    
+    total, reviews = await asyncio.gather(
+        db.reviews.count_documents(query),
+        db.reviews.aggregate([
+            {"$match": page_query},
+            {"$sort": {sort_field: direction, "_id": direction}},
+            {"$limit": limit + 1},
+            {"$project": MY_REVIEW_FIELDS}
+        ]).to_list(limit + 1)
+    )
+    
+    has_more = len(reviews) > limit
+    reviews = reviews[:limit]
+    next_cursor = encode_cursor(reviews[-1], sort_field) if has_more else None
+    
+    # Enrich with shop data (one batched query)
+    shops = await loaders.shops.load_many(r.get("shop_id") for r in reviews)
+    enriched_reviews = []
+    for review, shop in zip(reviews, shops):
+        enriched_reviews.append({
             "id": str(review["_id"]),
             "shop_id": str(review.get("shop_id")),
             "shop_name": shop.get("name", "Unknown Shop") if shop else "Unknown Shop",
@@ -123,62 +179,36 @@ async def get_my_reviews(
             "rating": review.get("rating"),
             "comment": review.get("comment", ""),
             "response": review.get("response", ""),
+            "has_response": bool(review.get("has_response")),
+            "proof_order_number": review.get("proof_order_number"),
             "created_at": review.get("created_at"),
             "updated_at": review.get("updated_at"),
             "status": review.get("status", "published")
-        }
-        
-        # Filter by search term
-        if search:
-            search_lower = search.lower()
-            if not (search_lower in enriched_review["comment"].lower() or
-                    search_lower in enriched_review["shop_name"].lower()):
-                continue
-        
-        enriched_reviews.append(enriched_review)
-    
-    # Sort reviews
-    if sort_by == "newest":
-        enriched_reviews.sort(key=lambda x: x.get("created_at", datetime.min), reverse=True)
-    elif sort_by == "oldest":
-        enriched_reviews.sort(key=lambda x: x.get("created_at", datetime.min))
-    elif sort_by == "highest":
-        enriched_reviews.sort(key=lambda x: x.get("rating", 0), reverse=True)
-    elif sort_by == "lowest":
-        enriched_reviews.sort(key=lambda x: x.get("rating", 0))
+        })
     
     return {
         "reviews": enriched_reviews,
-        "total": len(enriched_reviews)
+        "total": total,
+        "next_cursor": next_cursor
     }
 
 @router.get("/favorites")
 async def get_favorites(
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get customer's favorite shops."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
     # Get favorites
     favorites = await db.favorites.find({"user_id": user_id}).to_list(None)
     
-    # Enrich with shop data
+    # Enrich with shop data (one batched query)
+    shops = await loaders.shops.load_many(fav.get("shop_id") for fav in favorites)
+    
     favorite_shops = []
-    for fav in favorites:
-        shop_id = fav.get("shop_id")
-        # Try to convert to ObjectId if it's a string
-        try:
-            if isinstance(shop_id, str):
-                shop_id = ObjectId(shop_id)
-        except:
-            pass
-        
-        shop = await db.shops.find_one({"_id": shop_id})
+    for fav, shop in zip(favorites, shops):
         if shop:
             favorite_shops.append({
                 "id": str(shop["_id"]),
@@ -195,19 +225,15 @@ async def get_favorites(
 @router.post("/favorites/{shop_id}")
 async def add_to_favorites(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Add shop to favorites."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
     # Check if shop exists
     shop = await db.shops.find_one({"_id": shop_id})
-    if not shop:
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(status_code=404, detail="Shop not found")
     
     # Check if already favorited
@@ -229,14 +255,10 @@ async def add_to_favorites(
 @router.delete("/favorites/{shop_id}")
 async def remove_from_favorites(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Remove shop from favorites."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
     result = await db.favorites.delete_one({"user_id": user_id, "shop_id": shop_id})
@@ -248,15 +270,11 @@ async def remove_from_favorites(
 
 @router.get("/notifications")
 async def get_notifications(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db),
     unread_only: bool = False
 ):
     """Get customer notifications."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
     query = {"user_id": user_id}
@@ -281,14 +299,10 @@ async def get_notifications(
 @router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Mark notification as read."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
     result = await db.notifications.update_one(
@@ -3,11 +3,12 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime
-from auth import get_current_user_email
-from passlib.context import CryptContext
+from auth import get_current_user, get_current_principal, verify_password, hash_password
+from services.principal_cache import get_principal_cache
+from services.user_sessions import end_user_sessions
+from services.deletion_jobs import schedule_user_deletion
 
 router = APIRouter(prefix="/customer/profile", tags=["Customer Profile"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_db():
     from server import db
@@ -25,14 +26,10 @@ class PasswordChange(BaseModel):
 
 @router.get("")
 async def get_profile(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get customer profile information."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     return {
         "id": str(user["_id"]),
         "full_name": user.get("full_name", ""),
@@ -48,65 +45,58 @@ async def get_profile(
 @router.put("")
 async def update_profile(
     profile_data: ProfileUpdate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update customer profile."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     update_data = {k: v for k, v in profile_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
     await db.users.update_one(
-        {"email": email},
+        {"_id": user["_id"]},
         {"$set": update_data}
     )
+    get_principal_cache().invalidate(user["_id"])
     
     return {"message": "Profile updated successfully"}
 
 @router.post("/change-password")
 async def change_password(
     password_data: PasswordChange,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Change customer password."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # The cached user document has no password hash
+    stored = await db.users.find_one({"_id": user["_id"]}, {"password": 1})
     
     # Verify current password
-    if not pwd_context.verify(password_data.current_password, user.get("password", "")):
+    if not await verify_password(password_data.current_password, stored.get("password", "")):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Hash new password
-    hashed_password = pwd_context.hash(password_data.new_password)
+    hashed_password = await hash_password(password_data.new_password)
     
     await db.users.update_one(
-        {"email": email},
+        {"_id": user["_id"]},
         {"$set": {"password": hashed_password, "updated_at": datetime.utcnow()}}
     )
+    get_principal_cache().invalidate(user["_id"])
+    
+    # Sign out every other session; tokens without a session id end them all
+    await end_user_sessions(db, str(user["_id"]), keep_session_id=user.get("sid"))
     
     return {"message": "Password changed successfully"}
 
-@router.delete("/account")
+@router.delete("/account", status_code=status.HTTP_202_ACCEPTED)
 async def delete_account(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete customer account."""
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     user_id = str(user["_id"])
     
-    # Delete user data
-    await db.users.delete_one({"email": email})
-    await db.reviews.delete_many({"user_id": user_id})
-    await db.favorites.delete_many({"user_id": user_id})
-    await db.notifications.delete_many({"user_id": user_id})
+    # Deactivate now, the account data is removed in the background
+    job = await schedule_user_deletion(db, user_id, user_id)
     
-    return {"message": "Account deleted successfully"}
+    return {"message": "Account deleted successfully", "job_id": str(job["_id"])}
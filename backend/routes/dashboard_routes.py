@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from auth import get_current_user_email
+from auth import get_current_user, get_current_principal
+from services.rollups import get_series, resolve_range
+from services.shop_analytics import PERIODS
+from models_extended import ShopAnalytics
+from utils.pagination import cursor_filter, encode_cursor
 from bson import ObjectId
 from datetime import datetime, timedelta
+from typing import Optional
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -12,18 +17,10 @@ def get_db():
 
 @router.get("/user")
 async def get_user_dashboard(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get user dashboard data."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     user_id = str(user["_id"])
     
     # Get statistics
@@ -72,18 +69,10 @@ async def get_user_dashboard(
 
 @router.get("/shop-owner")
 async def get_shop_owner_dashboard(
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get shop owner dashboard data."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     if user["role"] != "shop_owner" and user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -124,17 +113,11 @@ async def get_shop_owner_dashboard(
         review["id"] = str(review["_id"])
         del review["_id"]
     
-    # Get reviews that need response
-    unanswered_reviews = await db.reviews.find({
-        "shop_id": {"$in": shop_ids}
-    }).to_list(1000)
-    
-    # Check which reviews have responses
-    unanswered_count = 0
-    for review in unanswered_reviews:
-        response = await db.review_responses.find_one({"review_id": str(review["_id"])})
-        if not response:
-            unanswered_count += 1
+    # Count reviews that need a response
+    unanswered_count = await db.reviews.count_documents({
+        "shop_id": {"$in": shop_ids},
+        "has_response": {"$ne": True}
+    })
     
     # Analytics for last 30 days
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
@@ -161,3 +144,138 @@ async def get_shop_owner_dashboard(
         "shops": shops,
         "recent_reviews": recent_reviews
     }
+
+@router.get("/shop-owner/trends")
+async def get_shop_owner_trends(
+    shop_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    granularity: str = "day",  # day, hour
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get reviews, ratings and orders per day or hour for one or all of the owner's shops."""
+    if user["role"] != "shop_owner" and user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Shop owner role required."
+        )
+    
+    try:
+        start, end = resolve_range(start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    shops = await db.shops.find({"owner_id": str(user["_id"])}, {"_id": 1}).to_list(100)
+    shop_ids = [str(shop["_id"]) for shop in shops]
+    
+    if shop_id:
+        if shop_id not in shop_ids and user["role"] != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view this shop"
+            )
+        shop_ids = [shop_id]
+    
+    series = await get_series(db, shop_ids, granularity, start, end)
+    series["shop_ids"] = shop_ids
+    return series
+
+@router.get("/shop-owner/unanswered")
+async def get_unanswered_reviews(
+    shop_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get the owner's reviews without a response, newest first."""
+    if user["role"] != "shop_owner" and user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied. Shop owner role required."
+        )
+    
+    shops = await db.shops.find({"owner_id": str(user["_id"])}, {"name": 1}).to_list(100)
+    shop_names = {str(shop["_id"]): shop.get("name") for shop in shops}
+    shop_ids = list(shop_names)
+    
+    if shop_id:
+        if shop_id not in shop_names and user["role"] != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view this shop"
+            )
+        shop_ids = [shop_id]
+    
+    try:
+        after = cursor_filter(cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    query = {"shop_id": {"$in": shop_ids}, "has_response": {"$ne": True}, **after}
+    reviews = await db.reviews.find(
+        query,
+        {"proof_photos": 0, "proof_chat_history": 0, "verification_token": 0, "email": 0}
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(limit + 1)
+    
+    has_more = len(reviews) > limit
+    reviews = reviews[:limit]
+    next_cursor = encode_cursor(reviews[-1]) if has_more else None
+    
+    for review in reviews:
+        review["id"] = str(review["_id"])
+        del review["_id"]
+        review["shop_name"] = shop_names.get(review["shop_id"])
+    
+    return {
+        "data": reviews,
+        "next_cursor": next_cursor
+    }
+
+@router.get("/shop-owner/analytics")
+async def get_shop_analytics(
+    shop_id: str,
+    period: str = "daily",  # daily, weekly, monthly
+    limit: int = Query(30, ge=1, le=366),
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get the most recent ShopAnalytics snapshots of one of the owner's shops."""
+    if period not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Period must be one of: {', '.join(PERIODS)}"
+        )
+    
+    shop = None
+    if ObjectId.is_valid(shop_id):
+        shop = await db.shops.find_one({"_id": ObjectId(shop_id)}, {"owner_id": 1})
+    if not shop:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shop not found"
+        )
+    
+    if shop.get("owner_id") != str(user["_id"]) and user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this shop"
+        )
+    
+    snapshots = await db.shop_analytics.find(
+        {"shop_id": shop_id, "period": period},
+        {"_id": 0, "computed_at": 0}
+    ).sort("date", -1).limit(limit).to_list(limit)
+    
+    return {
+        "shop_id": shop_id,
+        "period": period,
+        "data": [ShopAnalytics(**snapshot) for snapshot in snapshots]
+    }
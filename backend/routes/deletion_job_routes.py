@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from auth import get_current_principal
+from services.deletion_jobs import format_job
+from bson import ObjectId
+from typing import Optional
+
+router = APIRouter(prefix="/deletion-jobs", tags=["Deletion Jobs"])
+
+def get_db():
+    from server import db
+    return db
+
+@router.get("")
+async def get_deletion_jobs(
+    status_filter: Optional[str] = None,  # pending, running, completed, failed
+    limit: int = Query(50, ge=1, le=200),
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """List deletion jobs, newest first (admin only)."""
+    if user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    query = {}
+    if status_filter:
+        query["status"] = status_filter
+
+    jobs = await db.deletion_jobs.find(query).sort("created_at", -1).limit(limit).to_list(limit)
+
+    return {"data": [format_job(job) for job in jobs]}
+
+@router.get("/{job_id}")
+async def get_deletion_job(
+    job_id: str,
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get progress of a deletion job (requester or admin)."""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid job ID"
+        )
+
+    job = await db.deletion_jobs.find_one({"_id": ObjectId(job_id)})
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+
+    if job.get("requested_by") != str(user["_id"]) and user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view this job"
+        )
+
+    return format_job(job)
@@ -4,6 +4,10 @@ from pydantic import BaseModel, HttpUrl
 from typing import Optional, List
 from urllib.parse import urlparse
 import re
+import os
+import asyncio
+from services.counter_materializer import read_counters
+from services.response_cache import get_cache
 
 router = APIRouter(prefix="/fake-check", tags=["Fake Shop Checker"])
 
@@ -139,23 +143,67 @@ async def check_shop_url(
             recommendations=recommendations
         )
 
-@router.get("/statistics")
-async def get_fake_shop_statistics(
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
-    """Get statistics about registered shops."""
+FAKE_CHECK_STATISTICS_CACHE_TTL = float(os.getenv("FAKE_CHECK_STATISTICS_CACHE_TTL", 60))
+
+# Rating histogram buckets: 0-1, 1-2, 2-3, 3-4, 4-5 (a 5.0 rating falls into 4-5)
+RATING_BUCKETS = ["0-1", "1-2", "2-3", "3-4", "4-5"]
+
+async def _load_shop_statistics(db: AsyncIOMotorDatabase) -> dict:
+    """Counts, average rating and rating histogram of all shops in one aggregation."""
+    shop_stats, counters = await asyncio.gather(
+        db.shops.aggregate([
+            {"$match": {"status": {"$ne": "deleted"}}},
+            {
+                "$facet": {
+                    "summary": [
+                        {
+                            "$group": {
+                                "_id": None,
+                                "total": {"$sum": 1},
+                                "verified": {"$sum": {"$cond": [{"$eq": ["$is_verified", True]}, 1, 0]}},
+                                "rated": {"$sum": {"$cond": [{"$gt": ["$review_count", 0]}, 1, 0]}},
+                                "avg_rating": {"$avg": {"$ifNull": ["$rating", 0]}}
+                            }
+                        }
+                    ],
+                    "histogram": [
+                        {"$match": {"review_count": {"$gt": 0}}},
+                        {
+                            "$group": {
+                                "_id": {"$min": [{"$floor": {"$ifNull": ["$rating", 0]}}, 4]},
+                                "count": {"$sum": 1}
+                            }
+                        }
+                    ]
+                }
+            }
+        ]).to_list(1),
+        read_counters(db, "reviews")
+    )
     
-    total_shops = await db.shops.count_documents({})
-    verified_shops = await db.shops.count_documents({"is_verified": True})
-    total_reviews = await db.reviews.count_documents({})
+    row = shop_stats[0] if shop_stats else {}
+    summary = row["summary"][0] if row.get("summary") else {}
+    total_shops = summary.get("total", 0)
+    verified_shops = summary.get("verified", 0)
     
-    # Calculate average rating
-    shops = await db.shops.find().to_list(None)
-    avg_rating = sum(s.get('rating', 0) for s in shops) / len(shops) if shops else 0
+    histogram = {label: 0 for label in RATING_BUCKETS}
+    for bucket in row.get("histogram", []):
+        histogram[RATING_BUCKETS[int(bucket["_id"])]] = bucket["count"]
     
     return {
         "total_shops": total_shops,
         "verified_shops": verified_shops,
-        "total_reviews": total_reviews,
-        "average_rating": round(avg_rating, 2)
+        "verified_share": round(verified_shops / total_shops * 100, 1) if total_shops else 0.0,
+        "total_reviews": counters["reviews"].get("total", 0),
+        "average_rating": round(summary.get("avg_rating") or 0, 2),
+        "rated_shops": summary.get("rated", 0),
+        "rating_histogram": histogram
     }
+
+@router.get("/statistics")
+async def get_fake_shop_statistics(
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Get statistics about registered shops."""
+    cache = get_cache("fake_check_statistics", FAKE_CHECK_STATISTICS_CACHE_TTL)
+    return await cache.get_or_set("statistics", lambda: _load_shop_statistics(db))
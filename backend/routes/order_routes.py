@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models_extended import OrderCreate, Order
-from auth import get_current_user_email
+from auth import get_current_principal
+from services.rollups import record as record_rollup
 from datetime import datetime
 from bson import ObjectId
 from typing import Optional
@@ -16,18 +17,10 @@ def get_db():
 @router.post("", response_model=Order, status_code=status.HTTP_201_CREATED)
 async def create_order(
     order_data: OrderCreate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a new order (authenticated users)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Validate shop exists
     if not ObjectId.is_valid(order_data.shop_id):
         raise HTTPException(
@@ -36,7 +29,7 @@ async def create_order(
         )
     
     shop = await db.shops.find_one({"_id": ObjectId(order_data.shop_id)})
-    if not shop:
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Shop not found"
@@ -54,6 +47,7 @@ async def create_order(
     
     result = await db.orders.insert_one(order_dict)
     order_dict["id"] = str(result.inserted_id)
+    await record_rollup(db, order_data.shop_id, orders=1, revenue=order_dict["amount"])
     
     return order_dict
 
@@ -62,18 +56,10 @@ async def get_orders(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     status_filter: Optional[str] = None,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get user's orders."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Build query
     query = {"user_id": str(user["_id"])}
     if status_filter:
@@ -128,7 +114,7 @@ async def get_orders(
 @router.get("/{order_id}", response_model=Order)
 async def get_order(
     order_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get single order by ID."""
@@ -138,14 +124,6 @@ async def get_order(
             detail="Invalid order ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     order = await db.orders.find_one({
         "_id": ObjectId(order_id),
         "user_id": str(user["_id"])
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import LowStarProofUpload
-from auth import get_current_user_email
+from auth import get_current_principal
 from datetime import datetime
 from bson import ObjectId
 from utils.content_filter import validate_proof_data
@@ -16,21 +16,13 @@ def get_db():
 async def upload_proof_for_low_star_review(
     review_id: str,
     proof_data: LowStarProofUpload,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Upload proof for low-star review (1-2 stars).
     Required: product photos, chat history, order number.
     """
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Validate review exists and belongs to user
     if not ObjectId.is_valid(review_id):
         raise HTTPException(
@@ -100,18 +92,10 @@ async def upload_proof_for_low_star_review(
 @router.get("/{review_id}/proof")
 async def get_review_proof(
     review_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get proof data for a review (user must be owner or admin)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get review
     if not ObjectId.is_valid(review_id):
         raise HTTPException(
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models_extended import ReviewResponseCreate, ReviewResponse
-from auth import get_current_user_email
+from auth import get_current_principal
 from datetime import datetime
 from bson import ObjectId
 
@@ -14,18 +14,10 @@ def get_db():
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_review_response(
     response_data: ReviewResponseCreate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a response to a review (shop owner only)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     if user["role"] != "shop_owner" and user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -71,6 +63,10 @@ async def create_review_response(
     })
     
     result = await db.review_responses.insert_one(response_dict)
+    await db.reviews.update_one(
+        {"_id": review["_id"]},
+        {"$set": {"has_response": True}}
+    )
     
     # Create clean response without _id field
     clean_response = {
@@ -108,7 +104,7 @@ async def get_review_response(
 @router.delete("/{response_id}")
 async def delete_review_response(
     response_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete a review response (owner only)."""
@@ -118,14 +114,6 @@ async def delete_review_response(
             detail="Invalid response ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get response
     response = await db.review_responses.find_one({"_id": ObjectId(response_id)})
     if not response:
@@ -142,5 +130,10 @@ async def delete_review_response(
         )
     
     await db.review_responses.delete_one({"_id": ObjectId(response_id)})
+    if ObjectId.is_valid(response["review_id"]):
+        await db.reviews.update_one(
+            {"_id": ObjectId(response["review_id"])},
+            {"$set": {"has_response": False}}
+        )
     
     return {"message": "Response deleted successfully"}
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import ReviewCreate, ReviewUpdate, Review, LowStarProofUpload
-from auth import get_current_user_email
+from auth import get_current_user, get_current_principal
 from datetime import datetime, timedelta
 from bson import ObjectId
 from typing import Optional
 import math
 from utils.content_filter import check_content, should_require_proof, calculate_trust_score_grade
+from services.response_cache import invalidate_shop_listings
+from services.rollups import record as record_rollup
+from services.moderation_queue import moderation_due_at
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -79,7 +82,7 @@ async def update_shop_rating(shop_id: str, db: AsyncIOMotorDatabase):
     except:
         shop_obj_id = shop_id
     
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": shop_obj_id},
         {
             "$set": {
@@ -88,8 +91,13 @@ async def update_shop_rating(shop_id: str, db: AsyncIOMotorDatabase):
                 "trust_grade": grade_info['grade'],
                 "trust_label": grade_info['label']
             }
-        }
+        },
+        projection={"category": 1}
     )
+    
+    # Listings sort and filter on rating, so they must not outlive the change
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
 
 @router.get("", response_model=dict)
 async def get_reviews(
@@ -189,18 +197,10 @@ async def get_reviews(
 @router.post("", response_model=Review, status_code=status.HTTP_201_CREATED)
 async def create_review(
     review_data: ReviewCreate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a new review (requires authentication)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Validate shop exists
     if not ObjectId.is_valid(review_data.shop_id):
         raise HTTPException(
@@ -209,7 +209,7 @@ async def create_review(
         )
     
     shop = await db.shops.find_one({"_id": ObjectId(review_data.shop_id)})
-    if not shop:
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Shop not found"
@@ -294,12 +294,17 @@ async def create_review(
         "verification_date": verification_date,
         "content_flags": flags,
         "is_flagged": len(flags) > 0,
+        "has_response": False,
         "proof_photos": review_data.proof_photos or [],
         "proof_order_number": review_data.proof_order_number,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     })
     
+    # Pending reviews join the moderation queue
+    if initial_status == "pending":
+        review_dict["moderation_due_at"] = moderation_due_at(review_dict, shop.get("review_count", 0))
+    
     # Insert review
     result = await db.reviews.insert_one(review_dict)
     review_dict["id"] = str(result.inserted_id)
@@ -310,6 +315,7 @@ async def create_review(
     
     # Update shop rating
     await update_shop_rating(review_data.shop_id, db)
+    await record_rollup(db, review_data.shop_id, reviews=1, rating_sum=review_data.rating)
     
     # Add user and shop info
     full_name = user.get("full_name", "")
@@ -325,7 +331,7 @@ async def create_review(
 async def update_review(
     review_id: str,
     review_data: ReviewUpdate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update review (owner only)."""
@@ -335,14 +341,6 @@ async def update_review(
             detail="Invalid review ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get review
     review = await db.reviews.find_one({"_id": ObjectId(review_id)})
     if not review:
@@ -411,7 +409,7 @@ async def update_review(
 @router.delete("/{review_id}")
 async def delete_review(
     review_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete review (owner only)."""
@@ -421,14 +419,6 @@ async def delete_review(
             detail="Invalid review ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get review
     review = await db.reviews.find_one({"_id": ObjectId(review_id)})
     if not review:
@@ -3,6 +3,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Optional, List
 import math
 from constants import SHOP_CATEGORIES
+from services.response_cache import get_shop_listing_cache, shop_listing_tags
 
 router = APIRouter(prefix="/search", tags=["Search"])
 
@@ -22,8 +23,38 @@ async def search_shops(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Advanced shop search with filters."""
+    # Free-text searches are too diverse to be worth caching
+    if q:
+        return await _load_search_page(db, q, category, min_rating, verified_only, sort_by, page, limit)
+    
+    cache = get_shop_listing_cache()
+    return await cache.get_or_set(
+        cache.make_key(
+            endpoint="search",
+            category=category,
+            min_rating=min_rating,
+            verified_only=verified_only,
+            sort_by=sort_by,
+            page=page,
+            limit=limit
+        ),
+        lambda: _load_search_page(db, None, category, min_rating, verified_only, sort_by, page, limit),
+        tags=shop_listing_tags(category)
+    )
+
+async def _load_search_page(
+    db: AsyncIOMotorDatabase,
+    q: Optional[str],
+    category: Optional[str],
+    min_rating: Optional[float],
+    verified_only: bool,
+    sort_by: str,
+    page: int,
+    limit: int
+) -> dict:
+    """Run the search queries for search_shops."""
     # Build query
-    query = {}
+    query = {"status": {"$ne": "deleted"}}
     
     if q:
         query["$or"] = [
@@ -108,7 +139,7 @@ async def get_search_suggestions(
     """Get search suggestions based on query."""
     # Search in shop names
     shops = await db.shops.find(
-        {"name": {"$regex": f"^{q}", "$options": "i"}}
+        {"name": {"$regex": f"^{q}", "$options": "i"}, "status": {"$ne": "deleted"}}
     ).limit(limit).to_list(limit)
     
     suggestions = []
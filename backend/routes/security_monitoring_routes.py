@@ -1,8 +1,12 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from auth import get_current_user_email
+from auth import get_current_principal
+from services.counter_materializer import read_counters
 from datetime import datetime, timedelta
 from typing import Optional
+from utils.dataloader import Loaders, get_loaders
+from services.login_sketches import distinct_counts
+import asyncio
 
 router = APIRouter(prefix="/security", tags=["Security Monitoring"])
 
@@ -14,13 +18,13 @@ def get_db():
 async def get_login_logs(
     limit: int = 50,
     days: int = 7,
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get login logs (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -33,15 +37,16 @@ async def get_login_logs(
         {"timestamp": {"$gte": since_date}}
     ).sort("timestamp", -1).limit(limit).to_list(limit)
     
-    # Enrich with user info
+    # Enrich with user info (one batched query)
+    users = await loaders.users.load_many(log.get("user_id") for log in login_logs)
+    
     result = []
-    for log in login_logs:
+    for log, user_info in zip(login_logs, users):
         log["id"] = str(log["_id"])
         del log["_id"]
         
         # Get user info
         if log.get("user_id"):
-            user_info = await db.users.find_one({"id": log["user_id"]})
             if user_info:
                 log["user_name"] = user_info.get("full_name", "Unknown")
                 log["user_email"] = user_info.get("email", "")
@@ -63,13 +68,12 @@ async def get_login_logs(
 async def get_failed_logins(
     limit: int = 50,
     days: int = 7,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get failed login attempts (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -90,29 +94,30 @@ async def get_failed_logins(
         del log["_id"]
         result.append(log)
     
-    # Calculate statistics
-    total_failed = len(result)
-    unique_ips = len(set(log.get("ip_address", "") for log in result if log.get("ip_address")))
-    unique_emails = len(set(log.get("email", "") for log in result if log.get("email")))
+    # Statistics cover the whole window, not just the returned page
+    total_failed, unique = await asyncio.gather(
+        db.login_history.count_documents({"success": False, "timestamp": {"$gte": since_date}}),
+        distinct_counts(db, days, ["failed_ip", "failed_email"])
+    )
     
     return {
         "data": result,
         "total": total_failed,
-        "unique_ips": unique_ips,
-        "unique_emails": unique_emails,
+        "unique_ips": unique["failed_ip"],
+        "unique_emails": unique["failed_email"],
         "days": days
     }
 
 @router.get("/suspicious-activities")
 async def get_suspicious_activities(
     limit: int = 50,
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get suspicious activities (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -123,15 +128,17 @@ async def get_suspicious_activities(
         {"resolved": False}
     ).sort("created_at", -1).limit(limit).to_list(limit)
     
+    # Get user info (one batched query)
+    users = await loaders.users.load_many(alert.get("user_id") for alert in alerts)
+    
     # Format results
     result = []
-    for alert in alerts:
+    for alert, user_info in zip(alerts, users):
         alert["id"] = str(alert["_id"])
         del alert["_id"]
         
         # Get user info if available
         if alert.get("user_id"):
-            user_info = await db.users.find_one({"id": alert["user_id"]})
             if user_info:
                 alert["user_name"] = user_info.get("full_name", "Unknown")
                 alert["user_email"] = user_info.get("email", "")
@@ -146,65 +153,65 @@ async def get_suspicious_activities(
 @router.get("/ip-tracking")
 async def get_ip_tracking(
     days: int = 7,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get IP tracking statistics (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
     
-    # Get login logs for IP analysis
+    # Group login logs per IP in the database; only the top 50 rows come back
     since_date = datetime.utcnow() - timedelta(days=days)
     
-    login_logs = await db.login_history.find(
-        {"timestamp": {"$gte": since_date}}
-    ).to_list(None)
-    
-    # Analyze IP addresses
-    ip_stats = {}
-    for log in login_logs:
-        ip = log.get("ip_address", "Unknown")
-        if ip not in ip_stats:
-            ip_stats[ip] = {
-                "ip_address": ip,
-                "total_attempts": 0,
-                "successful_logins": 0,
-                "failed_logins": 0,
-                "unique_users": set(),
-                "last_seen": log.get("timestamp")
+    result = await db.login_history.aggregate([
+        {"$match": {"timestamp": {"$gte": since_date}}},
+        {
+            "$group": {
+                "_id": {"$ifNull": ["$ip_address", "Unknown"]},
+                "total_attempts": {"$sum": 1},
+                "successful_logins": {"$sum": {"$cond": ["$success", 1, 0]}},
+                "failed_logins": {"$sum": {"$cond": ["$success", 0, 1]}},
+                "users": {"$addToSet": "$user_id"},
+                "last_seen": {"$max": "$timestamp"}
             }
-        
-        ip_stats[ip]["total_attempts"] += 1
-        if log.get("success"):
-            ip_stats[ip]["successful_logins"] += 1
-        else:
-            ip_stats[ip]["failed_logins"] += 1
-        
-        if log.get("user_id"):
-            ip_stats[ip]["unique_users"].add(log["user_id"])
-        
-        # Update last seen
-        if log.get("timestamp") > ip_stats[ip]["last_seen"]:
-            ip_stats[ip]["last_seen"] = log.get("timestamp")
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "ip_address": "$_id",
+                "total_attempts": 1,
+                "successful_logins": 1,
+                "failed_logins": 1,
+                "unique_users": {
+                    "$size": {"$filter": {"input": "$users", "cond": {"$ne": ["$$this", None]}}}
+                },
+                "last_seen": 1
+            }
+        },
+        {
+            "$facet": {
+                "top": [
+                    {"$addFields": {"risk_score": risk_score_expression()}},
+                    {"$sort": {"risk_score": -1, "failed_logins": -1}},
+                    {"$limit": 50}
+                ],
+                "total": [{"$count": "n"}]
+            }
+        }
+    ], allowDiskUse=True).to_list(1)
     
-    # Convert to list and format
-    result = []
-    for ip, stats in ip_stats.items():
-        stats["unique_users"] = len(stats["unique_users"])
+    row = result[0] if result else {}
+    top = row.get("top", [])
+    for stats in top:
         stats["risk_score"] = calculate_risk_score(stats)
-        result.append(stats)
-    
-    # Sort by risk score
-    result.sort(key=lambda x: x["risk_score"], reverse=True)
     
     return {
-        "data": result[:50],  # Top 50 IPs
-        "total": len(result),
+        "data": top,  # Top 50 IPs
+        "total": row["total"][0]["n"] if row.get("total") else 0,
         "days": days
     }
 
@@ -236,16 +243,44 @@ def calculate_risk_score(stats):
     
     return min(score, 100)
 
+def risk_score_expression():
+    """
+    calculate_risk_score as an aggregation expression over the grouped IP rows.
+    Keep both in sync: the expression ranks in the database, the function scores the result.
+    """
+    def tiers(value, steps):
+        branches = [{"case": {"$gt": [value, limit]}, "then": points} for limit, points in steps]
+        return {"$switch": {"branches": branches, "default": 0}}
+    
+    fail_ratio = {
+        "$cond": [
+            {"$gt": ["$total_attempts", 0]},
+            {"$divide": ["$failed_logins", "$total_attempts"]},
+            0
+        ]
+    }
+    return {
+        "$min": [
+            {
+                "$add": [
+                    tiers("$failed_logins", [(10, 50), (5, 30), (2, 10)]),
+                    tiers(fail_ratio, [(0.8, 30), (0.5, 20)]),
+                    tiers("$unique_users", [(5, 20), (3, 10)])
+                ]
+            },
+            100
+        ]
+    }
+
 @router.post("/resolve-alert/{alert_id}")
 async def resolve_security_alert(
     alert_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Mark security alert as resolved (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -275,13 +310,12 @@ async def resolve_security_alert(
 @router.get("/statistics")
 async def get_security_statistics(
     days: int = 7,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get security statistics overview (admin only)."""
     # Verify admin
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -307,22 +341,20 @@ async def get_security_statistics(
     })
     
     # Unresolved security alerts
-    security_alerts = await db.security_alerts.count_documents({
-        "resolved": False
-    })
+    counters = await read_counters(db, "security_alerts")
+    security_alerts = counters["security_alerts"].get("unresolved", 0)
     
-    # Unique IPs
-    login_logs = await db.login_history.find({
-        "timestamp": {"$gte": since_date}
-    }).to_list(None)
-    unique_ips = len(set(log.get("ip_address", "") for log in login_logs if log.get("ip_address")))
+    # Unique IPs, emails and user agents (approximate, from the daily sketches)
+    unique = await distinct_counts(db, days, ["ip", "email", "user_agent"])
     
     return {
         "total_logins": total_logins,
         "successful_logins": successful_logins,
         "failed_logins": failed_logins,
         "security_alerts": security_alerts,
-        "unique_ips": unique_ips,
+        "unique_ips": unique["ip"],
+        "unique_emails": unique["email"],
+        "unique_user_agents": unique["user_agent"],
         "days": days,
         "success_rate": round((successful_logins / total_logins * 100) if total_logins > 0 else 0, 2)
     }
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import ShopCreate, ShopUpdate, Shop
-from auth import get_current_user_email
+from auth import get_current_principal
+from services.response_cache import get_shop_listing_cache, shop_listing_tags, invalidate_shop_listings
+from services.deletion_jobs import schedule_shop_deletion
+from services.shop_analytics import get_shop_view_counter
+from routes.review_routes import format_user_name
 from datetime import datetime
 from bson import ObjectId
 from typing import List, Optional
+import asyncio
 import math
 
 router = APIRouter(prefix="/shops", tags=["Shops"])
@@ -22,8 +27,27 @@ async def get_shops(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get all shops with pagination and filters."""
+    # Free-text searches are too diverse to be worth caching
+    if search:
+        return await _load_shops_page(db, page, limit, category, search)
+    
+    cache = get_shop_listing_cache()
+    return await cache.get_or_set(
+        cache.make_key(endpoint="shops", page=page, limit=limit, category=category),
+        lambda: _load_shops_page(db, page, limit, category, None),
+        tags=shop_listing_tags(category)
+    )
+
+async def _load_shops_page(
+    db: AsyncIOMotorDatabase,
+    page: int,
+    limit: int,
+    category: Optional[str],
+    search: Optional[str]
+) -> dict:
+    """Run the listing queries for get_shops."""
     # Build query
-    query = {}
+    query = {"status": {"$ne": "deleted"}}
     if category:
         query["category"] = category
     if search:
@@ -71,7 +95,7 @@ async def get_shop(shop_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     if not shop:
         shop = await db.shops.find_one({"_id": shop_id})
     
-    if not shop:
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Shop not found with ID: {shop_id}"
@@ -83,21 +107,113 @@ async def get_shop(shop_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     
     return shop
 
-@router.post("", response_model=Shop, status_code=status.HTTP_201_CREATED)
-async def create_shop(
-    shop_data: ShopCreate,
-    email: str = Depends(get_current_user_email),
+@router.get("/{shop_id}/page")
+async def get_shop_page(
+    shop_id: str,
+    limit: int = Query(10, ge=1, le=50),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Create a new shop (requires shop_owner or admin role)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
+    """
+    Get everything the shop detail page renders in one call:
+    shop, rating stats, first page of reviews with responses and verification state.
+    Uses a constant number of queries regardless of the number of reviews.
+    """
+    id_candidates = [ObjectId(shop_id), shop_id] if ObjectId.is_valid(shop_id) else [shop_id]
+    # Same review filter as GET /reviews?shop_id=, so later pages line up
+    review_query = {"shop_id": shop_id}
+    
+    shop, reviews, total, distribution, verification = await asyncio.gather(
+        db.shops.find_one({"_id": {"$in": id_candidates}}),
+        db.reviews.find(
+            review_query,
+            {"proof_photos": 0, "proof_chat_history": 0, "verification_token": 0, "email": 0}
+        ).sort("created_at", -1).limit(limit).to_list(limit),
+        db.reviews.count_documents(review_query),
+        db.reviews.aggregate([
+            {"$match": review_query},
+            {"$group": {"_id": "$rating", "count": {"$sum": 1}}}
+        ]).to_list(5),
+        db.shop_verifications.find_one({"shop_id": shop_id}, sort=[("created_at", -1)])
+    )
+    
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+            detail=f"Shop not found with ID: {shop_id}"
         )
     
+    get_shop_view_counter().record_view(str(shop["_id"]))
+    
+    # Batch-load responses, then authors and responders in a single users query
+    review_ids = [str(r["_id"]) for r in reviews]
+    responses = await db.review_responses.find({"review_id": {"$in": review_ids}}).to_list(len(review_ids))
+    responses_by_review = {r["review_id"]: r for r in responses}
+    
+    user_ids = {r["user_id"] for r in reviews if r.get("user_id")}
+    user_ids.update(r["responder_id"] for r in responses if r.get("responder_id"))
+    user_oids = [ObjectId(u) for u in user_ids if ObjectId.is_valid(u)]
+    users = await db.users.find(
+        {"_id": {"$in": user_oids}},
+        {"full_name": 1}
+    ).to_list(len(user_oids)) if user_oids else []
+    names = {str(u["_id"]): u.get("full_name", "") for u in users}
+    
+    shop["id"] = str(shop["_id"])
+    del shop["_id"]
+    
+    for review in reviews:
+        review["id"] = str(review["_id"])
+        del review["_id"]
+        
+        full_name = names.get(review.get("user_id"), "")
+        review["user_name"] = format_user_name(full_name)
+        name_parts = full_name.split() if full_name else ["V", "K"]
+        review["user_initials"] = "".join([part[0].upper() for part in name_parts[:2]])
+        review["shop_name"] = shop.get("name", "")
+        review["shop_website"] = shop.get("website", "")
+        
+        response = responses_by_review.get(review["id"])
+        if response:
+            response["id"] = str(response["_id"])
+            del response["_id"]
+            if response.get("responder_id") in names:
+                response["responder_name"] = names[response["responder_id"]]
+        review["response"] = response
+    
+    rating_counts = {str(star): 0 for star in range(1, 6)}
+    for bucket in distribution:
+        if bucket["_id"] is not None:
+            rating_counts[str(bucket["_id"])] = bucket["count"]
+    
+    return {
+        "shop": shop,
+        "rating": {
+            "average": shop.get("rating", 0.0),
+            "review_count": shop.get("review_count", 0),
+            "trust_grade": shop.get("trust_grade"),
+            "trust_label": shop.get("trust_label"),
+            "distribution": rating_counts
+        },
+        "reviews": {
+            "data": reviews,
+            "total": total,
+            "page": 1,
+            "pages": math.ceil(total / limit) if total > 0 else 1
+        },
+        "verification": {
+            "is_verified": shop.get("is_verified", False),
+            "verification_status": verification["status"] if verification else "not_requested",
+            "verified_at": verification.get("verified_at") if verification else None
+        }
+    }
+
+@router.post("", response_model=Shop, status_code=status.HTTP_201_CREATED)
+async def create_shop(
+    shop_data: ShopCreate,
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Create a new shop (requires shop_owner or admin role)."""
     # Check if user has shop_owner or admin role
     if user.get("role") not in ["shop_owner", "admin"]:
         raise HTTPException(
@@ -119,6 +235,7 @@ async def create_shop(
     # Insert shop
     result = await db.shops.insert_one(shop_dict)
     shop_dict["id"] = str(result.inserted_id)
+    await invalidate_shop_listings(shop_dict["category"])
     
     # Remove _id field to avoid validation error
     if "_id" in shop_dict:
@@ -130,7 +247,7 @@ async def create_shop(
 async def update_shop(
     shop_id: str,
     shop_data: ShopUpdate,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update shop (owner only)."""
@@ -140,14 +257,6 @@ async def update_shop(
             detail="Invalid shop ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get shop
     shop = await db.shops.find_one({"_id": ObjectId(shop_id)})
     if not shop:
@@ -175,6 +284,7 @@ async def update_shop(
     # Return updated shop
     updated_shop = await db.shops.find_one({"_id": ObjectId(shop_id)})
     updated_shop["id"] = str(updated_shop["_id"])
+    await invalidate_shop_listings(shop.get("category"), updated_shop.get("category"))
     
     # Remove _id field to avoid serialization error
     if "_id" in updated_shop:
@@ -182,10 +292,10 @@ async def update_shop(
     
     return updated_shop
 
-@router.delete("/{shop_id}")
+@router.delete("/{shop_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_shop(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete shop (owner only)."""
@@ -195,17 +305,9 @@ async def delete_shop(
             detail="Invalid shop ID"
         )
     
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Get shop
     shop = await db.shops.find_one({"_id": ObjectId(shop_id)})
-    if not shop:
+    if not shop or shop.get("status") == "deleted":
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Shop not found"
@@ -218,8 +320,7 @@ async def delete_shop(
             detail="Not authorized to delete this shop"
         )
     
-    # Delete shop and its reviews
-    await db.shops.delete_one({"_id": ObjectId(shop_id)})
-    await db.reviews.delete_many({"shop_id": shop_id})
+    # Hide the shop now, related data is removed in the background
+    job = await schedule_shop_deletion(db, shop, str(user["_id"]))
     
-    return {"message": "Shop deleted successfully"}
+    return {"message": "Shop deleted successfully", "job_id": str(job["_id"])}
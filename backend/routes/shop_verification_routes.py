@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models_extended import ShopVerification
-from auth import get_current_user_email
+from auth import get_current_principal
+from services.response_cache import invalidate_shop_listings
 from datetime import datetime
 from bson import ObjectId
+from utils.dataloader import Loaders, get_loaders
 
 router = APIRouter(prefix="/shop-verification", tags=["Shop Verification"])
 
@@ -14,18 +16,10 @@ def get_db():
 @router.post("/request/{shop_id}")
 async def request_verification(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Request shop verification."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
     # Validate shop
     if not ObjectId.is_valid(shop_id):
         raise HTTPException(
@@ -89,13 +83,11 @@ async def request_verification(
 @router.post("/approve/{shop_id}")
 async def approve_verification(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Approve shop verification (admin only)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -114,23 +106,24 @@ async def approve_verification(
     )
     
     # Update shop
-    await db.shops.update_one(
+    shop = await db.shops.find_one_and_update(
         {"_id": ObjectId(shop_id)},
-        {"$set": {"is_verified": True}}
+        {"$set": {"is_verified": True}},
+        projection={"category": 1}
     )
+    if shop:
+        await invalidate_shop_listings(shop.get("category"))
     
     return {"message": "Shop verified successfully"}
 
 @router.post("/reject/{shop_id}")
 async def reject_verification(
     shop_id: str,
-    email: str = Depends(get_current_user_email),
+    user: dict = Depends(get_current_principal),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Reject shop verification (admin only)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -153,13 +146,12 @@ async def reject_verification(
 @router.get("/all")
 async def get_all_verification_requests(
     status_filter: str = "pending",  # pending, verified, rejected, all
-    email: str = Depends(get_current_user_email),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    user: dict = Depends(get_current_principal),
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    loaders: Loaders = Depends(get_loaders)
 ):
     """Get all verification requests (admin only)."""
-    # Get current user
-    user = await db.users.find_one({"email": email})
-    if not user or user["role"] != "admin":
+    if user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -189,9 +181,15 @@ async def get_all_verification_requests(
     
     verifications = await db.shop_verifications.aggregate(pipeline).to_list(None)
     
+    # Get owner info (one batched query)
+    owners = await loaders.users.load_many(
+        v["shop_info"][0].get("owner_id") if v.get("shop_info") else None
+        for v in verifications
+    )
+    
     # Format and enrich data
     result = []
-    for verification in verifications:
+    for verification, owner in zip(verifications, owners):
         verification["id"] = str(verification["_id"])
         del verification["_id"]
         
@@ -201,13 +199,9 @@ async def get_all_verification_requests(
             verification["shop_website"] = shop.get("website", "")
             verification["shop_category"] = shop.get("category", "")
             
-            # Get owner info
-            owner_id = shop.get("owner_id")
-            if owner_id:
-                owner = await db.users.find_one({"id": owner_id})
-                if owner:
-                    verification["owner_name"] = owner.get("full_name", "Unknown")
-                    verification["owner_email"] = owner.get("email", "")
+            if owner:
+                verification["owner_name"] = owner.get("full_name", "Unknown")
+                verification["owner_email"] = owner.get("email", "")
         else:
             verification["shop_name"] = "Unknown"
             verification["shop_website"] = ""
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import StatisticsResponse
+from services.platform_counters import get_platform_statistics
 
 router = APIRouter(prefix="/statistics", tags=["Statistics"])
 
@@ -10,26 +11,5 @@ def get_db():
 
 @router.get("", response_model=StatisticsResponse)
 async def get_statistics(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get platform statistics."""
-    # Count users (shoppers)
-    user_count = await db.users.count_documents({"role": "shopper"})
-    
-    # Count shops
-    shop_count = await db.shops.count_documents({})
-    
-    # Count reviews as proxy for transactions
-    review_count = await db.reviews.count_documents({})
-    
-    # Format numbers
-    def format_number(num):
-        if num >= 1000000:
-            return f"{num / 1000000:.1f} Million".replace(".0", "")
-        elif num >= 1000:
-            return f"{num / 1000:.1f}K".replace(".0", "")
-        return str(num)
-    
-    return StatisticsResponse(
-        shoppers=format_number(user_count),
-        shops=format_number(shop_count),
-        dailyTransactions=format_number(review_count)
-    )
+    """Get platform statistics (served from the background-refreshed counters cache)."""
+    return await get_platform_statistics().get(db)
@@ -1,9 +1,11 @@
 from fastapi import FastAPI, APIRouter, Request
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 import os
 import logging
 from pathlib import Path
+from datetime import timedelta
 
 # Import route modules
 from routes import (
@@ -26,8 +28,17 @@ from routes import (
     customer_profile_routes,
     fake_shop_checker_routes,
     security_monitoring_routes,
-    email_verification_routes
+    email_verification_routes,
+    deletion_job_routes
 )
+from services.deletion_jobs import get_deletion_worker
+from services.platform_counters import get_platform_statistics
+from services.counter_materializer import get_counter_materializer
+from services.shop_analytics import get_shop_view_counter, get_shop_analytics_job
+from services.login_sketches import get_login_sketches
+from services.login_history import get_login_history_writer
+from services.token_revocations import get_token_revocations
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Load .env for local development only
 if os.getenv("RAILWAY_ENV") != "production":
@@ -84,6 +95,7 @@ api_router.include_router(admin_review_routes.router)
 api_router.include_router(security_monitoring_routes.router)
 api_router.include_router(email_verification_routes.router)
 api_router.include_router(proof_upload_routes.router)
+api_router.include_router(deletion_job_routes.router)
 
 app.include_router(api_router)
 
@@ -102,6 +114,28 @@ app.add_middleware(
 # -------------------------------
 # Startup / Shutdown Events
 # -------------------------------
+# Server error code when an index exists with the same keys but other options
+INDEX_OPTIONS_CONFLICT = 85
+
+async def ensure_ttl_index(collection, field: str, expire_after_seconds: int):
+    """Create a TTL index, or change the expiry of an existing one in place with collMod."""
+    try:
+        await collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            logger.error(f"❌ Failed to create TTL index {collection.name}.{field}: {e}")
+            return
+        try:
+            await collection.database.command({
+                "collMod": collection.name,
+                "index": {"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds}
+            })
+            logger.info(f"Updated TTL of {collection.name}.{field} to {expire_after_seconds}s")
+        except Exception as e:
+            logger.error(f"❌ Failed to update TTL index {collection.name}.{field}: {e}")
+    except Exception as e:
+        logger.error(f"❌ Failed to create TTL index {collection.name}.{field}: {e}")
+
 @app.on_event("startup")
 async def startup_event():
     """Connect to MongoDB and create indexes"""
@@ -132,6 +166,12 @@ async def startup_event():
         await db.users.create_index("email", unique=True)
         await db.users.create_index("role")
         await db.users.create_index("is_active")
+        await db.users.create_index("created_at")
+        await db.shops.create_index("created_at")
+        await db.reviews.create_index("created_at")
+        await db.orders.create_index("created_at")
+        await db.rollups.create_index([("scope", 1), ("granularity", 1), ("bucket", 1)], unique=True)
+        await db.shop_analytics.create_index([("shop_id", 1), ("period", 1), ("date", -1)], unique=True)
         await db.shops.create_index("owner_id")
         await db.shops.create_index("category")
         await db.shops.create_index("is_verified")
@@ -139,7 +179,12 @@ async def startup_event():
         await db.shops.create_index("status")
         await db.reviews.create_index("shop_id")
         await db.reviews.create_index("user_id")
+        await db.reviews.create_index([("user_id", 1), ("created_at", -1)])
+        await db.reviews.create_index([("user_id", 1), ("rating", -1)])
         await db.reviews.create_index([("user_id", 1), ("shop_id", 1)], unique=True)
+        await db.reviews.create_index([("shop_id", 1), ("has_response", 1), ("created_at", -1)])
+        await db.reviews.create_index([("status", 1), ("moderation_due_at", 1), ("created_at", 1)])
+        await db.reviews.create_index([("lease_owner", 1), ("lease_expires_at", 1)], sparse=True)
         await db.orders.create_index("user_id")
         await db.orders.create_index("shop_id")
         await db.orders.create_index("order_number", unique=True)
@@ -148,18 +193,50 @@ async def startup_event():
         await db.review_responses.create_index("shop_id")
         await db.login_history.create_index("user_id")
         await db.login_history.create_index("timestamp")
+        await db.login_history.create_index([("timestamp", -1), ("ip_address", 1)])
+        await db.login_sketches.create_index([("date", 1), ("kind", 1)], unique=True)
         await db.user_sessions.create_index("user_id")
+        await db.user_sessions.create_index("session_token")
+        await db.user_sessions.create_index("previous_token", sparse=True)
         await db.user_sessions.create_index("is_active")
         await db.security_alerts.create_index("user_id")
         await db.security_alerts.create_index("resolved")
+        await db.favorites.create_index("user_id")
+        await db.favorites.create_index("shop_id")
+        await db.notifications.create_index("user_id")
+        await db.deletion_jobs.create_index([("status", 1), ("created_at", 1)])
+        await db.deletion_jobs.create_index([("entity_type", 1), ("entity_id", 1)])
         logger.info("✅ Database indexes created successfully")
     except Exception as e:
         logger.error(f"❌ Failed to create indexes: {e}")
 
+    # TTL indexes on their own, so a changed expiry neither fails nor skips the rest
+    # Revocations only matter while the tokens they revoke can still be valid (plus some slack)
+    await ensure_ttl_index(db.token_revocations, "revoked_at", ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 3600)
+    await ensure_ttl_index(db.user_sessions, "expires_at", 0)
+
+    # Start background workers
+    get_deletion_worker().start(db)
+    await get_counter_materializer().start(db)
+    await get_platform_statistics().start(db)
+    get_shop_view_counter().start(db)
+    get_shop_analytics_job().start(db)
+    get_login_sketches().start(db)
+    get_login_history_writer().start(db)
+    await get_token_revocations().start(db, retention=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close MongoDB connection"""
     logger.info("Shutting down TrustedShops Clone API...")
+    await get_deletion_worker().stop()
+    await get_platform_statistics().stop()
+    await get_counter_materializer().stop()
+    await get_shop_view_counter().stop()
+    await get_shop_analytics_job().stop()
+    await get_login_history_writer().stop()
+    await get_login_sketches().stop()
+    await get_token_revocations().stop()
     client = getattr(app.state, "mongo_client", None)
     if client:
         client.close()
@@ -0,0 +1,476 @@
+"""
+Materialized counters for dashboards.
+
+Each tracked collection has one document in the ``counters`` collection
+(``_id`` = collection name) holding its totals broken down by role, status,
+verification or alert severity. Dashboards read these documents instead of
+running ``count_documents`` on every page load.
+
+The documents are maintained incrementally, like the role counter the
+public statistics started with: every change event is turned into ``$inc``
+deltas - the counters the document counted in before the change are
+decremented, the ones it counts in afterwards incremented. Deltas are
+batched for COUNTER_DEBOUNCE_SECONDS and written together with the change
+stream resume token, so a restart resumes exactly where the last batch
+ended. The previous state of updated and deleted documents comes from
+change stream pre-images (MongoDB 6.0+), which are enabled on the tracked
+collections; an event without one triggers a recount of that collection.
+
+A full recount with one ``$facet`` aggregation is only used to build a
+missing document, after the resume token expired, or on a standalone
+mongod without change streams (every COUNTER_POLL_INTERVAL seconds).
+
+Only one process materializes: workers compete for a lease document and
+the holder renews it. Each batch is written only if the stored resume token
+is still the one the batch started from, so even two overlapping holders
+cannot apply the same events twice.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+COUNTER_DEBOUNCE_SECONDS = float(os.getenv("COUNTER_DEBOUNCE_SECONDS", 1))
+COUNTER_POLL_INTERVAL = float(os.getenv("COUNTER_POLL_INTERVAL", 30))
+COUNTER_LEASE_SECONDS = float(os.getenv("COUNTER_LEASE_SECONDS", 30))
+
+COUNTER_LEASE_ID = "counter_materializer"
+
+# Error codes meaning "change streams are not available on this deployment"
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324}
+# Resume token no longer in the oplog
+CHANGE_STREAM_HISTORY_LOST = {136, 280, 286}
+NAMESPACE_NOT_FOUND = 26
+
+
+# A counter is (field to group by or None for a plain count, default group
+# for a missing field, filter on the document)
+Counter = Tuple[Optional[str], Optional[str], dict]
+
+def _count(match: Optional[dict] = None) -> Counter:
+    return (None, None, match or {})
+
+
+def _group(field: str, default: Optional[str] = None, match: Optional[dict] = None) -> Counter:
+    return (field, default, match or {})
+
+
+# collection -> counters stored in its document
+COUNTER_SPECS: Dict[str, Dict[str, Counter]] = {
+    "users": {
+        "total": _count(),
+        "active": _count({"is_active": True}),
+        "by_role": _group("role"),
+    },
+    "shops": {
+        "total": _count({"status": {"$ne": "deleted"}}),
+        "verified": _count({"is_verified": True, "status": {"$ne": "deleted"}}),
+        "by_status": _group("status", "active"),
+    },
+    "reviews": {
+        "total": _count(),
+        "by_status": _group("status", "published"),
+    },
+    "orders": {
+        "total": _count(),
+        "by_status": _group("status", "pending"),
+    },
+    "shop_verifications": {
+        "total": _count(),
+        "by_status": _group("status", "pending"),
+    },
+    "security_alerts": {
+        "total": _count(),
+        "unresolved": _count({"resolved": False}),
+        "unresolved_by_severity": _group("severity", "low", {"resolved": False}),
+    },
+}
+
+
+def counted_fields(collection: str) -> List[str]:
+    """The fields whose values decide which counters a document is in."""
+    fields = []
+    for field, _, match in COUNTER_SPECS[collection].values():
+        for name in ([field] if field else []) + list(match):
+            if name not in fields:
+                fields.append(name)
+    return fields
+
+
+def _facet(counter: Counter) -> List[dict]:
+    field, default, match = counter
+    stages = [{"$match": match}] if match else []
+    if field is None:
+        return stages + [{"$count": "n"}]
+    key = {"$ifNull": [f"${field}", default]} if default else f"${field}"
+    return stages + [{"$group": {"_id": key, "count": {"$sum": 1}}}]
+
+
+def _equals(value, expected) -> bool:
+    # Query semantics: {"is_active": True} does not match 1
+    if isinstance(expected, bool):
+        return value is expected
+    return value == expected
+
+
+def _matches(doc: dict, match: dict) -> bool:
+    """Evaluate the equality and $ne filters used in COUNTER_SPECS against a document."""
+    for field, condition in match.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$ne" in condition and _equals(value, condition["$ne"]):
+                return False
+        elif not _equals(value, condition):
+            return False
+    return True
+
+
+def counter_deltas(collection: str, doc: Optional[dict], sign: int, deltas: Dict[str, int]):
+    """Add `sign` to every counter path (e.g. ``by_role.shopper``) the document is counted in."""
+    if doc is None:
+        return
+    for name, (field, default, match) in COUNTER_SPECS[collection].items():
+        if not _matches(doc, match):
+            continue
+        if field is None:
+            path = name
+        else:
+            value = doc.get(field)
+            if value is None:
+                value = default
+            if value is None:
+                continue
+            path = f"{name}.{value}"
+        deltas[path] = deltas.get(path, 0) + sign
+
+
+def change_deltas(collection: str, change: dict) -> Optional[Dict[str, int]]:
+    """
+    The counter deltas of one change event, or None when the document's
+    previous state is unknown (no pre-image) and only a recount can tell.
+    """
+    operation = change["operationType"]
+    deltas: Dict[str, int] = {}
+    if operation == "insert":
+        counter_deltas(collection, change["fullDocument"], 1, deltas)
+        return deltas
+
+    before = change.get("fullDocumentBeforeChange")
+    if before is None:
+        return None
+
+    if operation == "delete":
+        after = None
+    elif operation == "replace":
+        after = change["fullDocument"]
+    else:
+        # Counted fields are top-level, so the update description is enough
+        after = dict(before)
+        description = change.get("updateDescription", {})
+        after.update(description.get("updatedFields", {}))
+        for field in description.get("removedFields", []):
+            after.pop(field, None)
+
+    counter_deltas(collection, before, -1, deltas)
+    counter_deltas(collection, after, 1, deltas)
+    return {path: value for path, value in deltas.items() if value}
+
+
+def _change_filter(fields: List[str]) -> List[dict]:
+    """Only inserts, deletes, replaces and updates touching a counted field matter."""
+    touched = []
+    for field in fields:
+        touched.append({f"updateDescription.updatedFields.{field}": {"$exists": True}})
+        touched.append({"updateDescription.removedFields": field})
+    return [{
+        "$match": {
+            "$or": [
+                {"operationType": {"$in": ["insert", "delete", "replace"]}},
+                {"operationType": "update", "$or": touched},
+            ]
+        }
+    }]
+
+
+async def compute_counters(db: AsyncIOMotorDatabase, collection: str) -> dict:
+    """Recompute the counter document for one collection in a single pass."""
+    counters_spec = COUNTER_SPECS[collection]
+    facets = {name: _facet(counter) for name, counter in counters_spec.items()}
+    result = await db[collection].aggregate([{"$facet": facets}]).to_list(1)
+    row = result[0] if result else {}
+
+    counters = {}
+    for name, (field, _, _) in counters_spec.items():
+        values = row.get(name, [])
+        if field is not None:
+            counters[name] = {str(v["_id"]): v["count"] for v in values if v["_id"] is not None}
+        else:
+            counters[name] = values[0]["n"] if values else 0
+    return counters
+
+
+async def read_counters(db: AsyncIOMotorDatabase, *collections: str) -> Dict[str, dict]:
+    """Read the materialized counters for the given collections in one query."""
+    docs = await db.counters.find({"_id": {"$in": list(collections)}}).to_list(len(collections))
+    found = {doc["_id"]: doc for doc in docs}
+    return {name: found.get(name, {}) for name in collections}
+
+
+class FencedOut(Exception):
+    """The stored resume token moved on: another process wrote these events."""
+
+
+class PendingDeltas:
+    """Deltas of one collection not written yet, and the resume token range they cover."""
+
+    def __init__(self, base_token: Optional[dict]):
+        self.base_token = base_token
+        self.token = base_token
+        self.deltas: Dict[str, int] = {}
+        self.recount = False
+        self.events = 0
+
+    def add(self, collection: str, change: dict):
+        self.token = change["_id"]
+        self.events += 1
+        deltas = change_deltas(collection, change)
+        if deltas is None:
+            self.recount = True
+            return
+        for path, value in deltas.items():
+            self.deltas[path] = self.deltas.get(path, 0) + value
+
+    def reset(self):
+        self.base_token = self.token
+        self.deltas = {}
+        self.recount = False
+        self.events = 0
+
+
+class CounterMaterializer:
+    """Keeps the counters collection in sync with the tracked collections, in the lease holder only."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lease_task: Optional[asyncio.Task] = None
+        self._tasks: List[asyncio.Task] = []
+        self.mode: Optional[str] = None  # change_streams, polling; None while not leading
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._lease_task is None:
+            self._lease_task = asyncio.create_task(self._lease_loop())
+
+    async def stop(self):
+        if self._lease_task:
+            self._lease_task.cancel()
+            try:
+                await self._lease_task
+            except asyncio.CancelledError:
+                pass
+            self._lease_task = None
+        await self._step_down()
+        if self._db is None:
+            return
+        try:
+            await self._db.leases.delete_one({"_id": COUNTER_LEASE_ID, "owner": self._owner})
+        except PyMongoError as e:
+            logger.warning(f"Could not release counter lease: {e}")
+
+    async def recompute_all(self):
+        for collection in COUNTER_SPECS:
+            await self._store(collection)
+
+    async def _store(self, collection: str, resume_token: Optional[dict] = None):
+        """Replace a collection's counters with a full recount."""
+        counters = await compute_counters(self._db, collection)
+        update = {**counters, "resume_token": resume_token, "updated_at": datetime.utcnow()}
+        await self._db.counters.update_one({"_id": collection}, {"$set": update}, upsert=True)
+
+    async def _acquire_lease(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            lease = await self._db.leases.find_one_and_update(
+                {"_id": COUNTER_LEASE_ID, "$or": [{"owner": self._owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self._owner, "expires_at": now + timedelta(seconds=COUNTER_LEASE_SECONDS)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Held by another process
+            return False
+        return lease is not None
+
+    async def _lease_loop(self):
+        while True:
+            try:
+                leader = await self._acquire_lease()
+            except PyMongoError as e:
+                logger.error(f"Counter lease renewal failed: {e}")
+                leader = False
+
+            try:
+                if leader and not self._tasks:
+                    await self._lead()
+                elif not leader and self._tasks:
+                    logger.info("Counter lease lost, no longer materializing counters")
+                    await self._step_down()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Counter materializer error: {e}")
+            await asyncio.sleep(COUNTER_LEASE_SECONDS / 3)
+
+    async def _lead(self):
+        if await self._change_streams_supported():
+            self.mode = "change_streams"
+            for collection in COUNTER_SPECS:
+                pre_images = await self._enable_pre_images(collection)
+                self._tasks.append(asyncio.create_task(self._watch(collection, pre_images)))
+        else:
+            self.mode = "polling"
+            logger.info("Change streams unavailable, counters fall back to polling")
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def _step_down(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self.mode = None
+
+    async def _change_streams_supported(self) -> bool:
+        try:
+            async with self._db.counters.watch(max_await_time_ms=1) as stream:
+                await stream.try_next()
+                return True
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                logger.error(f"Could not open change stream: {e}")
+            return False
+        except PyMongoError as e:
+            logger.error(f"Could not open change stream: {e}")
+            return False
+
+    async def _enable_pre_images(self, collection: str) -> bool:
+        """Turn on change stream pre-images for a collection; False if the server cannot."""
+        options = {"changeStreamPreAndPostImages": {"enabled": True}}
+        try:
+            await self._db.command("collMod", collection, **options)
+            return True
+        except OperationFailure as e:
+            if e.code != NAMESPACE_NOT_FOUND:
+                logger.warning(f"No change stream pre-images for {collection}, changes will be recounted: {e}")
+                return False
+        except PyMongoError as e:
+            logger.warning(f"Could not enable pre-images for {collection}: {e}")
+            return False
+
+        try:
+            await self._db.create_collection(collection, **options)
+            return True
+        except CollectionInvalid:
+            # Created concurrently in the meantime
+            return await self._enable_pre_images(collection)
+        except PyMongoError as e:
+            logger.warning(f"Could not create {collection} with pre-images: {e}")
+            return False
+
+    async def _watch(self, collection: str, pre_images: bool):
+        fields = counted_fields(collection)
+        loop = asyncio.get_running_loop()
+        options = {"full_document_before_change": "whenAvailable"} if pre_images else {}
+
+        while True:
+            try:
+                doc = await self._db.counters.find_one({"_id": collection}, {"resume_token": 1})
+                resume_token = doc.get("resume_token") if doc else None
+                pending = PendingDeltas(resume_token)
+                async with self._db[collection].watch(
+                    pipeline=_change_filter(fields),
+                    resume_after=resume_token,
+                    max_await_time_ms=int(COUNTER_DEBOUNCE_SECONDS * 1000),
+                    **options
+                ) as stream:
+                    if resume_token is None:
+                        # No counters yet (or history lost): count once, then follow
+                        # the stream. Writes landing during the recount may be
+                        # counted twice; this only happens on first start or repair.
+                        await self._store(collection)
+                    flush_at = None
+                    while True:
+                        change = await stream.try_next()
+                        if change is not None:
+                            pending.add(collection, change)
+                            flush_at = flush_at or loop.time() + COUNTER_DEBOUNCE_SECONDS
+                        if pending.events and (change is None or loop.time() >= flush_at):
+                            await self._flush(collection, pending)
+                            flush_at = None
+            except asyncio.CancelledError:
+                raise
+            except FencedOut:
+                logger.warning(f"{collection} counters were advanced by another process, resyncing")
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_HISTORY_LOST:
+                    # Missed events cannot be replayed, rebuild from scratch
+                    logger.warning(f"Resume token for {collection} expired, recomputing counters")
+                    await self._db.counters.update_one({"_id": collection}, {"$set": {"resume_token": None}})
+                else:
+                    logger.error(f"Change stream on {collection} failed: {e}")
+                    await asyncio.sleep(COUNTER_POLL_INTERVAL)
+            except PyMongoError as e:
+                logger.error(f"Change stream on {collection} interrupted: {e}")
+                await asyncio.sleep(COUNTER_DEBOUNCE_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to materialize {collection} counters: {e}")
+                await asyncio.sleep(COUNTER_POLL_INTERVAL)
+
+    async def _flush(self, collection: str, pending: PendingDeltas):
+        """Write a batch, provided nobody else has written events past its start."""
+        if pending.recount:
+            await self._store(collection, pending.token)
+        else:
+            update = {"$set": {"resume_token": pending.token, "updated_at": datetime.utcnow()}}
+            if pending.deltas:
+                update["$inc"] = pending.deltas
+            result = await self._db.counters.update_one(
+                {"_id": collection, "resume_token": pending.base_token},
+                update
+            )
+            if result.matched_count == 0:
+                raise FencedOut()
+        pending.reset()
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.recompute_all()
+            except PyMongoError as e:
+                logger.error(f"Counter polling failed: {e}")
+            await asyncio.sleep(COUNTER_POLL_INTERVAL)
+
+
+# Lazy initialization
+_counter_materializer_instance = None
+
+def get_counter_materializer() -> CounterMaterializer:
+    """Get or create the counter materializer singleton instance."""
+    global _counter_materializer_instance
+    if _counter_materializer_instance is None:
+        _counter_materializer_instance = CounterMaterializer()
+    return _counter_materializer_instance
@@ -0,0 +1,344 @@
+"""
+Background cascade deletion for shops and users.
+
+Delete endpoints only mark the entity as deleted and enqueue a job in the
+``deletion_jobs`` collection. A worker task then removes the dependent
+documents in small, throttled batches, recomputes the ratings of shops that
+lost reviews once at the end, and finally removes the entity itself. Jobs
+hold a renewable lease, so a job interrupted by a restart is picked up again
+and simply continues: every step is idempotent.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from services.principal_cache import revoke_user_tokens
+from services.response_cache import invalidate_shop_listings
+
+logger = logging.getLogger(__name__)
+
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", 500))
+DELETION_BATCH_PAUSE = float(os.getenv("DELETION_BATCH_PAUSE", 0.05))  # seconds between batches
+DELETION_POLL_INTERVAL = float(os.getenv("DELETION_POLL_INTERVAL", 5))
+DELETION_LEASE_SECONDS = int(os.getenv("DELETION_LEASE_SECONDS", 120))
+
+# (collection, field referencing the entity) removed for each entity type
+SHOP_DEPENDENTS: List[Tuple[str, str]] = [
+    ("review_responses", "shop_id"),
+    ("reviews", "shop_id"),
+    ("orders", "shop_id"),
+    ("shop_verifications", "shop_id"),
+    ("favorites", "shop_id"),
+]
+
+USER_DEPENDENTS: List[Tuple[str, str]] = [
+    ("reviews", "user_id"),
+    ("review_responses", "responder_id"),
+    ("orders", "user_id"),
+    ("favorites", "user_id"),
+    ("notifications", "user_id"),
+    ("user_sessions", "user_id"),
+    ("login_history", "user_id"),
+    ("security_alerts", "user_id"),
+]
+
+ACTIVE_STATUSES = ["pending", "running"]
+
+
+def _entity_filter(entity_id: str) -> dict:
+    """Match an _id stored either as ObjectId or as plain string."""
+    if ObjectId.is_valid(entity_id):
+        return {"_id": {"$in": [ObjectId(entity_id), entity_id]}}
+    return {"_id": entity_id}
+
+
+def format_job(job: dict) -> dict:
+    job["id"] = str(job["_id"])
+    del job["_id"]
+    return job
+
+
+async def _enqueue(
+    db: AsyncIOMotorDatabase,
+    entity_type: str,
+    entity_id: str,
+    requested_by: Optional[str]
+) -> dict:
+    """Create a deletion job unless one is already queued for the entity."""
+    existing = await db.deletion_jobs.find_one({
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "status": {"$in": ACTIVE_STATUSES}
+    })
+    if existing:
+        return existing
+
+    job = {
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "requested_by": requested_by,
+        "status": "pending",
+        "current_step": None,
+        "progress": {},
+        "affected_shop_ids": [],
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "finished_at": None,
+        "lease_expires_at": None
+    }
+    result = await db.deletion_jobs.insert_one(job)
+    job["_id"] = result.inserted_id
+    get_deletion_worker().notify()
+    return job
+
+
+async def schedule_shop_deletion(
+    db: AsyncIOMotorDatabase,
+    shop: dict,
+    requested_by: Optional[str] = None
+) -> dict:
+    """Hide the shop immediately and queue the removal of everything attached to it."""
+    shop_id = str(shop["_id"])
+    await db.shops.update_one(
+        {"_id": shop["_id"]},
+        {"$set": {"status": "deleted", "deleted_at": datetime.utcnow()}}
+    )
+    await invalidate_shop_listings(shop.get("category"))
+    return await _enqueue(db, "shop", shop_id, requested_by)
+
+
+async def schedule_user_deletion(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    requested_by: Optional[str] = None
+) -> dict:
+    """Deactivate the user immediately, revoke their tokens and queue the removal of their data."""
+    await db.users.update_one(
+        _entity_filter(user_id),
+        {"$set": {"is_active": False, "deleted_at": datetime.utcnow()}}
+    )
+    await revoke_user_tokens(db, user_id)
+    return await _enqueue(db, "user", user_id, requested_by)
+
+
+class DeletionWorker:
+    """Processes deletion jobs one at a time in the background."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self):
+        """Wake the worker up instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                job = await self._claim_next()
+                if job:
+                    await self._process(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Deletion worker error: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=DELETION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim_next(self) -> Optional[dict]:
+        """Atomically take the oldest pending job, or one whose lease ran out."""
+        now = datetime.utcnow()
+        return await self._db.deletion_jobs.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "pending"},
+                    {"status": "running", "lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_expires_at": now + timedelta(seconds=DELETION_LEASE_SECONDS)
+                },
+                "$min": {"started_at": now}
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _process(self, job: dict):
+        db = self._db
+        try:
+            if job["entity_type"] == "user":
+                await self._delete_user_dependents(job)
+                dependents = USER_DEPENDENTS
+            else:
+                dependents = SHOP_DEPENDENTS
+
+            for collection, field in dependents:
+                if collection == "reviews":
+                    await self._delete_reviews(job, {field: job["entity_id"]})
+                elif collection == "review_responses":
+                    await self._delete_responses(job, {field: job["entity_id"]})
+                else:
+                    await self._delete_in_batches(job, collection, {field: job["entity_id"]})
+
+            # Shops that lost reviews get their rating recomputed exactly once
+            fresh = await db.deletion_jobs.find_one({"_id": job["_id"]}, {"affected_shop_ids": 1})
+            affected = [s for s in fresh.get("affected_shop_ids", []) if s != job["entity_id"]]
+            if affected:
+                await self._set_step(job, "shop_ratings")
+                from routes.review_routes import update_shop_rating
+                for shop_id in affected:
+                    await update_shop_rating(shop_id, db)
+
+            await self._set_step(job, job["entity_type"] + "s")
+            collection = db.users if job["entity_type"] == "user" else db.shops
+            await collection.delete_one(_entity_filter(job["entity_id"]))
+
+            await db.deletion_jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$set": {
+                        "status": "completed",
+                        "current_step": None,
+                        "finished_at": datetime.utcnow(),
+                        "lease_expires_at": None
+                    }
+                }
+            )
+            logger.info(f"Deletion job {job['_id']} ({job['entity_type']} {job['entity_id']}) completed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Deletion job {job['_id']} failed: {e}")
+            await db.deletion_jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$set": {
+                        "status": "failed",
+                        "error": str(e),
+                        "finished_at": datetime.utcnow(),
+                        "lease_expires_at": None
+                    }
+                }
+            )
+
+    async def _delete_user_dependents(self, job: dict):
+        """Queue deletion of every shop the user owns."""
+        await self._set_step(job, "owned_shops")
+        shops = await self._db.shops.find(
+            {"owner_id": job["entity_id"]},
+            {"category": 1}
+        ).to_list(None)
+        for shop in shops:
+            await schedule_shop_deletion(self._db, shop, job.get("requested_by"))
+
+    async def _delete_reviews(self, job: dict, query: dict):
+        """Delete reviews in batches, together with their responses."""
+        await self._set_step(job, "reviews")
+        while True:
+            batch = await self._db.reviews.find(query, {"shop_id": 1}).limit(DELETION_BATCH_SIZE).to_list(DELETION_BATCH_SIZE)
+            if not batch:
+                return
+
+            ids = [r["_id"] for r in batch]
+            shop_ids = list({r["shop_id"] for r in batch if r.get("shop_id")})
+            await self._db.review_responses.delete_many({"review_id": {"$in": [str(i) for i in ids]}})
+            result = await self._db.reviews.delete_many({"_id": {"$in": ids}})
+            await self._db.deletion_jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$inc": {"progress.reviews": result.deleted_count},
+                    "$addToSet": {"affected_shop_ids": {"$each": shop_ids}},
+                    "$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=DELETION_LEASE_SECONDS)}
+                }
+            )
+            await asyncio.sleep(DELETION_BATCH_PAUSE)
+
+    async def _delete_responses(self, job: dict, query: dict):
+        """Delete review responses in batches and mark their reviews unanswered again."""
+        await self._set_step(job, "review_responses")
+        while True:
+            batch = await self._db.review_responses.find(query, {"review_id": 1}).limit(DELETION_BATCH_SIZE).to_list(DELETION_BATCH_SIZE)
+            if not batch:
+                return
+
+            review_ids = [ObjectId(r["review_id"]) for r in batch if ObjectId.is_valid(r.get("review_id", ""))]
+            result = await self._db.review_responses.delete_many({"_id": {"$in": [r["_id"] for r in batch]}})
+            await self._db.reviews.update_many({"_id": {"$in": review_ids}}, {"$set": {"has_response": False}})
+            await self._db.deletion_jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$inc": {"progress.review_responses": result.deleted_count},
+                    "$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=DELETION_LEASE_SECONDS)}
+                }
+            )
+            await asyncio.sleep(DELETION_BATCH_PAUSE)
+
+    async def _delete_in_batches(self, job: dict, collection: str, query: dict):
+        await self._set_step(job, collection)
+        coll = self._db[collection]
+        while True:
+            batch = await coll.find(query, {"_id": 1}).limit(DELETION_BATCH_SIZE).to_list(DELETION_BATCH_SIZE)
+            if not batch:
+                return
+
+            result = await coll.delete_many({"_id": {"$in": [d["_id"] for d in batch]}})
+            await self._db.deletion_jobs.update_one(
+                {"_id": job["_id"]},
+                {
+                    "$inc": {f"progress.{collection}": result.deleted_count},
+                    "$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=DELETION_LEASE_SECONDS)}
+                }
+            )
+            await asyncio.sleep(DELETION_BATCH_PAUSE)
+
+    async def _set_step(self, job: dict, step: str):
+        await self._db.deletion_jobs.update_one(
+            {"_id": job["_id"]},
+            {
+                "$set": {
+                    "current_step": step,
+                    "lease_expires_at": datetime.utcnow() + timedelta(seconds=DELETION_LEASE_SECONDS)
+                }
+            }
+        )
+
+
+# Lazy initialization
+_deletion_worker_instance = None
+
+def get_deletion_worker() -> DeletionWorker:
+    """Get or create the deletion worker singleton instance."""
+    global _deletion_worker_instance
+    if _deletion_worker_instance is None:
+        _deletion_worker_instance = DeletionWorker()
+    return _deletion_worker_instance
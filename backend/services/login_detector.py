@@ -0,0 +1,303 @@
+"""
+Streaming brute-force and credential-stuffing detection.
+
+Every login attempt is fed to the detector, which keeps sliding-window
+counters per email, per IP and per subnet (/24 for IPv4, /64 for IPv6).
+Each counter is a small ring buffer of per-bucket counts, so an update is
+O(1) plus a sum over a handful of slots and no event is stored. Distinct
+accounts per IP and subnet are counted in a set of account hashes capped
+at the alert threshold, so it never grows past what the rule needs.
+
+Every map keeps at most LOGIN_DETECTOR_MAX_KEYS keys and evicts the least
+recently used one, so a flood of new emails or addresses (the attack being
+detected) cannot grow the detector's memory without bound.
+
+Rules, all over the same window:
+
+- ``multiple_failed_attempts``: too many failures for one email (brute
+  force), from one IP or from one subnet.
+- ``suspicious_login``: failures for too many distinct accounts from one IP
+  or subnet (credential stuffing), or a successful login for an email that
+  just had many failures.
+
+An alert fires once per rule and key per window; the returned alert
+documents are written by the login history writer.
+"""
+
+import ipaddress
+import logging
+import os
+import time
+from array import array
+from typing import Callable, Dict, Hashable, List, Optional
+
+from cachetools import LRUCache
+
+from models_admin import SecurityAlert
+
+logger = logging.getLogger(__name__)
+
+LOGIN_DETECTOR_WINDOW_SECONDS = int(os.getenv("LOGIN_DETECTOR_WINDOW_SECONDS", 300))
+LOGIN_DETECTOR_SLOTS = int(os.getenv("LOGIN_DETECTOR_SLOTS", 10))
+LOGIN_DETECTOR_MAX_KEYS = int(os.getenv("LOGIN_DETECTOR_MAX_KEYS", 50000))
+
+# Alert thresholds, counted over one window
+LOGIN_DETECTOR_THRESHOLDS = {
+    "email_failures": int(os.getenv("LOGIN_DETECTOR_EMAIL_FAILURES", 5)),
+    "ip_failures": int(os.getenv("LOGIN_DETECTOR_IP_FAILURES", 20)),
+    "subnet_failures": int(os.getenv("LOGIN_DETECTOR_SUBNET_FAILURES", 100)),
+    "ip_accounts": int(os.getenv("LOGIN_DETECTOR_IP_ACCOUNTS", 10)),
+    "subnet_accounts": int(os.getenv("LOGIN_DETECTOR_SUBNET_ACCOUNTS", 30)),
+    "success_after_failures": int(os.getenv("LOGIN_DETECTOR_SUCCESS_AFTER_FAILURES", 5)),
+}
+
+
+def subnet_of(ip_address: str) -> str:
+    """The /24 (IPv4) or /64 (IPv6) network of an address."""
+    if "." in ip_address and ":" not in ip_address:
+        return ip_address.rsplit(".", 1)[0] + ".0/24"
+    try:
+        return str(ipaddress.ip_network(f"{ip_address}/64", strict=False))
+    except ValueError:
+        return ip_address
+
+
+class RingCounter:
+    """Event count over the last `slots` buckets, one array entry per bucket."""
+
+    __slots__ = ("counts", "buckets")
+
+    def __init__(self, slots: int):
+        self.counts = array("I", bytes(4 * slots))
+        self.buckets = array("q", [-1]) * slots
+
+    def add(self, bucket: int) -> int:
+        """Count one event in `bucket` and return the window total."""
+        i = bucket % len(self.counts)
+        if self.buckets[i] != bucket:
+            self.buckets[i] = bucket
+            self.counts[i] = 0
+        self.counts[i] += 1
+        return self.total(bucket)
+
+    def total(self, bucket: int) -> int:
+        oldest = bucket - len(self.counts)
+        return sum(c for c, b in zip(self.counts, self.buckets) if b > oldest)
+
+    def last_bucket(self) -> int:
+        return max(self.buckets)
+
+
+class DistinctCounter:
+    """
+    Distinct members seen over the last `slots` buckets, as parallel arrays
+    of member hashes and last-seen buckets. Keeps the `capacity` most
+    recently seen members, so the count is exact up to `capacity`.
+    """
+
+    __slots__ = ("slots", "capacity", "members", "buckets")
+
+    def __init__(self, slots: int, capacity: int):
+        self.slots = slots
+        self.capacity = capacity
+        self.members = array("q")
+        self.buckets = array("q")
+
+    def add(self, bucket: int, member: str) -> int:
+        """Record `member` in `bucket` and return the distinct count of the window."""
+        h = hash(member)
+        for i, m in enumerate(self.members):
+            if m == h:
+                self.buckets[i] = bucket
+                return self.total(bucket)
+        if len(self.members) < self.capacity:
+            self.members.append(h)
+            self.buckets.append(bucket)
+        else:
+            # Replace the member seen longest ago
+            i = self.buckets.index(min(self.buckets))
+            self.members[i] = h
+            self.buckets[i] = bucket
+        return self.total(bucket)
+
+    def total(self, bucket: int) -> int:
+        oldest = bucket - self.slots
+        return sum(1 for b in self.buckets if b > oldest)
+
+    def last_bucket(self) -> int:
+        return max(self.buckets)
+
+
+class SlidingWindows:
+    """
+    One counter per key, created on first use, pruned once idle and evicted
+    least recently used first beyond `maxsize` keys.
+    """
+
+    def __init__(self, slots: int, maxsize: int = LOGIN_DETECTOR_MAX_KEYS, factory: Optional[Callable] = None):
+        self.slots = slots
+        self.factory = factory or (lambda: RingCounter(slots))
+        self.counters: LRUCache = LRUCache(maxsize=maxsize)
+
+    def add(self, key: Hashable, bucket: int, *args) -> int:
+        counter = self.counters.get(key)
+        if counter is None:
+            counter = self.counters[key] = self.factory()
+        return counter.add(bucket, *args)
+
+    def total(self, key: Hashable, bucket: int) -> int:
+        counter = self.counters.get(key)
+        return counter.total(bucket) if counter else 0
+
+    def prune(self, bucket: int):
+        oldest = bucket - self.slots
+        for key in [k for k, c in self.counters.items() if c.last_bucket() <= oldest]:
+            del self.counters[key]
+
+
+class LoginAttackDetector:
+    """Sliding-window login attack detection; observe() returns the alerts to store."""
+
+    def __init__(
+        self,
+        window_seconds: int = LOGIN_DETECTOR_WINDOW_SECONDS,
+        slots: int = LOGIN_DETECTOR_SLOTS,
+        thresholds: Optional[Dict[str, int]] = None,
+        max_keys: int = LOGIN_DETECTOR_MAX_KEYS
+    ):
+        self.window_seconds = window_seconds
+        self.slots = slots
+        self.bucket_seconds = max(window_seconds / slots, 1)
+        self.thresholds = {**LOGIN_DETECTOR_THRESHOLDS, **(thresholds or {})}
+
+        th = self.thresholds
+        self.email_failures = SlidingWindows(slots, max_keys)
+        self.ip_failures = SlidingWindows(slots, max_keys)
+        self.subnet_failures = SlidingWindows(slots, max_keys)
+        self.ip_accounts = SlidingWindows(slots, max_keys, lambda: DistinctCounter(slots, th["ip_accounts"]))
+        self.subnet_accounts = SlidingWindows(slots, max_keys, lambda: DistinctCounter(slots, th["subnet_accounts"]))
+        # (alert_type, scope, key) -> bucket of the last alert, for deduplication
+        self._alerted: LRUCache = LRUCache(maxsize=max_keys)
+        self._pruned_at = 0
+
+    def observe(
+        self,
+        email: str,
+        ip_address: Optional[str],
+        success: bool,
+        user_id: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> List[dict]:
+        bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+        if bucket - self._pruned_at >= self.slots:
+            self._prune(bucket)
+
+        email = email.lower()
+        th = self.thresholds
+        alerts: List[dict] = []
+
+        if success:
+            failures = self.email_failures.total(email, bucket)
+            if failures >= th["success_after_failures"]:
+                self._alert(
+                    alerts, bucket, "suspicious_login", "critical", "email", email,
+                    f"Successful login after {failures} failed attempts",
+                    user_id, email, ip_address, failures
+                )
+            return alerts
+
+        failures = self.email_failures.add(email, bucket)
+        if failures >= th["email_failures"]:
+            self._alert(
+                alerts, bucket, "multiple_failed_attempts", "high" if failures >= 2 * th["email_failures"] else "medium",
+                "email", email, f"{failures} failed login attempts for {email}",
+                user_id, email, ip_address, failures
+            )
+
+        if not ip_address:
+            return alerts
+        subnet = subnet_of(ip_address)
+
+        failures = self.ip_failures.add(ip_address, bucket)
+        if failures >= th["ip_failures"]:
+            self._alert(
+                alerts, bucket, "multiple_failed_attempts", "high", "ip", ip_address,
+                f"{failures} failed login attempts from {ip_address}",
+                None, None, ip_address, failures
+            )
+
+        failures = self.subnet_failures.add(subnet, bucket)
+        if failures >= th["subnet_failures"]:
+            self._alert(
+                alerts, bucket, "multiple_failed_attempts", "high", "subnet", subnet,
+                f"{failures} failed login attempts from {subnet}",
+                None, None, ip_address, failures
+            )
+
+        # Distinct accounts with failures from the IP and from its subnet
+        accounts = self.ip_accounts.add(ip_address, bucket, email)
+        if accounts >= th["ip_accounts"]:
+            self._alert(
+                alerts, bucket, "suspicious_login", "critical", "ip", ip_address,
+                f"Failed logins for {accounts} different accounts from {ip_address}",
+                None, None, ip_address, accounts
+            )
+        accounts = self.subnet_accounts.add(subnet, bucket, email)
+        if accounts >= th["subnet_accounts"]:
+            self._alert(
+                alerts, bucket, "suspicious_login", "critical", "subnet", subnet,
+                f"Failed logins for {accounts} different accounts from {subnet}",
+                None, None, ip_address, accounts
+            )
+
+        return alerts
+
+    def _alert(
+        self,
+        alerts: List[dict],
+        bucket: int,
+        alert_type: str,
+        severity: str,
+        scope: str,
+        key: str,
+        description: str,
+        user_id: Optional[str],
+        email: Optional[str],
+        ip_address: Optional[str],
+        count: int
+    ):
+        dedup_key = (alert_type, scope, key)
+        last = self._alerted.get(dedup_key)
+        if last is not None and bucket - last < self.slots:
+            return
+        self._alerted[dedup_key] = bucket
+
+        alert = SecurityAlert(
+            user_id=user_id,
+            email=email,
+            alert_type=alert_type,
+            severity=severity,
+            description=description,
+            ip_address=ip_address
+        ).dict()
+        alert.update({"scope": scope, "key": key, "count": count, "window_seconds": self.window_seconds})
+        alerts.append(alert)
+
+    def _prune(self, bucket: int):
+        oldest = bucket - self.slots
+        for windows in (self.email_failures, self.ip_failures, self.subnet_failures, self.ip_accounts, self.subnet_accounts):
+            windows.prune(bucket)
+        for key in [k for k, b in self._alerted.items() if b <= oldest]:
+            del self._alerted[key]
+        self._pruned_at = bucket
+
+
+# Lazy initialization
+_login_detector_instance = None
+
+def get_login_detector() -> LoginAttackDetector:
+    """Get or create the login attack detector singleton instance."""
+    global _login_detector_instance
+    if _login_detector_instance is None:
+        _login_detector_instance = LoginAttackDetector()
+    return _login_detector_instance
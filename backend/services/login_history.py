@@ -0,0 +1,198 @@
+"""
+Buffered login history writer.
+
+Login attempts and the security alerts raised by the login attack detector
+are put on a bounded in-process queue; a background task drains it and
+writes each batch with one ``insert_many`` per collection, as soon as
+LOGIN_HISTORY_BATCH_SIZE events are waiting or LOGIN_HISTORY_FLUSH_MS after
+the first event of the batch. The login rollup counters are updated once per
+batch as well.
+
+When the database falls behind and the queue is full, LOGIN_HISTORY_OVERFLOW
+decides what happens to new events:
+
+- ``drop``: the event is discarded and counted; the login is never slowed down.
+- ``block``: the login waits up to LOGIN_HISTORY_BLOCK_TIMEOUT seconds for
+  room in the queue, then the event is dropped.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
+
+from services.rollups import record as record_rollup
+
+logger = logging.getLogger(__name__)
+
+LOGIN_HISTORY_QUEUE_SIZE = int(os.getenv("LOGIN_HISTORY_QUEUE_SIZE", 10000))
+LOGIN_HISTORY_BATCH_SIZE = int(os.getenv("LOGIN_HISTORY_BATCH_SIZE", 500))
+LOGIN_HISTORY_FLUSH_MS = int(os.getenv("LOGIN_HISTORY_FLUSH_MS", 250))
+LOGIN_HISTORY_OVERFLOW = os.getenv("LOGIN_HISTORY_OVERFLOW", "drop")  # drop | block
+LOGIN_HISTORY_BLOCK_TIMEOUT = float(os.getenv("LOGIN_HISTORY_BLOCK_TIMEOUT", 0.5))
+
+OVERFLOW_POLICIES = {"drop", "block"}
+
+# Failure reasons stored on failed attempts
+FAILURE_UNKNOWN_USER = "unknown_user"
+FAILURE_INVALID_PASSWORD = "invalid_password"
+FAILURE_INACTIVE = "account_inactive"
+FAILURE_RATE_LIMITED = "rate_limited"
+
+
+class LoginHistoryWriter:
+    """Queues login_history and security_alerts documents and inserts them in batches."""
+
+    def __init__(
+        self,
+        maxsize: int = LOGIN_HISTORY_QUEUE_SIZE,
+        batch_size: int = LOGIN_HISTORY_BATCH_SIZE,
+        flush_ms: int = LOGIN_HISTORY_FLUSH_MS,
+        overflow: str = LOGIN_HISTORY_OVERFLOW
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._batch_size = batch_size
+        self._flush_interval = flush_ms / 1000
+        self._overflow = overflow
+        self._task: Optional[asyncio.Task] = None
+        # Events taken off the queue but not written yet, kept here so that
+        # stop() can still write them after cancelling the drain task
+        self._batch: List[Tuple[str, dict]] = []
+        self.dropped = 0
+        self.written = 0
+
+    async def record_attempt(
+        self,
+        email: str,
+        success: bool,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        user_id: Optional[str] = None,
+        failure_reason: Optional[str] = None
+    ):
+        await self._put(("login_history", {
+            "user_id": user_id,
+            "email": email,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "success": success,
+            "failure_reason": failure_reason,
+            "timestamp": datetime.utcnow()
+        }))
+
+    async def record_alert(self, alert: dict):
+        await self._put(("security_alerts", alert))
+
+    async def _put(self, event: Tuple[str, dict]):
+        try:
+            self._queue.put_nowait(event)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self._overflow == "block":
+            try:
+                await asyncio.wait_for(self._queue.put(event), LOGIN_HISTORY_BLOCK_TIMEOUT)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+        self.dropped += 1
+        # Log the first drop and then every 1000th, not every event
+        if self.dropped % 1000 == 1:
+            logger.warning(f"Login history queue full, {self.dropped} events dropped so far")
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Write whatever is still queued
+        batch, self._batch = self._batch, []
+        batch.extend(self._drain(self._queue.qsize()))
+        for i in range(0, len(batch), self._batch_size):
+            await self._write(batch[i:i + self._batch_size])
+
+    def _drain(self, limit: int) -> List[Tuple[str, dict]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _fill_batch(self):
+        """Collect up to batch_size events, waiting at most flush_ms after the first."""
+        batch = self._batch
+        batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._flush_interval
+        while len(batch) < self._batch_size:
+            batch.extend(self._drain(self._batch_size - len(batch)))
+            remaining = deadline - loop.time()
+            if len(batch) >= self._batch_size or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: List[Tuple[str, dict]]):
+        if not batch or self._db is None:
+            return
+        by_collection: Dict[str, List[dict]] = {}
+        for collection, doc in batch:
+            by_collection.setdefault(collection, []).append(doc)
+
+        for collection, docs in by_collection.items():
+            try:
+                await self._db[collection].insert_many(docs, ordered=False)
+                self.written += len(docs)
+            except BulkWriteError as e:
+                # Unordered inserts keep going past a bad document: only count what was lost
+                inserted = e.details.get("nInserted", 0)
+                self.written += inserted
+                self.dropped += len(docs) - inserted
+                logger.error(f"Failed to write {len(docs) - inserted} of {len(docs)} {collection} documents: {e}")
+            except Exception as e:
+                self.dropped += len(docs)
+                logger.error(f"Failed to write {len(docs)} {collection} documents: {e}")
+
+        attempts = by_collection.get("login_history", [])
+        succeeded = sum(1 for doc in attempts if doc["success"])
+        await record_rollup(self._db, logins_succeeded=succeeded, logins_failed=len(attempts) - succeeded)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._fill_batch()
+                batch, self._batch = self._batch, []
+                await self._write(batch)
+            except Exception as e:
+                # One bad batch must not stop the writer for good
+                self._batch = []
+                logger.exception(f"Login history batch failed: {e}")
+
+
+# Lazy initialization
+_login_history_writer_instance = None
+
+def get_login_history_writer() -> LoginHistoryWriter:
+    """Get or create the login history writer singleton instance."""
+    global _login_history_writer_instance
+    if _login_history_writer_instance is None:
+        _login_history_writer_instance = LoginHistoryWriter()
+    return _login_history_writer_instance
@@ -0,0 +1,213 @@
+"""
+Login rate limiting and progressive account lockout.
+
+Every login attempt takes a token from two buckets, first one per client IP
+(see ``get_client_ip`` for which proxies are trusted), then one per account
+(email), so attempts rejected per IP never use up the account's tokens. A
+bucket holds up to `capacity` tokens and refills continuously; an attempt
+that finds a bucket empty is rejected with the time until the next token,
+before the user lookup and bcrypt verification run.
+
+Failed password checks additionally count per account. From
+LOGIN_LOCKOUT_THRESHOLD consecutive failures on, the account is locked for
+LOGIN_LOCKOUT_BASE_SECONDS, doubling with every further failure up to
+LOGIN_LOCKOUT_MAX_SECONDS. A successful login clears the failures.
+
+The memory backend keeps the state per process; LOGIN_RATE_LIMIT_BACKEND=redis
+shares it between workers. Like the response cache, a broken backend never
+blocks logins: the limiter logs the error and lets the attempt through.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+
+try:
+    import redis.asyncio as redis_asyncio
+except Exception:
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+LOGIN_RATE_LIMIT_BACKEND = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory")  # memory, redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LOGIN_RATE_LIMIT_MAX_KEYS = int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", 100000))
+
+# Token buckets: burst size and sustained attempts per minute
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 10))
+LOGIN_ACCOUNT_BURST = int(os.getenv("LOGIN_ACCOUNT_BURST", 5))
+LOGIN_ACCOUNT_PER_MINUTE = float(os.getenv("LOGIN_ACCOUNT_PER_MINUTE", 2))
+
+# Progressive lockout
+LOGIN_LOCKOUT_THRESHOLD = int(os.getenv("LOGIN_LOCKOUT_THRESHOLD", 5))
+LOGIN_LOCKOUT_BASE_SECONDS = int(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", 30))
+LOGIN_LOCKOUT_MAX_SECONDS = int(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", 3600))
+LOGIN_FAILURE_RESET_SECONDS = int(os.getenv("LOGIN_FAILURE_RESET_SECONDS", 3600))
+
+
+def lockout_seconds(failures: int) -> float:
+    """Lock duration after `failures` consecutive failures (0 below the threshold)."""
+    if failures < LOGIN_LOCKOUT_THRESHOLD:
+        return 0
+    doublings = min(failures - LOGIN_LOCKOUT_THRESHOLD, 32)
+    return min(LOGIN_LOCKOUT_BASE_SECONDS * 2 ** doublings, LOGIN_LOCKOUT_MAX_SECONDS)
+
+
+class MemoryRateLimitBackend:
+    """Per-process state in bounded TTL caches; idle keys expire on their own."""
+
+    def __init__(self, maxsize: int = LOGIN_RATE_LIMIT_MAX_KEYS):
+        # key -> (tokens, updated_at); an expired entry is a full bucket again
+        self._buckets = TTLCache(maxsize=maxsize, ttl=3600, timer=time.monotonic)
+        self._failures = TTLCache(maxsize=maxsize, ttl=LOGIN_FAILURE_RESET_SECONDS, timer=time.monotonic)
+        self._locks = TTLCache(maxsize=maxsize, ttl=LOGIN_LOCKOUT_MAX_SECONDS, timer=time.monotonic)
+
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * per_second)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / per_second
+        self._buckets[key] = (tokens - 1, now)
+        return 0
+
+    async def locked_for(self, key: str) -> float:
+        locked_until = self._locks.get(key)
+        return max(0, locked_until - time.monotonic()) if locked_until else 0
+
+    async def add_failure(self, key: str) -> float:
+        failures = self._failures.get(key, 0) + 1
+        self._failures[key] = failures
+        seconds = lockout_seconds(failures)
+        if seconds:
+            self._locks[key] = time.monotonic() + seconds
+        return seconds
+
+    async def clear_failures(self, key: str):
+        self._failures.pop(key, None)
+        self._locks.pop(key, None)
+
+
+# KEYS[1] bucket; ARGV: capacity, tokens per ms, now in ms. Returns the wait in ms (0 = allowed).
+_TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then
+  wait = math.ceil((1 - tokens) / rate)
+else
+  tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+return wait
+"""
+
+
+class RedisRateLimitBackend:
+    """Shared backend so that all workers enforce the same buckets and lockouts."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "login_rate_limit"):
+        if redis_asyncio is None:
+            raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND=redis requires the 'redis' package")
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, per_second: float) -> float:
+        wait_ms = await self._take(
+            keys=[f"{self._prefix}:bucket:{key}"],
+            args=[capacity, per_second / 1000, int(time.time() * 1000)]
+        )
+        return int(wait_ms) / 1000
+
+    async def locked_for(self, key: str) -> float:
+        ttl_ms = await self._client.pttl(f"{self._prefix}:lock:{key}")
+        return ttl_ms / 1000 if ttl_ms > 0 else 0
+
+    async def add_failure(self, key: str) -> float:
+        failures_key = f"{self._prefix}:failures:{key}"
+        pipe = self._client.pipeline()
+        pipe.incr(failures_key)
+        pipe.expire(failures_key, LOGIN_FAILURE_RESET_SECONDS)
+        failures, _ = await pipe.execute()
+        seconds = lockout_seconds(int(failures))
+        if seconds:
+            await self._client.set(f"{self._prefix}:lock:{key}", 1, px=int(seconds * 1000))
+        return seconds
+
+    async def clear_failures(self, key: str):
+        await self._client.delete(f"{self._prefix}:failures:{key}", f"{self._prefix}:lock:{key}")
+
+
+class LoginRateLimiter:
+    """Per-IP and per-account token buckets plus progressive account lockout."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.rejected = 0
+        self.errors = 0
+
+    async def check(self, ip_address: Optional[str], email: str) -> float:
+        """
+        Take a token for the attempt. Returns 0 when it may proceed, otherwise
+        the number of seconds the client should wait (for Retry-After).
+        """
+        account = email.lower()
+        try:
+            wait = await self.backend.locked_for(account)
+            # IP first: a flood from one address must not drain the victim's
+            # account bucket and lock its owner out
+            if not wait and ip_address:
+                wait = await self.backend.take(f"ip:{ip_address}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60)
+            if not wait:
+                wait = await self.backend.take(f"account:{account}", LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_PER_MINUTE / 60)
+        except Exception as e:
+            # A broken shared backend must never lock everybody out
+            logger.warning(f"Login rate limiter unavailable: {e}")
+            self.errors += 1
+            return 0
+        if wait:
+            self.rejected += 1
+        return wait
+
+    async def record_failure(self, email: str) -> float:
+        """Count a failed password check; returns the lockout it triggered, if any."""
+        try:
+            return await self.backend.add_failure(email.lower())
+        except Exception as e:
+            logger.warning(f"Login rate limiter unavailable: {e}")
+            self.errors += 1
+            return 0
+
+    async def record_success(self, email: str):
+        try:
+            await self.backend.clear_failures(email.lower())
+        except Exception as e:
+            logger.warning(f"Login rate limiter unavailable: {e}")
+            self.errors += 1
+
+
+# Lazy initialization
+_login_rate_limiter_instance = None
+
+def get_login_rate_limiter() -> LoginRateLimiter:
+    """Get or create the login rate limiter singleton instance."""
+    global _login_rate_limiter_instance
+    if _login_rate_limiter_instance is None:
+        if LOGIN_RATE_LIMIT_BACKEND == "redis":
+            backend = RedisRateLimitBackend()
+        else:
+            backend = MemoryRateLimitBackend()
+        _login_rate_limiter_instance = LoginRateLimiter(backend)
+    return _login_rate_limiter_instance
@@ -0,0 +1,166 @@
+"""
+Per-day HyperLogLog sketches of login activity.
+
+For every UTC day the ``login_sketches`` collection holds one compressed
+sketch per kind: distinct IPs, emails and user agents over all login
+attempts, plus distinct IPs and emails over failed attempts. Unique counts
+for an N-day window merge N sketches per kind instead of scanning
+``login_history``.
+
+Logins are added to in-memory sketches and flushed every few seconds.
+Sketches merge by register-wise max, so each worker folds its pending
+sketch into the stored one with a version check and retries on conflict;
+no update is lost and replays are harmless.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from utils.hyperloglog import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+LOGIN_SKETCH_FLUSH_INTERVAL = float(os.getenv("LOGIN_SKETCH_FLUSH_INTERVAL", 10))
+
+KINDS = ["ip", "email", "user_agent", "failed_ip", "failed_email"]
+
+
+def _day(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+async def merge_sketch(db: AsyncIOMotorDatabase, day: datetime, kind: str, sketch: HyperLogLog, retries: int = 5):
+    """Fold `sketch` into the stored sketch for (day, kind) with optimistic concurrency."""
+    for _ in range(retries):
+        doc = await db.login_sketches.find_one({"date": day, "kind": kind})
+        if doc is None:
+            try:
+                await db.login_sketches.insert_one({
+                    "date": day,
+                    "kind": kind,
+                    "sketch": Binary(sketch.to_bytes()),
+                    "version": 1
+                })
+                return
+            except DuplicateKeyError:
+                continue
+
+        merged = HyperLogLog.from_bytes(doc["sketch"]).merge(sketch)
+        result = await db.login_sketches.update_one(
+            {"_id": doc["_id"], "version": doc["version"]},
+            {"$set": {"sketch": Binary(merged.to_bytes())}, "$inc": {"version": 1}}
+        )
+        if result.modified_count:
+            return
+    raise RuntimeError(f"Could not merge {kind} sketch for {day.date()} after {retries} attempts")
+
+
+async def distinct_counts(
+    db: AsyncIOMotorDatabase,
+    days: int,
+    kinds: Iterable[str] = KINDS
+) -> Dict[str, int]:
+    """Approximate distinct counts per kind over the last `days` days (today included)."""
+    kinds = list(kinds)
+    since = _day(datetime.utcnow()) - timedelta(days=max(days, 1) - 1)
+    docs = await db.login_sketches.find(
+        {"date": {"$gte": since}, "kind": {"$in": kinds}},
+        {"kind": 1, "sketch": 1}
+    ).to_list(None)
+
+    merged = {kind: HyperLogLog() for kind in kinds}
+    for doc in docs:
+        merged[doc["kind"]].merge(HyperLogLog.from_bytes(doc["sketch"]))
+    return {kind: sketch.count() for kind, sketch in merged.items()}
+
+
+class LoginSketches:
+    """Collects login attempts into per-day sketches and flushes them periodically."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._pending: Dict[Tuple[datetime, str], HyperLogLog] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(
+        self,
+        ip_address: Optional[str],
+        email: Optional[str],
+        user_agent: Optional[str],
+        success: bool,
+        at: Optional[datetime] = None
+    ):
+        day = _day(at or datetime.utcnow())
+        values = {"ip": ip_address, "email": email, "user_agent": user_agent}
+        if not success:
+            values.update({"failed_ip": ip_address, "failed_email": email})
+        for kind, value in values.items():
+            if value:
+                sketch = self._pending.get((day, kind))
+                if sketch is None:
+                    sketch = self._pending[(day, kind)] = HyperLogLog()
+                sketch.add(value.lower() if kind.endswith("email") else value)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending or self._db is None:
+            return
+        pending, self._pending = self._pending, {}
+        for (day, kind), sketch in pending.items():
+            try:
+                await merge_sketch(self._db, day, kind, sketch)
+            except (PyMongoError, RuntimeError) as e:
+                logger.error(f"Failed to flush {kind} login sketch: {e}")
+                # Merge back so the next flush retries
+                existing = self._pending.get((day, kind))
+                self._pending[(day, kind)] = existing.merge(sketch) if existing else sketch
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(LOGIN_SKETCH_FLUSH_INTERVAL)
+            await self.flush()
+
+
+async def backfill_sketches(db: AsyncIOMotorDatabase, since: Optional[datetime] = None):
+    """Rebuild the sketches from login_history (one pass, for existing data)."""
+    query = {"timestamp": {"$gte": _day(since)}} if since else {}
+    await db.login_sketches.delete_many({"date": {"$gte": _day(since)}} if since else {})
+
+    sketches = LoginSketches()
+    cursor = db.login_history.find(query, {"ip_address": 1, "email": 1, "user_agent": 1, "success": 1, "timestamp": 1})
+    async for log in cursor:
+        sketches.add(log.get("ip_address"), log.get("email"), log.get("user_agent"), log.get("success", True), log["timestamp"])
+    sketches._db = db
+    await sketches.flush()
+
+
+# Lazy initialization
+_login_sketches_instance = None
+
+def get_login_sketches() -> LoginSketches:
+    """Get or create the login sketches singleton instance."""
+    global _login_sketches_instance
+    if _login_sketches_instance is None:
+        _login_sketches_instance = LoginSketches()
+    return _login_sketches_instance
@@ -0,0 +1,131 @@
+"""
+Lease-based moderation queue for pending reviews.
+
+Moderators claim the next reviews with an atomic ``find_one_and_update``
+that stamps a lease (owner and expiry) on the review, so concurrent
+moderators never get the same review. A lease that is not resolved in time
+simply expires and the review becomes claimable again.
+
+Queue order is a single indexed field, ``moderation_due_at``: the review's
+creation time moved earlier by a priority boost for content flags, low
+ratings and large shops. Older reviews therefore still surface first when
+the boosts are equal, and a boosted review does not starve the rest.
+"""
+
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+MODERATION_LEASE_SECONDS = int(os.getenv("MODERATION_LEASE_SECONDS", 600))
+MODERATION_MAX_CLAIM = 50
+
+# Priority boosts, in hours of "virtual age"
+FLAG_BOOST_HOURS = 24        # per content flag
+LOW_RATING_BOOST_HOURS = 12  # per star below 3
+SHOP_SIZE_BOOST_HOURS = 6    # per order of magnitude of the shop's review count
+
+QUEUE_PROJECTION = {"proof_photos": 0, "proof_chat_history": 0, "verification_token": 0}
+
+
+def moderation_due_at(review: dict, shop_review_count: int = 0) -> datetime:
+    """Queue position of a review: earlier means moderated sooner."""
+    boost = len(review.get("content_flags") or []) * FLAG_BOOST_HOURS
+    boost += max(0, 3 - (review.get("rating") or 3)) * LOW_RATING_BOOST_HOURS
+    boost += math.log10(shop_review_count + 1) * SHOP_SIZE_BOOST_HOURS
+    return review.get("created_at", datetime.utcnow()) - timedelta(hours=boost)
+
+
+def claimable_filter(moderator_id: str, now: datetime) -> dict:
+    """Reviews not leased by another moderator."""
+    return {
+        "$or": [
+            {"lease_expires_at": None},
+            {"lease_expires_at": {"$lt": now}},
+            {"lease_owner": moderator_id}
+        ]
+    }
+
+
+async def assign_missing_priorities(db: AsyncIOMotorDatabase, batch_size: int = 500):
+    """Give pending reviews created before the queue existed their queue position."""
+    reviews = await db.reviews.find(
+        {"status": "pending", "moderation_due_at": {"$exists": False}},
+        {"shop_id": 1, "rating": 1, "content_flags": 1, "created_at": 1}
+    ).limit(batch_size).to_list(batch_size)
+    if not reviews:
+        return
+
+    shop_ids = list({r["shop_id"] for r in reviews if r.get("shop_id")})
+    shops = await db.shops.find(
+        {"_id": {"$in": [ObjectId(s) for s in shop_ids if ObjectId.is_valid(s)] + shop_ids}},
+        {"review_count": 1}
+    ).to_list(None)
+    review_counts = {str(shop["_id"]): shop.get("review_count", 0) for shop in shops}
+
+    await db.reviews.bulk_write([
+        UpdateOne(
+            {"_id": review["_id"]},
+            {"$set": {"moderation_due_at": moderation_due_at(review, review_counts.get(review.get("shop_id"), 0))}}
+        )
+        for review in reviews
+    ], ordered=False)
+
+
+async def claim_reviews(db: AsyncIOMotorDatabase, moderator_id: str, count: int) -> List[dict]:
+    """
+    Return up to `count` pending reviews leased to the moderator: leases the
+    moderator still holds first, then newly claimed reviews in queue order.
+    """
+    now = datetime.utcnow()
+    lease_expires_at = now + timedelta(seconds=MODERATION_LEASE_SECONDS)
+
+    await assign_missing_priorities(db)
+
+    # Resume reviews already leased to this moderator, extending the lease
+    held = await db.reviews.find(
+        {"status": "pending", "lease_owner": moderator_id, "lease_expires_at": {"$gte": now}},
+        QUEUE_PROJECTION
+    ).sort("moderation_due_at", 1).limit(count).to_list(count)
+    if held:
+        await db.reviews.update_many(
+            {"_id": {"$in": [r["_id"] for r in held]}, "lease_owner": moderator_id},
+            {"$set": {"lease_expires_at": lease_expires_at}}
+        )
+
+    claimed = held
+    while len(claimed) < count:
+        review = await db.reviews.find_one_and_update(
+            {
+                "status": "pending",
+                "$or": [
+                    {"lease_expires_at": None},
+                    {"lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {"$set": {"lease_owner": moderator_id, "lease_expires_at": lease_expires_at}},
+            sort=[("moderation_due_at", 1), ("created_at", 1)],
+            projection=QUEUE_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if not review:
+            break
+        claimed.append(review)
+
+    return claimed
+
+
+async def release_review(db: AsyncIOMotorDatabase, review_id: ObjectId, moderator_id: Optional[str] = None) -> bool:
+    """Drop a lease; with moderator_id only if that moderator holds it."""
+    query = {"_id": review_id}
+    if moderator_id:
+        query["lease_owner"] = moderator_id
+    result = await db.reviews.update_one(query, {"$set": {"lease_owner": None, "lease_expires_at": None}})
+    return result.modified_count > 0
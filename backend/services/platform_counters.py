@@ -0,0 +1,118 @@
+"""
+Cached platform counters for the public statistics endpoint.
+
+The homepage only shows rounded numbers, so they are read from the
+materialized ``counters`` documents (see ``counter_materializer``) with a
+single query; shoppers come from the per-role counts of the ``users``
+document. Until those documents exist, e.g. on a fresh database, shops and
+reviews fall back to estimated document counts and shoppers to one indexed
+count on ``role``.
+
+The formatted response is cached and refreshed by a background task, so
+requests never wait on the database once the cache is warm.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from models import StatisticsResponse
+from services.counter_materializer import read_counters
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_CACHE_TTL = float(os.getenv("STATISTICS_CACHE_TTL", 300))
+STATISTICS_REFRESH_INTERVAL = float(os.getenv("STATISTICS_REFRESH_INTERVAL", 60))
+
+
+def format_number(num: int) -> str:
+    """Format a count for display, e.g. 1234567 -> "1.2 Million"."""
+    if num >= 1000000:
+        return f"{num / 1000000:.1f} Million".replace(".0", "")
+    elif num >= 1000:
+        return f"{num / 1000:.1f}K".replace(".0", "")
+    return str(num)
+
+
+class PlatformStatistics:
+    """Serves StatisticsResponse from memory and refreshes it in the background."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._cached: Optional[StatisticsResponse] = None
+        self._refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._refreshing: Optional[asyncio.Task] = None
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to warm statistics cache: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def get(self, db: AsyncIOMotorDatabase) -> StatisticsResponse:
+        """Return the cached statistics; only a cold cache waits for the database."""
+        if self._cached is None:
+            self._db = self._db or db
+            await self.refresh()
+        elif time.monotonic() - self._refreshed_at > STATISTICS_CACHE_TTL:
+            # Serve the stale value and refresh out of band
+            if self._refreshing is None or self._refreshing.done():
+                self._refreshing = asyncio.create_task(self.refresh())
+        return self._cached
+
+    async def refresh(self):
+        db = self._db
+        counters = await read_counters(db, "users", "shops", "reviews")
+        users, shops, reviews = counters["users"], counters["shops"], counters["reviews"]
+
+        if "by_role" in users:
+            shopper_count = users["by_role"].get("shopper", 0)
+        else:
+            shopper_count = await db.users.count_documents({"role": "shopper"})
+        shop_count = shops["total"] if "total" in shops else await db.shops.estimated_document_count()
+        review_count = reviews["total"] if "total" in reviews else await db.reviews.estimated_document_count()
+
+        self._cached = StatisticsResponse(
+            shoppers=format_number(max(shopper_count, 0)),
+            shops=format_number(shop_count),
+            dailyTransactions=format_number(review_count)
+        )
+        self._refreshed_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(STATISTICS_REFRESH_INTERVAL)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Statistics refresh failed: {e}")
+
+
+# Lazy initialization
+_platform_statistics_instance = None
+
+def get_platform_statistics() -> PlatformStatistics:
+    """Get or create the platform statistics singleton instance."""
+    global _platform_statistics_instance
+    if _platform_statistics_instance is None:
+        _platform_statistics_instance = PlatformStatistics()
+    return _platform_statistics_instance
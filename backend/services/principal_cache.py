@@ -0,0 +1,111 @@
+"""
+Cache of authenticated principals (user documents) for get_current_user.
+
+Entries are keyed by the token's user id and token version, so a request
+with a valid token usually costs no database round trip at all. The cache
+is a TTL cache with LRU eviction: PRINCIPAL_CACHE_TTL bounds how long a
+changed user document can be served stale by a worker that did not make
+the change itself.
+
+Changes to a user invalidate their entries in this process. Suspension,
+deletion, role changes and admin password resets also revoke the user's
+tokens: they bump ``token_version`` and publish it to the token revocation
+set, which every worker checks before the cache.
+"""
+
+import logging
+import os
+import time
+from typing import Optional
+
+from bson import ObjectId
+from cachetools import TTLCache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from services.token_revocations import get_token_revocations
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+
+PRINCIPAL_PROJECTION = {"password": 0}
+
+
+class PrincipalCache:
+    """TTL + LRU cache of user documents keyed by (user id, token version)."""
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, timer=time.monotonic)
+        self.hits = 0
+        self.misses = 0
+
+    async def get_user(self, db: AsyncIOMotorDatabase, claims: dict) -> Optional[dict]:
+        """
+        The user a token's claims belong to, or None when the user is gone or
+        the token version is outdated. Tokens issued before user ids were put
+        into tokens are identified by their email.
+        """
+        user_id = claims.get("uid")
+        version = claims.get("token_version", 0)
+        key = (user_id or claims.get("sub"), version)
+
+        user = self._entries.get(key)
+        if user is not None:
+            self.hits += 1
+            # Handlers may modify the document they get
+            return dict(user)
+
+        self.misses += 1
+        if user_id and ObjectId.is_valid(user_id):
+            query = {"_id": ObjectId(user_id)}
+        else:
+            query = {"email": claims.get("sub")}
+        user = await db.users.find_one(query, PRINCIPAL_PROJECTION)
+        if user is None or user.get("token_version", 0) != version:
+            return None
+
+        self._entries[key] = user
+        return dict(user)
+
+    def invalidate(self, user_id: str):
+        """Drop every cached entry of a user in this process."""
+        user_id = str(user_id)
+        self._entries.expire()
+        stale = [key for key, user in list(self._entries.items()) if str(user["_id"]) == user_id]
+        for key in stale:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+async def revoke_user_tokens(db: AsyncIOMotorDatabase, user_id: str):
+    """Invalidate every token issued to a user so far by bumping their token version."""
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id) if ObjectId.is_valid(user_id) else user_id},
+        {"$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    get_principal_cache().invalidate(user_id)
+    if user:
+        await get_token_revocations().revoke(db, user_id, user["token_version"])
+
+
+# Lazy initialization
+_principal_cache_instance = None
+
+def get_principal_cache() -> PrincipalCache:
+    """Get or create the principal cache singleton instance."""
+    global _principal_cache_instance
+    if _principal_cache_instance is None:
+        _principal_cache_instance = PrincipalCache()
+    return _principal_cache_instance
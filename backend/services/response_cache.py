@@ -0,0 +1,244 @@
+"""
+Read-through response cache for hot, public read endpoints.
+
+Entries are stored under a key built from the exact query parameters plus
+the current version of every tag the entry depends on. Invalidating a tag
+bumps its version, so all entries built against the old version become
+unreachable and simply age out of the backend (short TTL / LRU).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from cachetools import TLRUCache
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import redis.asyncio as redis_asyncio
+except Exception:
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory, redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 2048))
+SHOP_LISTING_CACHE_TTL = float(os.getenv("SHOP_LISTING_CACHE_TTL", 30))
+
+
+class MemoryCacheBackend:
+    """Per-process LRU backend with per-entry expiry."""
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES):
+        self._entries = TLRUCache(
+            maxsize=maxsize,
+            ttu=lambda key, value, now: value[0],
+            timer=time.monotonic
+        )
+        self._tag_versions: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def get_tag_versions(self, tags: List[str]) -> List[int]:
+        return [self._tag_versions.get(tag, 0) for tag in tags]
+
+    async def bump_tags(self, tags: List[str]):
+        for tag in tags:
+            self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+
+class RedisCacheBackend:
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = "response_cache"):
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis_asyncio.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(f"{self._prefix}:entry:{key}")
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self._client.set(
+            f"{self._prefix}:entry:{key}",
+            json.dumps(jsonable_encoder(value)),
+            px=int(ttl * 1000)
+        )
+
+    async def get_tag_versions(self, tags: List[str]) -> List[int]:
+        if not tags:
+            return []
+        values = await self._client.mget([f"{self._prefix}:tag:{tag}" for tag in tags])
+        return [int(v) if v is not None else 0 for v in values]
+
+    async def bump_tags(self, tags: List[str]):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(f"{self._prefix}:tag:{tag}")
+        await pipe.execute()
+
+
+class ResponseCache:
+    """Read-through cache with tag invalidation, hit metrics and single-flight loading."""
+
+    def __init__(self, name: str, backend, default_ttl: float):
+        self.name = name
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def make_key(**params) -> str:
+        """Build a stable key from query parameters, ignoring unset values.
+
+        Values are used as given: the queries match them case-sensitively, so
+        normalizing them would let differently cased requests share a page.
+        """
+        params = {k: v for k, v in params.items() if v is not None and v != ""}
+        return json.dumps(params, sort_keys=True, default=str)
+
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Return the cached value for key, loading it at most once per process on a miss."""
+        tags = list(tags)
+        try:
+            versions = await self.backend.get_tag_versions(tags)
+            full_key = f"{self.name}:{key}|" + ",".join(f"{t}={v}" for t, v in zip(tags, versions))
+            cached = await self.backend.get(full_key)
+        except Exception as e:
+            # A broken shared backend must never take the endpoint down
+            logger.warning(f"Response cache '{self.name}' unavailable: {e}")
+            self.errors += 1
+            return await loader()
+
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+
+        # Stampede protection: concurrent misses for the same key share one load
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The request loading the value was cancelled; load it here instead
+                return await loader()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            self._inflight.pop(full_key, None)
+
+        try:
+            await self.backend.set(full_key, value, ttl or self.default_ttl)
+        except Exception as e:
+            logger.warning(f"Response cache '{self.name}' write failed: {e}")
+            self.errors += 1
+        return value
+
+    async def invalidate(self, *tags: str):
+        """Invalidate every entry that depends on any of the given tags."""
+        if not tags:
+            return
+        try:
+            await self.backend.bump_tags(list(tags))
+        except Exception as e:
+            logger.warning(f"Response cache '{self.name}' invalidation failed: {e}")
+            self.errors += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced_loads": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Lazy initialization
+_backend_instance = None
+_caches: Dict[str, ResponseCache] = {}
+
+def _get_backend():
+    global _backend_instance
+    if _backend_instance is None:
+        if CACHE_BACKEND == "redis":
+            _backend_instance = RedisCacheBackend()
+        else:
+            _backend_instance = MemoryCacheBackend()
+    return _backend_instance
+
+def get_cache(name: str, default_ttl: float) -> ResponseCache:
+    """Get or create a named response cache on the configured backend."""
+    if name not in _caches:
+        _caches[name] = ResponseCache(name, _get_backend(), default_ttl)
+    return _caches[name]
+
+def get_cache_stats() -> List[dict]:
+    """Hit-ratio metrics for every cache created in this process."""
+    return [cache.stats() for cache in _caches.values()]
+
+
+# -------------------------------
+# Shop listings
+# -------------------------------
+def get_shop_listing_cache() -> ResponseCache:
+    return get_cache("shop_listings", SHOP_LISTING_CACHE_TTL)
+
+def shop_listing_tags(category: Optional[str] = None) -> List[str]:
+    """Tags for a shop listing, narrowed to its category when filtered."""
+    if category:
+        return ["shops", f"shops:category:{category}"]
+    return ["shops", "shops:all"]
+
+async def invalidate_shop_listings(*categories: Optional[str]):
+    """Invalidate listings affected by a change to shops in the given categories.
+
+    Without a known category every listing is invalidated.
+    """
+    known = [c for c in categories if c]
+    if not known:
+        await get_shop_listing_cache().invalidate("shops")
+        return
+    tags = ["shops:all"] + [f"shops:category:{c}" for c in known]
+    await get_shop_listing_cache().invalidate(*tags)
@@ -0,0 +1,281 @@
+"""
+Hourly and daily activity rollups.
+
+Every bucket lives in the ``rollups`` collection, keyed by scope
+(``"platform"`` or a shop id), granularity (``hour`` or ``day``) and bucket
+start. Buckets hold plain counters - new reviews, rating sum, new orders,
+order revenue, signups, successful and failed logins, shop page views
+(flushed in batches by ``shop_analytics``) - which writers bump
+with ``$inc`` upserts as events happen, so a date range is read back with one
+indexed query returning one document per bucket instead of scanning the
+source collections.
+
+A regular collection is used rather than a MongoDB time-series collection:
+time-series collections do not support the upsert-with-``$inc`` updates the
+incremental path depends on.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+PLATFORM_SCOPE = "platform"
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+METRICS = ["reviews", "rating_sum", "orders", "revenue", "signups", "logins_succeeded", "logins_failed", "views"]
+
+# Longest range a single series request may cover, in buckets
+MAX_BUCKETS = {"hour": 24 * 31, "day": 366 * 2}
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day bucket."""
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def resolve_range(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    granularity: str
+) -> Tuple[datetime, datetime]:
+    """
+    Default to the last 30 days (hour granularity: last 24 hours) and raise
+    ValueError for unknown granularities or ranges that are too long.
+    Timezone-aware bounds are converted to naive UTC, like the stored buckets.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity must be one of: {', '.join(GRANULARITIES)}")
+
+    start, end = _naive_utc(start), _naive_utc(end)
+    end = end or datetime.utcnow()
+    if start is None:
+        start = end - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+    if start >= end:
+        raise ValueError("start must be before end")
+    if (end - start) / GRANULARITIES[granularity] > MAX_BUCKETS[granularity]:
+        raise ValueError(f"Range too long, at most {MAX_BUCKETS[granularity]} {granularity} buckets")
+    return start, end
+
+
+def _scopes(shop_id: Optional[str]) -> List[str]:
+    return [PLATFORM_SCOPE, str(shop_id)] if shop_id else [PLATFORM_SCOPE]
+
+
+def rollup_updates(shop_id: Optional[str], at: datetime, metrics: Dict[str, float]) -> List[UpdateOne]:
+    """The $inc upserts adding `metrics` to every bucket containing `at`."""
+    inc = {name: value for name, value in metrics.items() if value}
+    if not inc:
+        return []
+    return [
+        UpdateOne(
+            {"scope": scope, "granularity": granularity, "bucket": bucket_start(at, granularity)},
+            {"$inc": inc},
+            upsert=True
+        )
+        for scope in _scopes(shop_id)
+        for granularity in GRANULARITIES
+    ]
+
+
+async def record(
+    db: AsyncIOMotorDatabase,
+    shop_id: Optional[str] = None,
+    at: Optional[datetime] = None,
+    **metrics: float
+):
+    """
+    Add an event to the platform buckets (and the shop buckets when shop_id
+    is given), e.g. ``record(db, shop_id, reviews=1, rating_sum=5)``.
+
+    Rollups are secondary data: a failed write is logged, never raised, so
+    it cannot fail the request that produced the event.
+    """
+    operations = rollup_updates(shop_id, at or datetime.utcnow(), metrics)
+    if not operations:
+        return
+    try:
+        await db.rollups.bulk_write(operations, ordered=False)
+    except PyMongoError as e:
+        logger.error(f"Failed to update rollups: {e}")
+
+
+def _empty_bucket(bucket: datetime) -> dict:
+    return {"bucket": bucket, **{name: 0 for name in METRICS}}
+
+
+def _format_bucket(row: dict) -> dict:
+    bucket = {name: row.get(name, 0) for name in METRICS if name != "rating_sum"}
+    bucket["bucket"] = row["bucket"]
+    bucket["revenue"] = round(bucket["revenue"], 2)
+    bucket["average_rating"] = round(row["rating_sum"] / row["reviews"], 2) if row.get("reviews") else None
+    return bucket
+
+
+async def get_series(
+    db: AsyncIOMotorDatabase,
+    scopes: Iterable[str],
+    granularity: str,
+    start: datetime,
+    end: datetime
+) -> dict:
+    """
+    Read the buckets in [start, end) for one or more scopes, summed per
+    bucket, with empty buckets filled in and totals for the whole range.
+    """
+    step = GRANULARITIES[granularity]
+    first = bucket_start(start, granularity)
+
+    rows = await db.rollups.find(
+        {
+            "scope": {"$in": list(scopes)},
+            "granularity": granularity,
+            "bucket": {"$gte": first, "$lt": end}
+        },
+        {"_id": 0, "scope": 0, "granularity": 0}
+    ).to_list(None)
+
+    buckets: Dict[datetime, dict] = {}
+    current = first
+    while current < end:
+        buckets[current] = _empty_bucket(current)
+        current += step
+
+    totals = {name: 0 for name in METRICS}
+    for row in rows:
+        bucket = buckets.setdefault(row["bucket"], _empty_bucket(row["bucket"]))
+        for name in METRICS:
+            bucket[name] += row.get(name, 0)
+            totals[name] += row.get(name, 0)
+
+    totals["bucket"] = first
+    summary = _format_bucket(totals)
+    del summary["bucket"]
+
+    return {
+        "granularity": granularity,
+        "start": first,
+        "end": end,
+        "totals": summary,
+        "series": [_format_bucket(buckets[key]) for key in sorted(buckets)]
+    }
+
+
+# source collection -> (timestamp field, shop field, metrics as $group accumulators)
+BACKFILL_SOURCES = {
+    "reviews": ("created_at", "shop_id", {"reviews": {"$sum": 1}, "rating_sum": {"$sum": "$rating"}}),
+    "orders": ("created_at", "shop_id", {"orders": {"$sum": 1}, "revenue": {"$sum": "$amount"}}),
+    "users": ("created_at", None, {"signups": {"$sum": 1}}),
+    "login_history": ("timestamp", None, {
+        "logins_succeeded": {"$sum": {"$cond": ["$success", 1, 0]}},
+        "logins_failed": {"$sum": {"$cond": ["$success", 0, 1]}},
+    }),
+}
+
+
+async def backfill(db: AsyncIOMotorDatabase, since: Optional[datetime] = None):
+    """
+    Rebuild the buckets from the source collections, optionally only from
+    ``since`` onwards. Each source is grouped server-side into the
+    ``rollups_backfill`` staging collection, so nothing is loaded into the
+    application, and the result is then merged into ``rollups`` one bucket
+    document at a time: readers never see a bucket half rebuilt.
+
+    Live writers keep ``$inc``-ing the buckets that are still open (the
+    current hour and day) while this runs, so only closed buckets are
+    rebuilt; the open ones are left to the writers.
+    """
+    started_at = datetime.utcnow()
+    run_id = ObjectId()
+    if since:
+        since = bucket_start(since, "day")
+    # Views have no source collection to rebuild from, so keep them
+    rebuilt = [name for _, _, accumulators in BACKFILL_SOURCES.values() for name in accumulators]
+    key_fields = ["scope", "granularity", "bucket"]
+
+    staging = db.rollups_backfill
+    await staging.drop()
+    # $merge needs a unique index on the fields it matches on
+    await staging.create_index([(name, 1) for name in key_fields], unique=True)
+
+    for granularity in GRANULARITIES:
+        closed = {"$lt": bucket_start(started_at, granularity)}
+        if since:
+            closed["$gte"] = since
+
+        for collection, (ts_field, shop_field, accumulators) in BACKFILL_SOURCES.items():
+            scope_exprs = [PLATFORM_SCOPE]
+            if shop_field:
+                scope_exprs.append({"$toString": f"${shop_field}"})
+
+            for scope in scope_exprs:
+                await db[collection].aggregate([
+                    {"$match": {ts_field: closed}},
+                    {
+                        "$group": {
+                            "_id": {
+                                "scope": scope,
+                                "bucket": {"$dateTrunc": {"date": f"${ts_field}", "unit": granularity}}
+                            },
+                            **accumulators
+                        }
+                    },
+                    {"$match": {"_id.scope": {"$ne": None}}},
+                    {
+                        "$project": {
+                            "_id": 0,
+                            "scope": "$_id.scope",
+                            "granularity": {"$literal": granularity},
+                            "bucket": "$_id.bucket",
+                            **{name: 1 for name in accumulators}
+                        }
+                    },
+                    {
+                        "$merge": {
+                            "into": staging.name,
+                            "on": key_fields,
+                            "whenMatched": "merge",
+                            "whenNotMatched": "insert"
+                        }
+                    }
+                ]).to_list(None)
+            logger.info(f"Backfilled {granularity} rollups from {collection}")
+
+        # Swap the rebuilt counters in, leaving the other fields (views) alone
+        await staging.aggregate([
+            {"$match": {"granularity": granularity}},
+            {"$project": {"_id": 0}},
+            {"$set": {"backfill_run": run_id, **{name: {"$ifNull": [f"${name}", 0]} for name in rebuilt}}},
+            {
+                "$merge": {
+                    "into": "rollups",
+                    "on": key_fields,
+                    "let": {"new": "$$ROOT"},
+                    "whenMatched": [{"$set": {
+                        "backfill_run": "$$new.backfill_run",
+                        **{name: f"$$new.{name}" for name in rebuilt}
+                    }}],
+                    "whenNotMatched": "insert"
+                }
+            }
+        ]).to_list(None)
+        # Closed buckets whose source events are all gone
+        await db.rollups.update_many(
+            {"granularity": granularity, "bucket": closed, "backfill_run": {"$ne": run_id}},
+            {"$unset": {name: "" for name in rebuilt}}
+        )
+
+    await staging.drop()
@@ -0,0 +1,230 @@
+"""
+Shop analytics: page views and periodic ShopAnalytics snapshots.
+
+Shop page views are counted in memory and flushed every few seconds as one
+bulk of ``$inc`` upserts into the shop's hourly/daily rollup buckets, so a
+page hit never costs a database write.
+
+Once a day the analytics job writes a ``shop_analytics`` document per shop
+and period (daily, weekly, monthly) for the day that just ended. New
+reviews, answered reviews and views for all shops and all three periods
+come from a single aggregation over the last 30 days of reviews plus one
+over the view rollups.
+"""
+
+import asyncio
+import logging
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from models_extended import ShopAnalytics
+from services.rollups import bucket_start, rollup_updates
+
+logger = logging.getLogger(__name__)
+
+SHOP_VIEW_FLUSH_INTERVAL = float(os.getenv("SHOP_VIEW_FLUSH_INTERVAL", 10))
+SHOP_ANALYTICS_RUN_HOUR = int(os.getenv("SHOP_ANALYTICS_RUN_HOUR", 2))  # UTC
+SHOP_ANALYTICS_BATCH_SIZE = 1000
+
+# period -> number of days ending with the analysed day
+PERIODS = {"daily": 1, "weekly": 7, "monthly": 30}
+
+
+class ShopViewCounter:
+    """Buffers shop page views and flushes them to the rollups in bulk."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._pending: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def record_view(self, shop_id: str):
+        self._pending[(str(shop_id), bucket_start(datetime.utcnow(), "hour"))] += 1
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending or self._db is None:
+            return
+        pending, self._pending = self._pending, Counter()
+
+        operations = []
+        for (shop_id, hour), views in pending.items():
+            operations.extend(rollup_updates(shop_id, hour, {"views": views}))
+        try:
+            await self._db.rollups.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Failed to flush shop views: {e}")
+            # Keep the counts for the next flush
+            self._pending.update(pending)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(SHOP_VIEW_FLUSH_INTERVAL)
+            await self.flush()
+
+
+async def compute_shop_analytics(db: AsyncIOMotorDatabase, day: datetime) -> int:
+    """
+    Write the daily, weekly and monthly ShopAnalytics of every shop for the
+    periods ending with `day`. Returns the number of documents written.
+    """
+    day = bucket_start(day, "day")
+    end = day + timedelta(days=1)
+    starts = {period: end - timedelta(days=days) for period, days in PERIODS.items()}
+    oldest = min(starts.values())
+
+    def per_period(value) -> Dict[str, dict]:
+        return {
+            period: {"$sum": {"$cond": [{"$gte": ["$created_at", start]}, value, 0]}}
+            for period, start in starts.items()
+        }
+
+    answered = {"$cond": [{"$eq": ["$has_response", True]}, 1, 0]}
+    review_rows, view_rows = await asyncio.gather(
+        db.reviews.aggregate([
+            {"$match": {"created_at": {"$gte": oldest, "$lt": end}}},
+            {
+                "$group": {
+                    "_id": "$shop_id",
+                    **{f"new_{p}": acc for p, acc in per_period(1).items()},
+                    **{f"answered_{p}": acc for p, acc in per_period(answered).items()}
+                }
+            }
+        ]).to_list(None),
+        db.rollups.aggregate([
+            {"$match": {"granularity": "day", "bucket": {"$gte": oldest, "$lt": end}, "scope": {"$ne": "platform"}}},
+            {
+                "$group": {
+                    "_id": "$scope",
+                    **{
+                        f"views_{period}": {
+                            "$sum": {"$cond": [{"$gte": ["$bucket", start]}, {"$ifNull": ["$views", 0]}, 0]}
+                        }
+                        for period, start in starts.items()
+                    }
+                }
+            }
+        ]).to_list(None)
+    )
+    reviews_by_shop = {str(row["_id"]): row for row in review_rows}
+    views_by_shop = {row["_id"]: row for row in view_rows}
+
+    written = 0
+    operations = []
+    cursor = db.shops.find({"status": {"$ne": "deleted"}}, {"rating": 1, "review_count": 1})
+    async for shop in cursor:
+        shop_id = str(shop["_id"])
+        reviews = reviews_by_shop.get(shop_id, {})
+        views = views_by_shop.get(shop_id, {})
+        for period in PERIODS:
+            new_reviews = reviews.get(f"new_{period}", 0)
+            analytics = ShopAnalytics(
+                shop_id=shop_id,
+                period=period,
+                total_reviews=shop.get("review_count", 0),
+                average_rating=shop.get("rating", 0.0),
+                new_reviews=new_reviews,
+                response_rate=round(reviews.get(f"answered_{period}", 0) / new_reviews * 100, 1) if new_reviews else 0.0,
+                views=views.get(f"views_{period}", 0),
+                date=day
+            )
+            operations.append(UpdateOne(
+                {"shop_id": shop_id, "period": period, "date": day},
+                {"$set": {**analytics.dict(), "computed_at": datetime.utcnow()}},
+                upsert=True
+            ))
+        if len(operations) >= SHOP_ANALYTICS_BATCH_SIZE:
+            await db.shop_analytics.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+
+    if operations:
+        await db.shop_analytics.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+
+class ShopAnalyticsJob:
+    """Runs compute_shop_analytics for the previous day once a day."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db: AsyncIOMotorDatabase):
+        self._db = db
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _next_run(self, now: datetime) -> datetime:
+        run_at = now.replace(hour=SHOP_ANALYTICS_RUN_HOUR, minute=0, second=0, microsecond=0)
+        return run_at if run_at > now else run_at + timedelta(days=1)
+
+    async def _last_day(self) -> Tuple[Optional[datetime], datetime]:
+        yesterday = bucket_start(datetime.utcnow(), "day") - timedelta(days=1)
+        latest = await self._db.shop_analytics.find_one({"period": "daily"}, {"date": 1}, sort=[("date", -1)])
+        return (latest["date"] if latest else None), yesterday
+
+    async def _run(self):
+        while True:
+            try:
+                # Catch up if the last run was missed (e.g. deploy during the run hour)
+                latest, yesterday = await self._last_day()
+                if latest is None or latest < yesterday:
+                    written = await compute_shop_analytics(self._db, yesterday)
+                    logger.info(f"Shop analytics for {yesterday.date()} written ({written} documents)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Shop analytics job failed: {e}")
+
+            now = datetime.utcnow()
+            await asyncio.sleep((self._next_run(now) - now).total_seconds())
+
+
+# Lazy initialization
+_shop_view_counter_instance = None
+_shop_analytics_job_instance = None
+
+def get_shop_view_counter() -> ShopViewCounter:
+    """Get or create the shop view counter singleton instance."""
+    global _shop_view_counter_instance
+    if _shop_view_counter_instance is None:
+        _shop_view_counter_instance = ShopViewCounter()
+    return _shop_view_counter_instance
+
+def get_shop_analytics_job() -> ShopAnalyticsJob:
+    """Get or create the shop analytics job singleton instance."""
+    global _shop_analytics_job_instance
+    if _shop_analytics_job_instance is None:
+        _shop_analytics_job_instance = ShopAnalyticsJob()
+    return _shop_analytics_job_instance
@@ -0,0 +1,182 @@
+"""
+In-memory token revocation set.
+
+Access tokens carry the user's ``token_version`` and their session id.
+Revoking a user's tokens (suspension, deletion, role or password reset) bumps
+the version on the user and records it in ``token_revocations``; ending a
+session (logout, termination by an admin, refresh token reuse) records the
+session id. Every worker keeps both in memory, so validating a token is a
+dict lookup: a token is revoked when its version is below the recorded one
+or its session has ended.
+
+The map is updated immediately in the worker that revokes. Other workers
+receive the revocation from a change stream on ``token_revocations``, or, on
+a standalone mongod, by polling it every TOKEN_REVOCATION_POLL_SECONDS.
+Entries are only needed while a token issued before them can still be
+valid: they are dropped from memory after the access token lifetime passed
+to start(), and from the collection by a TTL index.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from services.counter_materializer import CHANGE_STREAMS_UNSUPPORTED
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REVOCATION_POLL_SECONDS = float(os.getenv("TOKEN_REVOCATION_POLL_SECONDS", 5))
+# Re-read this far back on every poll, to tolerate clock skew between workers
+TOKEN_REVOCATION_OVERLAP = timedelta(minutes=1)
+
+# Session revocations share the collection with user revocations
+SESSION_PREFIX = "session:"
+
+
+class TokenRevocations:
+    """Lowest valid token version per recently revoked user, and recently ended sessions."""
+
+    def __init__(self):
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._versions: Dict[str, int] = {}
+        self._sessions: Set[str] = set()
+        # Entry key -> revoked_at, to drop entries once they can no longer match
+        self._revoked_at: Dict[str, datetime] = {}
+        self._retention: Optional[timedelta] = None
+        self._pruned_at = datetime.utcnow()
+        self._last_seen: Optional[datetime] = None
+        self._tasks: List[asyncio.Task] = []
+        self.mode: Optional[str] = None  # change_streams, polling
+
+    def is_revoked(self, user_id: str, token_version: int, session_id: Optional[str] = None) -> bool:
+        return token_version < self._versions.get(user_id, 0) or (session_id is not None and session_id in self._sessions)
+
+    def _apply(self, doc: dict):
+        key = doc["_id"]
+        if "session_id" in doc:
+            self._sessions.add(doc["session_id"])
+        elif doc["token_version"] > self._versions.get(key, 0):
+            self._versions[key] = doc["token_version"]
+        self._revoked_at[key] = max(doc["revoked_at"], self._revoked_at.get(key, doc["revoked_at"]))
+        if self._last_seen is None or doc["revoked_at"] > self._last_seen:
+            self._last_seen = doc["revoked_at"]
+        self._prune()
+
+    def _prune(self):
+        now = datetime.utcnow()
+        if self._retention is None or now - self._pruned_at < timedelta(seconds=TOKEN_REVOCATION_POLL_SECONDS):
+            return
+        self._pruned_at = now
+        # Keep the overlap too, so that a poll cannot bring a dropped entry back
+        cutoff = now - self._retention - TOKEN_REVOCATION_OVERLAP
+        for key in [key for key, revoked_at in self._revoked_at.items() if revoked_at < cutoff]:
+            del self._revoked_at[key]
+            if key.startswith(SESSION_PREFIX):
+                self._sessions.discard(key[len(SESSION_PREFIX):])
+            else:
+                self._versions.pop(key, None)
+
+    async def revoke(self, db: AsyncIOMotorDatabase, user_id: str, token_version: int):
+        """Record that tokens below `token_version` are no longer valid for the user."""
+        doc = {"_id": str(user_id), "token_version": token_version, "revoked_at": datetime.utcnow()}
+        self._apply(doc)
+        await db.token_revocations.update_one(
+            {"_id": doc["_id"]},
+            {"$max": {"token_version": token_version}, "$set": {"revoked_at": doc["revoked_at"]}},
+            upsert=True
+        )
+
+    async def revoke_session(self, db: AsyncIOMotorDatabase, session_id: str):
+        """Record that the access tokens of a session are no longer valid."""
+        doc = {"_id": SESSION_PREFIX + str(session_id), "session_id": str(session_id), "revoked_at": datetime.utcnow()}
+        self._apply(doc)
+        await db.token_revocations.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+
+    async def start(self, db: AsyncIOMotorDatabase, retention: Optional[timedelta] = None):
+        """Load and follow revocations; `retention` is the access token lifetime."""
+        self._db = db
+        self._retention = retention
+        if self._tasks:
+            return
+
+        try:
+            await self._load()
+        except PyMongoError as e:
+            logger.error(f"Could not load token revocations: {e}")
+
+        if await self._change_streams_supported():
+            self.mode = "change_streams"
+            self._tasks.append(asyncio.create_task(self._watch()))
+        else:
+            self.mode = "polling"
+            self._tasks.append(asyncio.create_task(self._poll_loop()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _load(self):
+        query = {"revoked_at": {"$gte": self._last_seen - TOKEN_REVOCATION_OVERLAP}} if self._last_seen else {}
+        async for doc in self._db.token_revocations.find(query):
+            self._apply(doc)
+
+    async def _change_streams_supported(self) -> bool:
+        try:
+            async with self._db.token_revocations.watch(max_await_time_ms=1) as stream:
+                await stream.try_next()
+                return True
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                logger.error(f"Could not open change stream: {e}")
+            return False
+        except PyMongoError as e:
+            logger.error(f"Could not open change stream: {e}")
+            return False
+
+    async def _watch(self):
+        while True:
+            try:
+                async with self._db.token_revocations.watch(
+                    pipeline=[{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+                    full_document="updateLookup"
+                ) as stream:
+                    # Catch up on anything revoked while the stream was down
+                    await self._load()
+                    async for change in stream:
+                        if change.get("fullDocument"):
+                            self._apply(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logger.error(f"Token revocation change stream interrupted: {e}")
+                await asyncio.sleep(TOKEN_REVOCATION_POLL_SECONDS)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(TOKEN_REVOCATION_POLL_SECONDS)
+            try:
+                await self._load()
+            except PyMongoError as e:
+                logger.error(f"Token revocation polling failed: {e}")
+
+
+# Lazy initialization
+_token_revocations_instance = None
+
+def get_token_revocations() -> TokenRevocations:
+    """Get or create the token revocations singleton instance."""
+    global _token_revocations_instance
+    if _token_revocations_instance is None:
+        _token_revocations_instance = TokenRevocations()
+    return _token_revocations_instance
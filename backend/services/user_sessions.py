@@ -0,0 +1,155 @@
+"""
+Login sessions and rotating refresh tokens.
+
+Every login or registration creates a ``user_sessions`` document and hands
+out a refresh token next to the short-lived access token. Only the SHA-256
+of the refresh token is stored. Each refresh replaces the refresh token and
+extends the session by REFRESH_TOKEN_EXPIRE_DAYS; expired sessions are
+removed by a TTL index on ``expires_at``.
+
+Each new refresh token is an HMAC of the one it replaces, so it never needs
+to be stored. Tabs sharing a token, or a client whose refresh response got
+lost, can present the previous token again for
+REFRESH_TOKEN_REUSE_GRACE_SECONDS after a rotation and get the same new
+token back. Presenting a rotated-away token later means it was copied by
+someone else, so the whole session is ended. Ending a session marks it
+inactive and revokes its access tokens through the in-memory revocation set.
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+
+from auth import SECRET_KEY
+from services.principal_cache import revoke_user_tokens
+from services.token_revocations import get_token_revocations
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", 10))
+REFRESH_TOKEN_SECRET = os.getenv("REFRESH_TOKEN_SECRET", SECRET_KEY)
+
+# Token hashes are never returned by the API
+SESSION_PROJECTION = {"session_token": 0, "previous_token": 0}
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def next_token(refresh_token: str) -> str:
+    """The refresh token that replaces `refresh_token` on rotation."""
+    return hmac.new(REFRESH_TOKEN_SECRET.encode(), refresh_token.encode(), hashlib.sha256).hexdigest()
+
+
+async def create_session(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    ip_address: Optional[str],
+    user_agent: Optional[str]
+) -> Tuple[str, str]:
+    """Start a session for a user; returns (session id, refresh token)."""
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    session_id = ObjectId()
+    await db.user_sessions.insert_one({
+        "_id": session_id,
+        "user_id": user_id,
+        "session_token": hash_token(refresh_token),
+        "ip_address": ip_address,
+        "user_agent": user_agent,
+        "created_at": now,
+        "last_used_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "is_active": True
+    })
+    return str(session_id), refresh_token
+
+
+async def rotate_session(db: AsyncIOMotorDatabase, refresh_token: str) -> Optional[Tuple[dict, str]]:
+    """
+    Exchange a refresh token for a new one. Returns (session, new refresh
+    token), or None when the token is unknown, expired or already used
+    outside the grace window.
+    """
+    token_hash = hash_token(refresh_token)
+    new_token = next_token(refresh_token)
+    now = datetime.utcnow()
+    session = await db.user_sessions.find_one_and_update(
+        {"session_token": token_hash, "is_active": True, "expires_at": {"$gt": now}},
+        {"$set": {
+            "session_token": hash_token(new_token),
+            "previous_token": token_hash,
+            "last_used_at": now,
+            "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        }},
+        projection=SESSION_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if session is not None:
+        return session, new_token
+
+    reused = await db.user_sessions.find_one({"previous_token": token_hash, "is_active": True}, {"previous_token": 0})
+    if not reused:
+        return None
+
+    # Just rotated by a concurrent request: hand out the same new token again
+    grace_start = now - timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+    if (reused.pop("session_token", None) == hash_token(new_token)
+            and reused["last_used_at"] >= grace_start and reused["expires_at"] > now):
+        return reused, new_token
+
+    logger.warning(f"Refresh token reused, ending session {reused['_id']}")
+    await end_session(db, str(reused["_id"]))
+    return None
+
+
+async def end_session(db: AsyncIOMotorDatabase, session_id: str, user_id: Optional[str] = None) -> bool:
+    """End one session and revoke its access tokens. Returns False if there was no such active session."""
+    if not ObjectId.is_valid(session_id):
+        return False
+    query = {"_id": ObjectId(session_id), "is_active": True}
+    if user_id is not None:
+        query["user_id"] = user_id
+    result = await db.user_sessions.update_one(query, {"$set": {"is_active": False, "ended_at": datetime.utcnow()}})
+    if not result.modified_count:
+        return False
+    await get_token_revocations().revoke_session(db, session_id)
+    return True
+
+
+async def end_session_by_token(db: AsyncIOMotorDatabase, refresh_token: str) -> bool:
+    """End the session a refresh token belongs to (logout)."""
+    session = await db.user_sessions.find_one({"session_token": hash_token(refresh_token)}, {"_id": 1})
+    return bool(session) and await end_session(db, str(session["_id"]))
+
+
+async def end_user_sessions(db: AsyncIOMotorDatabase, user_id: str, keep_session_id: Optional[str] = None) -> int:
+    """
+    End every session of a user and revoke all their access tokens. With
+    keep_session_id, that session stays signed in and only the others (and
+    their access tokens) are ended.
+    """
+    if keep_session_id is not None and ObjectId.is_valid(keep_session_id):
+        ended = 0
+        query = {"user_id": user_id, "is_active": True, "_id": {"$ne": ObjectId(keep_session_id)}}
+        async for session in db.user_sessions.find(query, {"_id": 1}):
+            if await end_session(db, str(session["_id"]), user_id):
+                ended += 1
+        return ended
+
+    result = await db.user_sessions.update_many(
+        {"user_id": user_id, "is_active": True},
+        {"$set": {"is_active": False, "ended_at": datetime.utcnow()}}
+    )
+    await revoke_user_tokens(db, user_id)
+    return result.modified_count
@@ -0,0 +1,113 @@
+"""
+Request-scoped batching loaders for entity lookups
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from bson import ObjectId
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+
+class DataLoader:
+    """
+    Coalesces every load(key) made in the same event-loop tick into one call
+    of `batch_fn(keys)`, which returns a {key: value} dict. Results (including
+    misses, as None) are memoized for the lifetime of the loader, so create
+    one loader per request.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        key_fn: Optional[Callable[[Any], Hashable]] = None
+    ):
+        self._batch_fn = batch_fn
+        self._key_fn = key_fn
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._tasks: set = set()
+
+    def load(self, key: Any) -> Awaitable[Any]:
+        loop = asyncio.get_running_loop()
+        if key is None:
+            future = loop.create_future()
+            future.set_result(None)
+            return future
+
+        if self._key_fn:
+            key = self._key_fn(key)
+        future = self._cache.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._cache[key] = future
+            if not self._queue:
+                # Dispatch after every coroutine already scheduled in this tick had its turn
+                loop.call_soon(self._start_dispatch)
+            self._queue.append(key)
+        return future
+
+    def _start_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            results = await self._batch_fn(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._cache.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._cache[key]
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+def collection_loader(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    projection: Optional[dict] = None
+) -> DataLoader:
+    """
+    Loader fetching documents by id string with one {"_id": {"$in": [...]}}
+    query per batch. Ids are matched both as ObjectId and as plain string.
+    """
+    async def batch(keys: List[str]) -> Dict[str, dict]:
+        ids: List[Any] = []
+        for key in keys:
+            ids.append(key)
+            if ObjectId.is_valid(key):
+                ids.append(ObjectId(key))
+        docs = await db[collection].find({"_id": {"$in": ids}}, projection).to_list(None)
+        return {str(doc["_id"]): doc for doc in docs}
+
+    return DataLoader(batch, key_fn=str)
+
+
+class Loaders:
+    """The loaders available to one request."""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.users = collection_loader(db, "users", {"password": 0})
+        # Only what the joins display; shop documents carry logos and descriptions
+        self.shops = collection_loader(
+            db, "shops", {"name": 1, "category": 1, "rating": 1, "review_count": 1, "is_verified": 1}
+        )
+
+
+def get_loaders(request: Request) -> Loaders:
+    """FastAPI dependency returning the loaders of the current request."""
+    loaders = getattr(request.state, "loaders", None)
+    if loaders is None:
+        loaders = Loaders(request.app.state.db)
+        request.state.loaders = loaders
+    return loaders
@@ -0,0 +1,49 @@
+"""
+Cursor (keyset) pagination helpers
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+
+def encode_cursor(doc: dict, field: str = "created_at") -> str:
+    """Build an opaque cursor pointing just after `doc` in a listing sorted by (field, _id)."""
+    value = doc.get(field)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    payload = json.dumps([value, str(doc["_id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, ObjectId]:
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(value, dict) and "$date" in value:
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def cursor_filter(cursor: Optional[str], field: str = "created_at", direction: int = -1) -> dict:
+    """
+    Query condition selecting documents after the cursor when sorting by
+    (field, _id) in `direction` (-1 descending, 1 ascending). Combine it
+    with the listing's own filter.
+    """
+    if not cursor:
+        return {}
+    value, doc_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    return {
+        "$or": [
+            {field: {op: value}},
+            {field: value, "_id": {op: doc_id}}
+        ]
+    }
@@ -0,0 +1,56 @@
+"""
+Client details for request logging
+"""
+
+import ipaddress
+import os
+from typing import Optional
+
+from fastapi import Request
+
+# Proxies whose X-Forwarded-For entries are believed, as comma separated IPs
+# or CIDR ranges (e.g. "10.0.0.0/8,127.0.0.1"). Empty: the header is ignored.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if entry.strip()
+]
+
+
+def _parse_ip(value: str):
+    try:
+        return ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+
+
+def _is_trusted(address) -> bool:
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request) -> Optional[str]:
+    """
+    Client IP. X-Forwarded-For is only honoured when the peer is a trusted
+    proxy; the hops are then read from the right, and the first one that is
+    not a trusted proxy is the client. Everything left of it was sent by the
+    client and may be forged.
+    """
+    peer = request.client.host if request.client else None
+    peer_address = _parse_ip(peer) if peer else None
+    if peer_address is None or not _is_trusted(peer_address):
+        return peer
+
+    client = peer
+    for hop in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        address = _parse_ip(hop)
+        if address is None:
+            # Garbage in the header: keep the last address a trusted proxy reported
+            break
+        client = str(address)
+        if not _is_trusted(address):
+            break
+    return client
+
+
+def get_user_agent(request: Request) -> str:
+    return request.headers.get("user-agent", "")
@@ -15,11 +15,12 @@ import {
   AlertDialogTitle,
 } from '../ui/alert-dialog';
 import { Star, CheckCircle, XCircle, Eye, Clock, Filter, Image, MessageSquare, FileText } from 'lucide-react';
-import axios from 'axios';
+import { adminAPI } from '../../services/api';
 
 const AdminReviews = () => {
   const { toast } = useToast();
   const [reviews, setReviews] = useState([]);
+  const [reviewsTotal, setReviewsTotal] = useState(0);
   const [pendingReviews, setPendingReviews] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all'); // all, pending, approved, rejected
@@ -38,7 +39,6 @@ const AdminReviews = () => {
 
   const fetchReviews = async () => {
     try {
-      const token = localStorage.getItem('token');
       const params = {};
       if (filter !== 'all') {
         params.status_filter = filter;
@@ -49,17 +49,12 @@ const AdminReviews = () => {
       
       console.log('Fetching reviews with filter:', filter, 'search:', searchTerm);
       
-      const response = await axios.get(
-        `${process.env.REACT_APP_BACKEND_URL}/api/admin/reviews`,
-        {
-          headers: { Authorization: `Bearer ${token}` },
-          params
-        }
-      );
+      const response = await adminAPI.getReviews(params);
       
       console.log('Reviews response:', response.data);
       
       setReviews(response.data.data || []);
+      setReviewsTotal(response.data.total || 0);
     } catch (error) {
       console.error('Error fetching reviews:', error);
       console.error('Error details:', error.response?.data);
@@ -75,11 +70,7 @@ const AdminReviews = () => {
 
   const fetchPendingReviews = async () => {
     try {
-      const token = localStorage.getItem('token');
-      const response = await axios.get(
-        `${process.env.REACT_APP_BACKEND_URL}/api/admin/reviews/pending`,
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      const response = await adminAPI.getPendingReviews();
       setPendingReviews(response.data.data || []);
     } catch (error) {
       console.error('Error fetching pending reviews:', error);
@@ -91,15 +82,10 @@ const AdminReviews = () => {
     
     setActionLoading(true);
     try {
-      const token = localStorage.getItem('token');
-      await axios.post(
-        `${process.env.REACT_APP_BACKEND_URL}/api/admin/reviews/${selectedReview._id}/action`,
-        {
-          action: 'approve',
-          admin_notes: adminNotes || undefined
-        },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      await adminAPI.reviewAction(selectedReview._id, {
+        action: 'approve',
+        admin_notes: adminNotes || undefined
+      });
       
       toast({
         title: 'Erfolg!',
@@ -127,15 +113,10 @@ const AdminReviews = () => {
     
     setActionLoading(true);
     try {
-      const token = localStorage.getItem('token');
-      await axios.post(
-        `${process.env.REACT_APP_BACKEND_URL}/api/admin/reviews/${selectedReview._id}/action`,
-        {
-          action: 'reject',
-          admin_notes: adminNotes || undefined
-        },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      await adminAPI.reviewAction(selectedReview._id, {
+        action: 'reject',
+        admin_notes: adminNotes || undefined
+      });
       
       toast({
         title: 'Erfolg!',
@@ -158,6 +139,40 @@ const AdminReviews = () => {
     }
   };
 
+  const handleBulkAction = async (action) => {
+    const labels = { approve: 'genehmigen', reject: 'ablehnen' };
+    if (!window.confirm(`Alle ${reviewsTotal} gefilterten Bewertungen ${labels[action]}?`)) return;
+    
+    setActionLoading(true);
+    try {
+      const filters = {};
+      if (filter !== 'all') {
+        filters.status_filter = filter;
+      }
+      if (searchTerm) {
+        filters.search = searchTerm;
+      }
+      const response = await adminAPI.bulkReviewAction(action, filters);
+      
+      const { succeeded, failed, has_more } = response.data;
+      toast({
+        title: 'Erfolg!',
+        description: `${succeeded} Bewertungen bearbeitet${failed ? `, ${failed} fehlgeschlagen` : ''}${has_more ? ' – weitere Treffer vorhanden' : ''}`
+      });
+      
+      fetchReviews();
+      fetchPendingReviews();
+    } catch (error) {
+      toast({
+        title: 'Fehler',
+        description: error.response?.data?.detail || 'Aktion fehlgeschlagen',
+        variant: 'destructive'
+      });
+    } finally {
+      setActionLoading(false);
+    }
+  };
+
   const openProofViewer = (review) => {
     setSelectedReview(review);
     setShowProofDialog(true);
@@ -296,6 +311,33 @@ const AdminReviews = () => {
               </Button>
             </div>
           </div>
+          {/* Bulk actions on the whole filter result */}
+          {filter === 'pending' && reviewsTotal > 0 && (
+            <div className="mt-4 flex items-center justify-between bg-gray-50 rounded-lg p-3">
+              <p className="text-sm text-gray-700">{reviewsTotal} Treffer</p>
+              <div className="flex gap-2">
+                <Button
+                  size="sm"
+                  disabled={actionLoading}
+                  onClick={() => handleBulkAction('approve')}
+                  className="bg-green-600 hover:bg-green-700"
+                >
+                  <CheckCircle className="w-4 h-4 mr-1" />
+                  Alle genehmigen
+                </Button>
+                <Button
+                  size="sm"
+                  variant="outline"
+                  disabled={actionLoading}
+                  onClick={() => handleBulkAction('reject')}
+                  className="border-red-600 text-red-600 hover:bg-red-50"
+                >
+                  <XCircle className="w-4 h-4 mr-1" />
+                  Alle ablehnen
+                </Button>
+              </div>
+            </div>
+          )}
           {/* Search Bar */}
           <div className="mt-4">
             <div className="relative">
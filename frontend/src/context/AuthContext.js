@@ -33,6 +33,7 @@ export const AuthProvider = ({ children }) => {
       setUser(response.data);
     } catch (error) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       localStorage.removeItem('user');
     } finally {
       setLoading(false);
@@ -45,6 +46,7 @@ export const AuthProvider = ({ children }) => {
       const { user, token } = response.data;
       
       localStorage.setItem('token', token.access_token);
+      localStorage.setItem('refreshToken', token.refresh_token);
       localStorage.setItem('user', JSON.stringify(user));
       setUser(user);
       
@@ -71,6 +73,7 @@ export const AuthProvider = ({ children }) => {
       const { user, token } = response.data;
       
       localStorage.setItem('token', token.access_token);
+      localStorage.setItem('refreshToken', token.refresh_token);
       localStorage.setItem('user', JSON.stringify(user));
       setUser(user);
       
@@ -92,7 +95,13 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (refreshToken) {
+      // End the session on the server; the local logout does not wait for it
+      authAPI.logout(refreshToken).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('user');
     setUser(null);
     toast({
@@ -30,6 +30,8 @@ const CustomerDashboard = () => {
   // Data states
   const [dashboard, setDashboard] = useState(null);
   const [reviews, setReviews] = useState([]);
+  const [reviewsTotal, setReviewsTotal] = useState(0);
+  const [reviewsCursor, setReviewsCursor] = useState(null);
   const [favorites, setFavorites] = useState([]);
   const [notifications, setNotifications] = useState([]);
   const [profile, setProfile] = useState(null);
@@ -59,6 +61,22 @@ const CustomerDashboard = () => {
     fetchAllData();
   }, [user, navigate]);
 
+  const applyReviews = (res) => {
+    setReviews(res.data.reviews || []);
+    setReviewsTotal(res.data.total || 0);
+    setReviewsCursor(res.data.next_cursor || null);
+  };
+
+  const fetchMoreReviews = async () => {
+    try {
+      const res = await customerAPI.getMyReviews({ sort_by: reviewSort, search: reviewSearchTerm || undefined, cursor: reviewsCursor });
+      setReviews(prev => [...prev, ...(res.data.reviews || [])]);
+      setReviewsCursor(res.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching reviews:', error);
+    }
+  };
+
   const fetchAllData = async () => {
     try {
       setLoading(true);
@@ -71,7 +89,7 @@ const CustomerDashboard = () => {
       ]);
       
       setDashboard(dashboardRes.data);
-      setReviews(reviewsRes.data.reviews || []);
+      applyReviews(reviewsRes);
       setFavorites(favoritesRes.data.favorites || []);
       setNotifications(notificationsRes.data.notifications || []);
       setProfile(profileRes.data);
@@ -227,9 +245,9 @@ const CustomerDashboard = () => {
             <Card>
               <CardHeader>
                 <div className="flex items-center justify-between">
-                  <CardTitle>Meine Bewertungen ({reviews.length})</CardTitle>
+                  <CardTitle>Meine Bewertungen ({reviewsTotal})</CardTitle>
                   <div className="flex gap-2">
-                    <Select value={reviewSort} onValueChange={(v) => { setReviewSort(v); customerAPI.getMyReviews({ sort_by: v, search: reviewSearchTerm || undefined }).then(r => setReviews(r.data.reviews || [])); }}>
+                    <Select value={reviewSort} onValueChange={(v) => { setReviewSort(v); customerAPI.getMyReviews({ sort_by: v, search: reviewSearchTerm || undefined }).then(applyReviews); }}>
                       <SelectTrigger className="w-40"><SelectValue/></SelectTrigger>
                       <SelectContent>
                         <SelectItem value="newest">Neueste</SelectItem>
@@ -253,7 +271,7 @@ const CustomerDashboard = () => {
                         const searchValue = e.target.value;
                         setTimeout(() => {
                           customerAPI.getMyReviews({ sort_by: reviewSort, search: searchValue || undefined })
-                            .then(r => setReviews(r.data.reviews || []));
+                            .then(applyReviews);
                         }, 300);
                       }}
                       className="w-full pl-10 pr-4 py-2 border rounded-lg focus:outline-none focus:ring-2 focus:ring-yellow-500"
@@ -262,7 +280,7 @@ const CustomerDashboard = () => {
                       <button
                         onClick={() => {
                           setReviewSearchTerm('');
-                          customerAPI.getMyReviews({ sort_by: reviewSort }).then(r => setReviews(r.data.reviews || []));
+                          customerAPI.getMyReviews({ sort_by: reviewSort }).then(applyReviews);
                         }}
                         className="absolute right-3 top-1/2 transform -translate-y-1/2 text-gray-400 hover:text-gray-600"
                       >
@@ -366,7 +384,7 @@ const CustomerDashboard = () => {
                           <div className="flex items-center justify-between mt-4 pt-4 border-t">
                             <p className="text-xs text-gray-500">{new Date(review.created_at).toLocaleDateString('de-DE')}</p>
                             <div className="flex gap-2">
-                              {review.response && (
+                              {(review.has_response || review.response) && (
                                 <Badge className="bg-green-100 text-green-800">
                                   Beantwortet
                                 </Badge>
@@ -376,6 +394,11 @@ const CustomerDashboard = () => {
                         </CardContent>
                       </Card>
                     ))}
+                    {reviewsCursor && (
+                      <div className="text-center">
+                        <Button variant="outline" onClick={fetchMoreReviews}>Weitere Bewertungen laden</Button>
+                      </div>
+                    )}
                   </div>
                 ) : <p className="text-center text-gray-500 py-12">Noch keine Bewertungen abgegeben</p>}
               </CardContent>
@@ -6,7 +6,7 @@ import { Input } from '../components/ui/input';
 import { useToast } from '../hooks/use-toast';
 import { useAuth } from '../context/AuthContext';
 import { Mail, CheckCircle, AlertCircle, Loader2 } from 'lucide-react';
-import axios from 'axios';
+import { emailVerificationAPI } from '../services/api';
 
 const EmailVerification = () => {
   const navigate = useNavigate();
@@ -56,10 +56,7 @@ const EmailVerification = () => {
 
     setSending(true);
     try {
-      const response = await axios.post(
-        `${process.env.REACT_APP_BACKEND_URL}/api/email-verification/send-code`,
-        { email: targetEmail }
-      );
+      const response = await emailVerificationAPI.sendCode(targetEmail);
 
       toast({
         title: 'Code gesendet!',
@@ -135,10 +132,7 @@ const EmailVerification = () => {
 
     setLoading(true);
     try {
-      await axios.post(
-        `${process.env.REACT_APP_BACKEND_URL}/api/email-verification/verify-code`,
-        { email, code: fullCode }
-      );
+      await emailVerificationAPI.verifyCode(email, fullCode);
 
       // Update user's email_verified status in AuthContext
       updateUser({ email_verified: true });
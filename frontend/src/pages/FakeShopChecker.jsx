@@ -4,7 +4,7 @@ import { Card, CardContent, CardHeader, CardTitle } from '../components/ui/card'
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Badge } from '../components/ui/badge';
-import axios from 'axios';
+import { fakeCheckAPI } from '../services/api';
 import { 
   Search, ShieldCheck, ShieldAlert, Star, AlertTriangle, 
   CheckCircle, XCircle, Info, TrendingUp, Store
@@ -22,7 +22,7 @@ const FakeShopChecker = () => {
 
   const fetchStatistics = async () => {
     try {
-      const response = await axios.get(`${process.env.REACT_APP_BACKEND_URL}/api/fake-check/statistics`);
+      const response = await fakeCheckAPI.getStatistics();
       setStatistics(response.data);
     } catch (error) {
       console.error('Error fetching statistics:', error);
@@ -35,10 +35,7 @@ const FakeShopChecker = () => {
 
     setLoading(true);
     try {
-      const response = await axios.post(
-        `${process.env.REACT_APP_BACKEND_URL}/api/fake-check/check`,
-        { url }
-      );
+      const response = await fakeCheckAPI.checkUrl(url);
       setResult(response.data);
     } catch (error) {
       console.error('Error checking URL:', error);
@@ -53,15 +53,21 @@ const ShopDetail = () => {
   const [hasMoreReviews, setHasMoreReviews] = useState(false);
 
   useEffect(() => {
-    fetchShop();
-    fetchReviews(1);
+    fetchShopPage();
   }, [shopId]);
 
-  const fetchShop = async () => {
+  // Shop, first page of reviews and their responses in a single request
+  const fetchShopPage = async () => {
     try {
       setLoading(true);
-      const response = await shopAPI.getShop(shopId);
-      setShop(response.data);
+      setReviewsLoading(true);
+      const response = await shopAPI.getShopPage(shopId, { limit: 10 });
+      const { shop: shopData, reviews: reviewPageData } = response.data;
+      setShop(shopData);
+      setReviews(reviewPageData.data || []);
+      setTotalReviews(reviewPageData.total || 0);
+      setHasMoreReviews(1 < (reviewPageData.pages || 1));
+      setReviewPage(1);
     } catch (error) {
       console.error('Error fetching shop:', error);
       toast({
@@ -71,6 +77,7 @@ const ShopDetail = () => {
       });
     } finally {
       setLoading(false);
+      setReviewsLoading(false);
     }
   };
 
@@ -20,10 +20,66 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// Access tokens are short-lived: on a 401, renew them once with the refresh
+// token and retry. Concurrent requests share a single refresh, because every
+// refresh token can only be used once. Other tabs share localStorage, so a
+// token they already renewed is used instead of refreshing again.
+let refreshRequest = null;
+
+const refreshTokens = () => {
+  if (!refreshRequest) {
+    const refreshToken = localStorage.getItem('refreshToken');
+    refreshRequest = (refreshToken
+      ? axios.post(`${API_BASE}/auth/refresh`, { refresh_token: refreshToken })
+      : Promise.reject(new Error('No refresh token'))
+    )
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .catch((error) => {
+        // Another tab rotated the shared refresh token in the meantime
+        const current = localStorage.getItem('refreshToken');
+        if (current && current !== refreshToken) {
+          return localStorage.getItem('token');
+        }
+        throw error;
+      })
+      .finally(() => {
+        refreshRequest = null;
+      });
+  }
+  return refreshRequest;
+};
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    const isAuthRequest = config?.url?.startsWith('/auth/') && config.url !== '/auth/me';
+    if (error.response?.status !== 401 || !config || config._retried || isAuthRequest) {
+      return Promise.reject(error);
+    }
+    config._retried = true;
+    try {
+      const stored = localStorage.getItem('token');
+      const token = stored && config.headers.Authorization !== `Bearer ${stored}`
+        ? stored
+        : await refreshTokens();
+      config.headers.Authorization = `Bearer ${token}`;
+      return api(config);
+    } catch (refreshError) {
+      return Promise.reject(error);
+    }
+  }
+);
+
 // Auth API
 export const authAPI = {
   register: (data) => api.post('/auth/register', data),
   login: (data) => api.post('/auth/login', data),
+  logout: (refreshToken) => api.post('/auth/logout', { refresh_token: refreshToken }),
   getCurrentUser: () => api.get('/auth/me'),
 };
 
@@ -31,6 +87,7 @@ export const authAPI = {
 export const shopAPI = {
   getShops: (params) => api.get('/shops', { params }),
   getShop: (id) => api.get(`/shops/${id}`),
+  getShopPage: (id, params) => api.get(`/shops/${id}/page`, { params }),
   createShop: (data) => api.post('/shops', data),
   updateShop: (id, data) => api.put(`/shops/${id}`, data),
   deleteShop: (id) => api.delete(`/shops/${id}`),
@@ -100,6 +157,18 @@ export const billingAPI = {
   getTransactions: () => api.get('/billing/transactions'),
 };
 
+// Fake Shop Checker API
+export const fakeCheckAPI = {
+  getStatistics: () => api.get('/fake-check/statistics'),
+  checkUrl: (url) => api.post('/fake-check/check', { url }),
+};
+
+// Email Verification API
+export const emailVerificationAPI = {
+  sendCode: (email) => api.post('/email-verification/send-code', { email }),
+  verifyCode: (email, code) => api.post('/email-verification/verify-code', { email, code }),
+};
+
 // Search API
 export const searchAPI = {
   searchShops: (params) => api.get('/search/shops', { params }),
@@ -134,6 +203,12 @@ export const adminAPI = {
   deleteShop: (shopId) => api.delete(`/admin/shops/${shopId}`),
   banShop: (shopId, reason) => api.post(`/admin/shops/${shopId}/ban`, { reason }),
   
+  // Reviews
+  getReviews: (params) => api.get('/admin/reviews', { params }),
+  getPendingReviews: () => api.get('/admin/reviews/pending'),
+  reviewAction: (reviewId, data) => api.post(`/admin/reviews/${reviewId}/action`, data),
+  bulkReviewAction: (action, filters) => api.post('/admin/reviews/bulk-action', { action, filters }),
+  
   // Dashboard
   getDashboardOverview: () => api.get('/admin/dashboard/overview'),
   getSecurityAlerts: () => api.get('/admin/dashboard/security-alerts'),